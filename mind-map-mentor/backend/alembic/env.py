@@ -30,6 +30,11 @@ from app.models.note import Note
 from app.models.file import File
 from app.models.graph_node import GraphNode
 from app.models.graph_edge import GraphEdge
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.enrichment_job import EnrichmentJob
+from app.models.tag_suggestion_cache import TagSuggestionCacheEntry
+from app.models.keyword_stats import KeywordDocumentFrequency
+from app.models.tag import Tag, NodeTag
 
 # Set the target metadata
 target_metadata = Base.metadata
@@ -0,0 +1,37 @@
+"""Add tag_suggestion_cache table and notes.tags_fingerprint
+
+Revision ID: a5d3e8f1c7b2
+Revises: f2c84b6d9e17
+Create Date: 2026-10-17 16:40:12.583901
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d3e8f1c7b2'
+down_revision: Union[str, None] = 'f2c84b6d9e17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tag_suggestion_cache',
+    sa.Column('model', sa.String(), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('tags', sa.JSON(), nullable=False),
+    sa.Column('minhash', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('model', 'fingerprint')
+    )
+    op.add_column('notes', sa.Column('tags_fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notes', 'tags_fingerprint')
+    op.drop_table('tag_suggestion_cache')
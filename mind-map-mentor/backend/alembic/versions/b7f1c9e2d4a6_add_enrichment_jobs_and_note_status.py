@@ -0,0 +1,57 @@
+"""Add enrichment_jobs table and enrichment_status to notes
+
+Revision ID: b7f1c9e2d4a6
+Revises: 4d8e2a6b1c3f
+Create Date: 2026-10-17 10:03:18.551902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f1c9e2d4a6'
+down_revision: Union[str, None] = '4d8e2a6b1c3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('enrichment_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('note_id', sa.Integer(), nullable=True),
+    sa.Column('job_type', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['note_id'], ['notes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_enrichment_jobs_id'), 'enrichment_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_enrichment_jobs_job_type'), 'enrichment_jobs', ['job_type'], unique=False)
+    op.create_index(op.f('ix_enrichment_jobs_note_id'), 'enrichment_jobs', ['note_id'], unique=False)
+    op.create_index(op.f('ix_enrichment_jobs_user_id'), 'enrichment_jobs', ['user_id'], unique=False)
+    op.create_index('ix_enrichment_jobs_status_run_after', 'enrichment_jobs', ['status', 'run_after'], unique=False)
+    # Existing notes were enriched inline when they were saved
+    op.add_column('notes', sa.Column('enrichment_status', sa.String(length=20), server_default='done', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notes', 'enrichment_status')
+    op.drop_index('ix_enrichment_jobs_status_run_after', table_name='enrichment_jobs')
+    op.drop_index(op.f('ix_enrichment_jobs_user_id'), table_name='enrichment_jobs')
+    op.drop_index(op.f('ix_enrichment_jobs_note_id'), table_name='enrichment_jobs')
+    op.drop_index(op.f('ix_enrichment_jobs_job_type'), table_name='enrichment_jobs')
+    op.drop_index(op.f('ix_enrichment_jobs_id'), table_name='enrichment_jobs')
+    op.drop_table('enrichment_jobs')
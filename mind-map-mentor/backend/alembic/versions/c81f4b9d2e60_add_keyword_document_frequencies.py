@@ -0,0 +1,37 @@
+"""Add keyword_document_frequencies table and notes.keyword_terms
+
+Revision ID: c81f4b9d2e60
+Revises: a5d3e8f1c7b2
+Create Date: 2026-10-17 18:05:47.312664
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f4b9d2e60'
+down_revision: Union[str, None] = 'a5d3e8f1c7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('keyword_document_frequencies',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('term', sa.String(length=100), nullable=False),
+    sa.Column('doc_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'term')
+    )
+    # Filled lazily by the worker, or all at once with `python -m app.ai.agents.keywords --all-users`
+    op.add_column('notes', sa.Column('keyword_terms', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notes', 'keyword_terms')
+    op.drop_table('keyword_document_frequencies')
@@ -0,0 +1,72 @@
+"""Add tags and node_tags tables, backfilled from graph_nodes.data tags
+
+Revision ID: d94b0e7a3f18
+Revises: c81f4b9d2e60
+Create Date: 2026-10-17 19:22:31.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd94b0e7a3f18'
+down_revision: Union[str, None] = 'c81f4b9d2e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tag names of every node, normalised like app.crud.crud_tag.normalize_tag (lowercase, single spaces).
+# Nodes whose data has no tags array contribute nothing.
+NODE_TAG_NAMES = """
+    SELECT gn.id AS node_id, gn.user_id,
+           left(lower(regexp_replace(btrim(t.value), '\\s+', ' ', 'g')), 100) AS name
+    FROM graph_nodes gn
+    CROSS JOIN LATERAL json_array_elements_text(
+        CASE WHEN json_typeof(gn.data -> 'tags') = 'array' THEN gn.data -> 'tags' ELSE '[]'::json END
+    ) AS t(value)
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'name', name='uq_tags_user_id_name')
+    )
+    op.create_index(op.f('ix_tags_id'), 'tags', ['id'], unique=False)
+    op.create_table('node_tags',
+    sa.Column('node_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['node_id'], ['graph_nodes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('node_id', 'tag_id')
+    )
+    op.create_index(op.f('ix_node_tags_tag_id'), 'node_tags', ['tag_id'], unique=False)
+
+    # Backfill from the JSON tag lists
+    op.execute(f"""
+        INSERT INTO tags (user_id, name)
+        SELECT DISTINCT user_id, name FROM ({NODE_TAG_NAMES}) AS node_tag_names
+        WHERE name <> ''
+        ON CONFLICT (user_id, name) DO NOTHING
+    """)
+    op.execute(f"""
+        INSERT INTO node_tags (node_id, tag_id)
+        SELECT DISTINCT node_tag_names.node_id, tags.id FROM ({NODE_TAG_NAMES}) AS node_tag_names
+        JOIN tags ON tags.user_id = node_tag_names.user_id AND tags.name = node_tag_names.name
+        ON CONFLICT (node_id, tag_id) DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_node_tags_tag_id'), table_name='node_tags')
+    op.drop_table('node_tags')
+    op.drop_index(op.f('ix_tags_id'), table_name='tags')
+    op.drop_table('tags')
@@ -0,0 +1,68 @@
+"""Add unique index on graph_edges (user, source, target, relationship_type)
+
+Revision ID: e3a9d17c5b20
+Revises: b7f1c9e2d4a6
+Create Date: 2026-10-17 11:27:05.918233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a9d17c5b20'
+down_revision: Union[str, None] = 'b7f1c9e2d4a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Older auto-linking left relationship_type NULL on summary-similarity edges; type them like
+    # app.crud.crud_note does now, so they upsert against the same rows
+    op.execute(
+        """
+        UPDATE graph_edges SET relationship_type = 'related_summary'
+        WHERE relationship_type IS NULL AND data ->> 'based_on' = 'summary'
+        """
+    )
+    # Auto-linking keeps one direction per note pair (the newer note is the source), so flip
+    # older edges pointing the other way; the dedupe below then drops the pairs linked both ways
+    op.execute(
+        """
+        UPDATE graph_edges e
+        SET source_node_id = e.target_node_id, target_node_id = e.source_node_id
+        FROM notes source_note, notes target_note
+        WHERE e.relationship_type = 'related_summary'
+          AND source_note.graph_node_id = e.source_node_id
+          AND target_note.graph_node_id = e.target_node_id
+          AND source_note.id < target_note.id
+        """
+    )
+    # NULLs never conflict in a unique index, so give the remaining untyped edges the model default
+    op.execute("UPDATE graph_edges SET relationship_type = 'related' WHERE relationship_type IS NULL")
+    # Drop duplicates created by repeated auto-linking, keeping the most recent edge
+    op.execute(
+        """
+        DELETE FROM graph_edges a
+        USING graph_edges b
+        WHERE a.user_id = b.user_id
+          AND a.source_node_id = b.source_node_id
+          AND a.target_node_id = b.target_node_id
+          AND a.relationship_type = b.relationship_type
+          AND a.id < b.id
+        """
+    )
+    op.create_index(
+        'uq_graph_edges_user_source_target_type',
+        'graph_edges',
+        ['user_id', 'source_node_id', 'target_node_id', 'relationship_type'],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_graph_edges_user_source_target_type', table_name='graph_edges')
@@ -0,0 +1,241 @@
+"""Local keyword extraction: AI-free tag suggestions scored against the user's own notes.
+
+Candidate keyphrases (unigrams and bigrams without stopwords) are scored YAKE/TF-IDF
+style: term frequency, inverse document frequency over the user's notes, how early the
+term first appears, and whether it is in the title. Document frequencies live in
+`keyword_document_frequencies` and are updated incrementally from the difference between
+a note's previous and current term set (notes.keyword_terms).
+
+Every suggestion comes with a confidence in [0, 1]; with TAG_ENGINE="hybrid" notes below
+KEYWORD_MIN_CONFIDENCE are handed to the LLM tagger instead.
+
+Rebuild the statistics (e.g. after enabling the engine) with:
+    python -m app.ai.agents.keywords --all-users
+"""
+
+import argparse
+import logging
+import math
+import re
+import sys
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy.orm import Session, undefer
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.crud import crud_keyword_stats
+from app.models.note import Note
+
+logger = logging.getLogger(__name__)
+
+TAG_ENGINE_LLM = "llm"
+TAG_ENGINE_LOCAL = "local"
+TAG_ENGINE_HYBRID = "hybrid" # Local first, LLM when the local engine has low confidence
+
+MAX_TAGS_PER_NOTE = 2 # Same as the LLM tagger
+MAX_TERM_LENGTH = 100 # keyword_document_frequencies.term
+BIGRAM_WEIGHT = 1.25 # Phrases are rarer than their words but more specific
+TITLE_WEIGHT = 1.5
+EARLY_POSITION_WEIGHT = 0.5 # Bonus for a term that first appears at the very start
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are aren't as at be because been before
+being below between both but by can can't cannot could couldn't did didn't do does doesn't doing
+don't down during each etc few for from further get gets got had hadn't has hasn't have haven't
+having he her here hers herself him himself his how however i if in into is isn't it it's its
+itself just let's like make many may me might more most much must my myself need new no nor not
+now of off on once one only or other our ours ourselves out over own per really same see she
+should shouldn't so some such than that that's the their theirs them themselves then there
+these they this those through thus to too under until up upon us use used using very via was
+wasn't way we well were weren't what when where which while who whom why will with within without
+won't would wouldn't yes yet you your yours yourself yourselves
+""".split())
+
+_FRAGMENT_BOUNDARY = re.compile(r"[.,;:!?()\[\]{}\"\n\r\t|/\\]+")
+_TOKEN = re.compile(r"[a-z][a-z0-9+#]*(?:['-][a-z0-9]+)*")
+
+
+class KeywordTags(NamedTuple):
+    tags: List[str]
+    confidence: float
+
+
+def _fragments(text: str) -> List[List[str]]:
+    """Lowercased word tokens per fragment (text between punctuation), so phrases never span a boundary."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return [_TOKEN.findall(fragment) for fragment in _FRAGMENT_BOUNDARY.split(text)]
+
+def _is_candidate(token: str) -> bool:
+    return len(token) >= 3 and token not in STOPWORDS
+
+def _candidates(fragments: List[List[str]]) -> Iterable[tuple]:
+    """Yields (term, token position) for every unigram and bigram candidate."""
+    position = 0
+    for tokens in fragments:
+        for i, token in enumerate(tokens):
+            if _is_candidate(token):
+                yield token, position + i
+                if i + 1 < len(tokens) and _is_candidate(tokens[i + 1]):
+                    yield f"{token} {tokens[i + 1]}", position + i
+        position += len(tokens)
+
+def extract_terms(text: str) -> Set[str]:
+    """Distinct candidate terms of a text, at most KEYWORD_MAX_TERMS_PER_NOTE (most frequent first).
+       These are what a note contributes to the document frequencies.
+    """
+    counts = Counter(term for term, _ in _candidates(_fragments(text)) if len(term) <= MAX_TERM_LENGTH)
+    return {term for term, _ in counts.most_common(settings.KEYWORD_MAX_TERMS_PER_NOTE)}
+
+def update_keyword_stats(db: Session, notes: Iterable[Note]) -> None:
+    """Brings the document frequencies up to date with the notes' current content
+       (only the terms that were added or removed since the last update are written).
+       Not committed.
+    """
+    deltas_by_user: Dict[int, Counter] = {}
+    for note in notes:
+        previous = set(note.keyword_terms or [])
+        current = extract_terms(note.content)
+        if note.keyword_terms is not None and previous == current:
+            continue
+        deltas = deltas_by_user.setdefault(note.user_id, Counter())
+        deltas.update(current - previous)
+        deltas.subtract(previous - current)
+        note.keyword_terms = sorted(current)
+        db.add(note)
+    for user_id, deltas in deltas_by_user.items():
+        crud_keyword_stats.apply_document_frequency_deltas(db, user_id=user_id, deltas=dict(deltas))
+    db.flush()
+
+def score_keyphrases(
+    content: str,
+    title: Optional[str],
+    document_frequencies: Dict[str, int],
+    total_documents: int,
+) -> List[tuple]:
+    """Scores the candidate keyphrases of one note. document_frequencies and total_documents
+       describe the user's other notes. Returns [(term, score, idf)] sorted by score, best first.
+    """
+    tf: Counter = Counter()
+    first_position: Dict[str, int] = {}
+    for term, position in _candidates(_fragments(content)):
+        tf[term] += 1
+        first_position.setdefault(term, position)
+    if not tf:
+        return []
+    length = max(first_position.values()) + 1
+    title_terms = {term for term, _ in _candidates(_fragments(title or ""))}
+
+    scored = []
+    for term, count in tf.items():
+        idf = math.log((1 + total_documents) / (1 + document_frequencies.get(term, 0))) + 1.0
+        score = (1.0 + math.log(count)) * idf
+        score *= 1.0 + EARLY_POSITION_WEIGHT * (1.0 - first_position[term] / length)
+        if term in title_terms:
+            score *= TITLE_WEIGHT
+        if " " in term:
+            score *= BIGRAM_WEIGHT
+        scored.append((term, score, idf))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored
+
+def _select_tags(scored: List[tuple], limit: int) -> List[tuple]:
+    """Best terms, skipping words already covered by a chosen phrase and vice versa."""
+    chosen: List[tuple] = []
+    for candidate in scored:
+        words = set(candidate[0].split())
+        if any(words & set(term.split()) for term, _, _ in chosen):
+            continue
+        chosen.append(candidate)
+        if len(chosen) == limit:
+            break
+    return chosen
+
+def suggest_keyword_tags(db: Session, notes: List[Note]) -> Dict[int, KeywordTags]:
+    """Suggests tags for notes from their own text and the owner's corpus statistics.
+
+    Confidence is the product of three factors in [0, 1]: corpus size (the user's other
+    notes vs KEYWORD_MIN_CORPUS_DOCS), note length (tokens vs KEYWORD_MIN_NOTE_TOKENS) and
+    how distinctive the chosen tags are within the corpus (mean idf relative to the maximum).
+    """
+    update_keyword_stats(db, notes) # Scores below use the other notes' statistics
+    results: Dict[int, KeywordTags] = {}
+    notes_by_user: Dict[int, List[Note]] = {}
+    for note in notes:
+        notes_by_user.setdefault(note.user_id, []).append(note)
+
+    for user_id, user_notes in notes_by_user.items():
+        total_documents = crud_keyword_stats.count_counted_notes(db, user_id=user_id)
+        terms = {term for note in user_notes for term in (note.keyword_terms or [])}
+        frequencies = crud_keyword_stats.get_document_frequencies(db, user_id=user_id, terms=list(terms))
+        for note in user_notes:
+            own_terms = set(note.keyword_terms or [])
+            # Leave the note itself out of its statistics
+            other_frequencies = {term: max(frequencies.get(term, 0) - 1, 0) for term in own_terms}
+            other_documents = max(total_documents - 1, 0)
+            scored = score_keyphrases(note.content, note.title, other_frequencies, other_documents)
+            chosen = _select_tags(scored, MAX_TAGS_PER_NOTE)
+            if not chosen:
+                results[note.id] = KeywordTags(tags=[], confidence=0.0)
+                continue
+
+            token_count = sum(len(tokens) for tokens in _fragments(note.content))
+            max_idf = math.log(1 + other_documents) + 1.0
+            corpus_factor = min(1.0, other_documents / max(settings.KEYWORD_MIN_CORPUS_DOCS, 1))
+            length_factor = min(1.0, token_count / max(settings.KEYWORD_MIN_NOTE_TOKENS, 1))
+            distinctiveness = sum(idf for _, _, idf in chosen) / (len(chosen) * max_idf)
+            confidence = round(corpus_factor * length_factor * distinctiveness, 3)
+            results[note.id] = KeywordTags(tags=[term for term, _, _ in chosen], confidence=confidence)
+            logger.debug(f"Keyword tags for note {note.id}: {results[note.id]}")
+    return results
+
+def rebuild_keyword_stats(db: Session, user_id: int, chunk_size: int = 500) -> int:
+    """Recounts the user's document frequencies from scratch. Returns the number of notes counted."""
+    db.query(Note).filter(Note.user_id == user_id).update({Note.keyword_terms: None}, synchronize_session=False)
+    crud_keyword_stats.clear_document_frequencies(db, user_id=user_id)
+    counted = 0
+    after_note_id = 0
+    while True:
+        notes = (
+            db.query(Note)
+            .options(undefer(Note.keyword_terms))
+            .filter(Note.user_id == user_id, Note.id > after_note_id)
+            .order_by(Note.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not notes:
+            break
+        update_keyword_stats(db, notes)
+        db.commit()
+        counted += len(notes)
+        after_note_id = notes[-1].id
+        for note in notes:
+            db.expunge(note) # Don't keep every streamed note in the session
+    logger.info(f"Rebuilt keyword statistics for user {user_id} from {counted} notes.")
+    return counted
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the per-user keyword document frequencies used by the local tag engine.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", type=int, action="append", help="User to rebuild (repeatable).")
+    target.add_argument("--all-users", action="store_true", help="Rebuild for every user with notes.")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    db = SessionLocal()
+    try:
+        user_ids = args.user_id or [row[0] for row in db.query(Note.user_id).distinct().all()]
+        for user_id in user_ids:
+            rebuild_keyword_stats(db, user_id)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,228 @@
-import logging
-from typing import List
-
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-
-from app.core.config import settings
-
-# Setup logger
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-async def suggest_tags_for_content(content: str) -> List[str]:
-    """
-    Analyzes text content using an LLM to suggest relevant tags.
-
-    Args:
-        content: The text content to analyze.
-
-    Returns:
-        A list of suggested tags, or an empty list if generation fails or content is empty.
-    """
-    if not content or not content.strip():
-        logger.info("Content is empty, skipping tag suggestion.")
-        return []
-
-    logger.info(f"Suggesting tags for content (truncated): {content[:100]}...")
-
-    try:
-        # 2.4. Initialize LLM (Ensure OPENAI_API_KEY is set in your environment/settings)
-        if not settings.OPENAI_API_KEY:
-            logger.error("OPENAI_API_KEY not configured. Cannot suggest tags.")
-            return []
-
-        llm = ChatOpenAI(
-            model_name="gpt-4o-mini",
-            temperature=0.2,
-            api_key=settings.OPENAI_API_KEY
-        )
-
-        # 2.5. Define Prompt
-        prompt_template = ChatPromptTemplate.from_template(
-            """Analyze the following text and extract the 3 to 5 most relevant and concise keywords or tags.
-Present the tags as a comma-separated list ONLY, with no introductory text or numbering.
-Ensure tags are lowercase.
-Example: artificial intelligence, machine learning, data science
-
-Text:
-{text_content}"""
-        )
-
-        # 2.6. Create LCEL Chain
-        tag_chain = prompt_template | llm | StrOutputParser()
-
-        # 2.7. Invoke Chain & Log Raw Output
-        raw_llm_output = await tag_chain.ainvoke({"text_content": content})
-        logger.info(f"Raw LLM Output for tags: {raw_llm_output}")
-
-        # 2.8. Implement Output Parsing
-        if not raw_llm_output:
-             logger.warning("LLM returned empty output for tags.")
-             return []
-
-        # Split by comma, strip whitespace, convert to lowercase, filter empty strings
-        tags = [tag.strip().lower() for tag in raw_llm_output.split(',') if tag.strip()]
-
-        # Limit to a maximum of two tags
-        tags = tags[:2]
-
-        logger.info(f"Parsed tags (limited to 2): {tags}")
-        return tags
-
-    except Exception as e:
-        # 2.9. Error Handling & Logging
-        logger.error(f"Error suggesting tags: {e}", exc_info=True)
-        return []
-
-# Example usage (for potential direct testing)
-if __name__ == '__main__':
-    import asyncio
-    import os
-    # Make sure to load .env for local testing if needed
-    # from dotenv import load_dotenv
-    # load_dotenv()
-    # settings.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") # Ensure key is loaded
-
-    async def main():
-        test_content = "LangChain Expression Language (LCEL) makes it easy to compose complex AI chains from simple components."
-        # test_content_empty = ""
-        # test_content_short = "AI"
-        if settings.OPENAI_API_KEY:
-            suggested_tags = await suggest_tags_for_content(test_content)
-            print(f"Suggested tags: {suggested_tags}")
-        else:
-            print("Skipping example usage: OPENAI_API_KEY not found.")
-
-    # asyncio.run(main()) # Requires Python 3.7+
-    # For broader compatibility:
-    loop = asyncio.get_event_loop()
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
+
+from app.core.config import settings
+from app.ai.llm import LLMRegistry, get_llm_registry
+
+# Setup logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TAG_CHAIN = "suggest_tags"
+
+TAG_PROMPT = ChatPromptTemplate.from_template(
+    """Analyze the following text and extract the 3 to 5 most relevant and concise keywords or tags.
+Present the tags as a comma-separated list ONLY, with no introductory text or numbering.
+Ensure tags are lowercase.
+Example: artificial intelligence, machine learning, data science
+
+Text:
+{text_content}"""
+)
+
+def _build_tag_chain(registry: LLMRegistry) -> Runnable:
+    return TAG_PROMPT | registry.chat_model(temperature=0.2) | StrOutputParser()
+
+BATCH_TAG_CHAIN = "suggest_tags_batch"
+
+BATCH_TAG_PROMPT = ChatPromptTemplate.from_template(
+    """For each note below, extract the 3 to 5 most relevant and concise keywords or tags.
+Reply with a JSON object ONLY that maps every note id to a list of lowercase tags.
+Example: {{"12": ["machine learning", "data science"], "15": ["cooking"]}}
+
+Notes:
+{notes}"""
+)
+
+def _build_batch_tag_chain(registry: LLMRegistry) -> Runnable:
+    # JSON mode makes the reply parseable; notes it still gets wrong fall back to single calls
+    llm = registry.chat_model(temperature=0.2).bind(response_format={"type": "json_object"})
+    return BATCH_TAG_PROMPT | llm | StrOutputParser()
+
+MAX_TAGS_PER_NOTE = 2
+CHARS_PER_TOKEN = 4 # Rough token estimate, good enough for budgeting prompts
+
+def _clean_tags(tags: List[str]) -> List[str]:
+    # Strip whitespace, convert to lowercase, filter empty strings, keep the first MAX_TAGS_PER_NOTE
+    return [tag.strip().lower() for tag in tags if tag.strip()][:MAX_TAGS_PER_NOTE]
+
+async def suggest_tags_for_content(content: str) -> List[str]:
+    """
+    Analyzes text content using an LLM to suggest relevant tags.
+
+    Args:
+        content: The text content to analyze.
+
+    Returns:
+        A list of suggested tags, or an empty list if generation fails or content is empty.
+    """
+    if not content or not content.strip():
+        logger.info("Content is empty, skipping tag suggestion.")
+        return []
+
+    logger.info(f"Suggesting tags for content (truncated): {content[:100]}...")
+
+    try:
+        if not settings.OPENAI_API_KEY:
+            logger.error("OPENAI_API_KEY not configured. Cannot suggest tags.")
+            return []
+
+        # 2.4. Shared chat model and compiled chain (built once per process)
+        registry = get_llm_registry()
+        tag_chain = registry.chain(TAG_CHAIN, _build_tag_chain)
+
+        # 2.5. Invoke Chain (rate- and concurrency-limited by the registry) & Log Raw Output
+        raw_llm_output = await registry.ainvoke(tag_chain, {"text_content": content})
+        logger.info(f"Raw LLM Output for tags: {raw_llm_output}")
+
+        # 2.6. Implement Output Parsing
+        if not raw_llm_output:
+             logger.warning("LLM returned empty output for tags.")
+             return []
+
+        # Split by comma and limit to a maximum of two tags
+        tags = _clean_tags(raw_llm_output.split(','))
+
+        logger.info(f"Parsed tags (limited to 2): {tags}")
+        return tags
+
+    except Exception as e:
+        # 2.7. Error Handling & Logging
+        logger.error(f"Error suggesting tags: {e}", exc_info=True)
+        return []
+
+def _pack_tag_batches(
+    notes: List[Tuple[int, str]], token_budget: int, max_notes: int, max_note_tokens: int
+) -> List[List[Tuple[int, str]]]:
+    """Groups (note_id, content) pairs into prompts of at most max_notes notes and about
+       token_budget tokens. Content is truncated to max_note_tokens so one long note
+       cannot crowd out the rest.
+    """
+    batches: List[List[Tuple[int, str]]] = []
+    current: List[Tuple[int, str]] = []
+    used = 0
+    for note_id, content in notes:
+        text = content.strip()[:max_note_tokens * CHARS_PER_TOKEN]
+        cost = len(text) // CHARS_PER_TOKEN + 10 # + the note's header line
+        if current and (used + cost > token_budget or len(current) >= max_notes):
+            batches.append(current)
+            current, used = [], 0
+        current.append((note_id, text))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def _parse_batch_tags(raw_llm_output: str, note_ids: List[int]) -> Dict[int, List[str]]:
+    """Parses the JSON reply of the batch prompt. Notes missing from it or with a
+       malformed entry are left out (the caller tags those one by one).
+    """
+    text = (raw_llm_output or "").strip()
+    if text.startswith("```"): # Tolerate a fenced reply
+        text = text.strip("`").removeprefix("json").strip()
+    parsed = json.loads(text)
+    if not isinstance(parsed, dict):
+        raise ValueError(f"Expected a JSON object, got {type(parsed).__name__}")
+    tags_by_note: Dict[int, List[str]] = {}
+    for note_id in note_ids:
+        tags = parsed.get(str(note_id))
+        if isinstance(tags, str):
+            tags = tags.split(',')
+        if isinstance(tags, list) and all(isinstance(tag, str) for tag in tags):
+            tags_by_note[note_id] = _clean_tags(tags)
+    return tags_by_note
+
+async def _suggest_tags_for_batch(registry: LLMRegistry, batch: List[Tuple[int, str]]) -> Dict[int, List[str]]:
+    note_ids = [note_id for note_id, _ in batch]
+    prompt_notes = "\n\n".join(f"### Note {note_id}\n{text}" for note_id, text in batch)
+    try:
+        chain = registry.chain(BATCH_TAG_CHAIN, _build_batch_tag_chain)
+        raw_llm_output = await registry.ainvoke(chain, {"notes": prompt_notes})
+        tags_by_note = _parse_batch_tags(raw_llm_output, note_ids)
+    except Exception as e:
+        logger.warning(f"Batch tag suggestion for notes {note_ids} failed, tagging them one by one: {e}")
+        tags_by_note = {}
+
+    missing = [(note_id, text) for note_id, text in batch if note_id not in tags_by_note]
+    if missing:
+        if len(missing) < len(batch):
+            logger.warning(f"Batch tag reply had no usable tags for notes {[note_id for note_id, _ in missing]}; tagging them one by one.")
+        fallback = await asyncio.gather(*(suggest_tags_for_content(text) for _, text in missing))
+        tags_by_note.update({note_id: tags for (note_id, _), tags in zip(missing, fallback)})
+    return tags_by_note
+
+async def suggest_tags_for_notes(
+    notes: Dict[int, str],
+    token_budget: Optional[int] = None,
+    max_notes: Optional[int] = None,
+) -> Dict[int, List[str]]:
+    """
+    Suggests tags for many notes with few LLM calls. Notes are packed into JSON-mode
+    prompts under a token budget; batches run concurrently within the registry's limits.
+
+    Args:
+        notes: {note_id: content}. Empty contents get no tags.
+        token_budget: Approximate input tokens per prompt (defaults to TAG_BATCH_TOKEN_BUDGET).
+        max_notes: Notes per prompt (defaults to TAG_BATCH_MAX_NOTES).
+
+    Returns:
+        {note_id: tags} for every given note. Notes the batch reply misses are tagged with
+        suggest_tags_for_content; notes that still fail get an empty list.
+    """
+    tags_by_note: Dict[int, List[str]] = {note_id: [] for note_id in notes}
+    to_tag = [(note_id, content) for note_id, content in notes.items() if content and content.strip()]
+    if not to_tag:
+        return tags_by_note
+    if not settings.OPENAI_API_KEY:
+        logger.error("OPENAI_API_KEY not configured. Cannot suggest tags.")
+        return tags_by_note
+    if len(to_tag) == 1: # Nothing to batch
+        note_id, content = to_tag[0]
+        tags_by_note[note_id] = await suggest_tags_for_content(content)
+        return tags_by_note
+
+    batches = _pack_tag_batches(
+        to_tag,
+        token_budget=token_budget or settings.TAG_BATCH_TOKEN_BUDGET,
+        max_notes=max_notes or settings.TAG_BATCH_MAX_NOTES,
+        max_note_tokens=settings.TAG_BATCH_MAX_NOTE_TOKENS,
+    )
+    logger.info(f"Suggesting tags for {len(to_tag)} notes in {len(batches)} batched LLM calls.")
+    try:
+        registry = get_llm_registry()
+    except Exception as e:
+        logger.error(f"Error suggesting tags: {e}", exc_info=True)
+        return tags_by_note
+    for result in await asyncio.gather(*(_suggest_tags_for_batch(registry, batch) for batch in batches)):
+        tags_by_note.update(result)
+    return tags_by_note
+
+# Example usage (for potential direct testing)
+if __name__ == '__main__':
+    import asyncio
+    import os
+    # Make sure to load .env for local testing if needed
+    # from dotenv import load_dotenv
+    # load_dotenv()
+    # settings.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") # Ensure key is loaded
+
+    async def main():
+        test_content = "LangChain Expression Language (LCEL) makes it easy to compose complex AI chains from simple components."
+        # test_content_empty = ""
+        # test_content_short = "AI"
+        if settings.OPENAI_API_KEY:
+            suggested_tags = await suggest_tags_for_content(test_content)
+            print(f"Suggested tags: {suggested_tags}")
+        else:
+            print("Skipping example usage: OPENAI_API_KEY not found.")
+
+    # asyncio.run(main()) # Requires Python 3.7+
+    # For broader compatibility:
+    loop = asyncio.get_event_loop()
     loop.run_until_complete(main())
\ No newline at end of file
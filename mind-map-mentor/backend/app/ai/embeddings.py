@@ -1,47 +1,553 @@
-# Functions for text embedding generation 
+# Functions for text embedding generation
 
+import asyncio
+import hashlib
 import logging
-from typing import List
+import queue
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from app.core.config import settings
+from app.db.session import SessionLocal
 
 logger = logging.getLogger(__name__)
 
 # Global variable to hold the embedding instance
 _embedding_function = None
 
-# Specify the model name corresponding to 1536 dimensions
+# 1536 dimensions unless shortened with settings.EMBEDDING_DIMENSIONS
 # Note: Ensure your OpenAI plan supports this model
 OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
 
-def initialize_embedding_function():
-    """Initializes the OpenAI embedding function client."""
-    global _embedding_function
-    if not settings.OPENAI_API_KEY:
-        logger.error("OpenAI API Key not found in settings. Cannot initialize embedding function.")
-        raise ValueError("OPENAI_API_KEY is not configured.")
-    
-    try:
-        _embedding_function = OpenAIEmbeddings(
+EMBEDDING_PROVIDER_OPENAI = "openai"
+EMBEDDING_PROVIDER_LOCAL = "local"
+
+
+def hash_text(text: str) -> str:
+    """Returns the sha256 hex digest used as the embedding cache key for a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack_embedding(embedding: List[float]) -> bytes:
+    return array("f", embedding).tobytes()
+
+
+def _unpack_embedding(packed: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(packed)
+    return values.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with a content-hash cache in front of the real provider.
+
+    Lookups go to an in-memory LRU first, then to the `embedding_cache` table,
+    and only the remaining texts are sent to the wrapped embedder (in one call).
+    Keys are (model, sha256(text)), so unchanged content is never re-embedded.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        max_memory_items: int = 10000,
+        persistent: bool = True,
+        session_factory: Callable = SessionLocal,
+        max_rows: Optional[int] = None,
+        max_age_days: Optional[int] = None,
+        prune_interval: int = 1000,
+    ):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self.persistent = persistent
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_age_days = max_age_days
+        self.prune_interval = prune_interval
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.stats: Dict[str, int] = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "db_errors": 0,
+        }
+
+    # --- In-memory LRU tier ---
+
+    def _memory_get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+            return embedding
+
+    def _memory_put(self, key: str, embedding: List[float]):
+        with self._lock:
+            self._memory[key] = embedding
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+                self.stats["memory_evictions"] += 1
+
+    # --- Postgres tier (best effort: failures only cost an extra provider call) ---
+
+    def _db_get(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not self.persistent or not keys:
+            return {}
+        # Imported lazily: app.crud imports this module (via crud_note) while it initializes
+        from app.crud import crud_embedding_cache
+        db = self.session_factory()
+        try:
+            found = crud_embedding_cache.get_cached_embeddings(db, model=self.model_name, text_hashes=keys)
+            return {key: _unpack_embedding(packed) for key, (_, packed) in found.items()}
+        except Exception as e:
+            self.stats["db_errors"] += 1
+            logger.warning(f"Embedding cache lookup failed, falling back to provider: {e}")
+            db.rollback()
+            return {}
+        finally:
+            db.close()
+
+    def _db_put(self, entries: Dict[str, List[float]]):
+        if not self.persistent or not entries:
+            return
+        from app.crud import crud_embedding_cache
+        db = self.session_factory()
+        try:
+            crud_embedding_cache.store_embeddings(
+                db,
+                model=self.model_name,
+                entries={key: (len(embedding), _pack_embedding(embedding)) for key, embedding in entries.items()},
+            )
+            with self._lock:
+                self._writes_since_prune += len(entries)
+                prune_due = self._writes_since_prune >= self.prune_interval
+                if prune_due:
+                    self._writes_since_prune = 0
+            if prune_due and (self.max_rows or self.max_age_days):
+                crud_embedding_cache.prune_embedding_cache(db, max_rows=self.max_rows, max_age_days=self.max_age_days)
+        except Exception as e:
+            self.stats["db_errors"] += 1
+            logger.warning(f"Failed to store embeddings in cache: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    # --- Embeddings interface ---
+
+    def _embed(self, texts: List[str], provider_call: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        keys = [hash_text(text) for text in texts]
+        results: Dict[str, List[float]] = {}
+
+        for key in keys:
+            if key in results:
+                continue
+            embedding = self._memory_get(key)
+            if embedding is not None:
+                results[key] = embedding
+                self.stats["memory_hits"] += 1
+
+        missing = [key for key in dict.fromkeys(keys) if key not in results]
+        if missing:
+            from_db = self._db_get(missing)
+            self.stats["db_hits"] += len(from_db)
+            for key, embedding in from_db.items():
+                results[key] = embedding
+                self._memory_put(key, embedding)
+
+        # Texts still missing are embedded by the provider in a single call
+        to_embed: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in results and key not in to_embed:
+                to_embed[key] = text
+        if to_embed:
+            self.stats["misses"] += len(to_embed)
+            embeddings = provider_call(list(to_embed.values()))
+            fresh = dict(zip(to_embed.keys(), embeddings))
+            for key, embedding in fresh.items():
+                results[key] = embedding
+                self._memory_put(key, embedding)
+            self._db_put(fresh)
+
+        return [results[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts), self.underlying.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], lambda missing: [self.underlying.embed_query(missing[0])])[0]
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for query embeddings: case-folded with whitespace collapsed."""
+    return " ".join(text.split()).casefold()
+
+
+class _InFlight:
+    """A provider call that concurrent callers of the same query wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+
+
+class QueryEmbeddingCache(Embeddings):
+    """TTL-bounded LRU of query embeddings with a single-flight guard.
+
+    Searches and RAG questions are repeated and refined constantly, so query
+    embeddings are cached by normalised text. Concurrent identical queries share
+    one in-flight provider call instead of each paying the round trip.
+    Document embeddings pass straight through to the wrapped embedder.
+    """
+
+    def __init__(self, underlying: Embeddings, max_items: int = 2048, ttl_seconds: float = 600):
+        self.underlying = underlying
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict() # key -> (expires_at, embedding)
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, embedding = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return embedding
+                del self._entries[key]
+                self.stats["expired"] += 1
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _InFlight()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            # The caller's text is embedded as is; the normalised form is only the cache and single-flight key
+            flight.result = self.underlying.embed_query(text)
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, flight.result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_items:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+            return flight.result
+        except BaseException as e:
+            flight.error = e # Waiters see the same failure instead of retrying in a stampede
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.done.set()
+
+
+class EmbeddingBackpressureError(RuntimeError):
+    """Raised when the dispatcher queue stays full for longer than the submit timeout."""
+
+
+class _BatchRequest:
+    """Texts of one caller waiting to be embedded, plus the future it waits on."""
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+
+
+class EmbeddingDispatcher(Embeddings):
+    """Micro-batches concurrent embedding calls into one embed_documents call.
+
+    Callers enqueue their texts and wait on a future. A collector thread gathers
+    requests for up to `max_wait_ms` (or until `max_batch_size` texts are waiting),
+    sends them to the wrapped provider in a single call on a pool of `concurrency`
+    threads, and hands every caller its slice of the result.
+
+    Backpressure: at most `max_pending` texts may be queued or in flight; further
+    submits block for up to `submit_timeout` seconds, then raise
+    EmbeddingBackpressureError. `stats` tracks the batch fill ratio.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        max_pending: int = 2048,
+        concurrency: int = 4,
+        submit_timeout: float = 30.0,
+        name: str = "embedding-dispatcher",
+    ):
+        self.underlying = underlying
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.submit_timeout = submit_timeout
+
+        self._requests: "queue.Queue[Optional[_BatchRequest]]" = queue.Queue()
+        self._pending_texts = 0
+        self._capacity = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=name)
+        self.stats: Dict[str, float] = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "backpressure_waits": 0,
+            "rejected": 0,
+            "errors": 0,
+            "avg_fill_ratio": 0.0, # texts per batch / max_batch_size
+        }
+        self._collector = threading.Thread(target=self._collect_loop, name=f"{name}-collector", daemon=True)
+        self._collector.start()
+
+    # --- Collector / batch execution ---
+
+    def _collect_loop(self):
+        while True:
+            first = self._requests.get()
+            if first is None:
+                return
+            batch = [first]
+            size = len(first.texts)
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._executor.submit(self._run_batch, batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch: List[_BatchRequest]):
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = self.underlying.embed_documents(texts)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"Batched embedding of {len(texts)} texts ({len(batch)} requests) failed: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+        else:
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+        finally:
+            with self._capacity:
+                self._pending_texts -= len(texts)
+                batches = self.stats["batches"] = self.stats["batches"] + 1
+                fill = min(len(texts) / self.max_batch_size, 1.0)
+                self.stats["avg_fill_ratio"] += (fill - self.stats["avg_fill_ratio"]) / batches
+                self._capacity.notify_all()
+
+    def _submit(self, texts: List[str]) -> Future:
+        request = _BatchRequest(list(texts))
+        if not request.texts:
+            request.future.set_result([])
+            return request.future
+        with self._capacity:
+            if self._closed:
+                raise RuntimeError("Embedding dispatcher is closed.")
+            # A single request larger than max_pending is admitted once the queue is empty
+            def has_room():
+                return self._pending_texts == 0 or self._pending_texts + len(request.texts) <= self.max_pending
+            if not has_room():
+                self.stats["backpressure_waits"] += 1
+                if not self._capacity.wait_for(has_room, timeout=self.submit_timeout):
+                    self.stats["rejected"] += 1
+                    raise EmbeddingBackpressureError(
+                        f"Embedding queue full ({self._pending_texts} texts pending) for {self.submit_timeout}s."
+                    )
+            self._pending_texts += len(request.texts)
+            self.stats["requests"] += 1
+            self.stats["texts"] += len(request.texts)
+        self._requests.put(request)
+        return request.future
+
+    # --- Embeddings interface ---
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._submit(texts).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Submitting can block on backpressure, so it runs off the event loop
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, self._submit, texts)
+        return await asyncio.wrap_future(future)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def close(self):
+        """Finishes queued batches and stops the collector and worker threads."""
+        with self._capacity:
+            self._closed = True
+        self._requests.put(None)
+        self._collector.join()
+        self._executor.shutdown(wait=True)
+        if hasattr(self.underlying, "close"):
+            self.underlying.close()
+
+
+def _create_provider_embedder() -> Tuple[Embeddings, str]:
+    """Creates the embedder for settings.EMBEDDING_PROVIDER, behind the micro-batching
+       dispatcher when enabled. Returns (embedder, model name).
+    """
+    if settings.EMBEDDING_PROVIDER == EMBEDDING_PROVIDER_LOCAL:
+        # Imported lazily so OpenAI-only deployments don't need sentence-transformers/torch
+        from app.ai.local_embeddings import LocalSentenceTransformerEmbeddings
+        model_name = settings.LOCAL_EMBEDDING_MODEL
+        embedder: Embeddings = LocalSentenceTransformerEmbeddings(
+            model_name=model_name,
+            device=settings.LOCAL_EMBEDDING_DEVICE,
+            encode_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            dimensions=settings.EMBEDDING_DIMENSIONS,
+        )
+        # The model is not thread-safe: all inference goes through one dedicated thread
+        concurrency = 1
+    elif settings.EMBEDDING_PROVIDER == EMBEDDING_PROVIDER_OPENAI:
+        if not settings.OPENAI_API_KEY:
+            logger.error("OpenAI API Key not found in settings. Cannot initialize embedding function.")
+            raise ValueError("OPENAI_API_KEY is not configured.")
+        model_name = OPENAI_EMBEDDING_MODEL
+        embedder = OpenAIEmbeddings(
             model=OPENAI_EMBEDDING_MODEL,
+            dimensions=settings.EMBEDDING_DIMENSIONS, # The API shortens (and re-normalises) the vectors
             openai_api_key=settings.OPENAI_API_KEY # Explicitly pass, though often picked from env
         )
-        logger.info(f"Initialized OpenAI Embedding function with model: {OPENAI_EMBEDDING_MODEL}")
+        concurrency = settings.EMBEDDING_BATCH_CONCURRENCY
+    else:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER '{settings.EMBEDDING_PROVIDER}'.")
+    if settings.EMBEDDING_DIMENSIONS:
+        # Cached vectors of another size must not be reused
+        model_name = f"{model_name}@{settings.EMBEDDING_DIMENSIONS}d"
+
+    # Local inference always needs the dedicated thread, so only OpenAI can skip the dispatcher
+    if settings.EMBEDDING_BATCHING_ENABLED or settings.EMBEDDING_PROVIDER == EMBEDDING_PROVIDER_LOCAL:
+        embedder = EmbeddingDispatcher(
+            underlying=embedder,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+            max_pending=settings.EMBEDDING_BATCH_MAX_PENDING,
+            concurrency=concurrency,
+            submit_timeout=settings.EMBEDDING_BATCH_SUBMIT_TIMEOUT_SECONDS,
+        )
+    return embedder, model_name
+
+def initialize_embedding_function():
+    """Initializes the configured embedding provider (OpenAI or a local sentence-transformers model),
+       wrapped in the embedding caches if enabled. Safe to call more than once.
+    """
+    global _embedding_function
+    if _embedding_function is not None:
+        return
+
+    try:
+        embedder, model_name = _create_provider_embedder()
+        if settings.EMBEDDING_CACHE_ENABLED:
+            embedder = CachedEmbeddings(
+                underlying=embedder,
+                model_name=model_name,
+                max_memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+                max_rows=settings.EMBEDDING_CACHE_MAX_ROWS,
+                max_age_days=settings.EMBEDDING_CACHE_MAX_AGE_DAYS,
+                prune_interval=settings.EMBEDDING_CACHE_PRUNE_INTERVAL,
+            )
+        if settings.QUERY_EMBEDDING_CACHE_ENABLED:
+            embedder = QueryEmbeddingCache(
+                underlying=embedder,
+                max_items=settings.QUERY_EMBEDDING_CACHE_SIZE,
+                ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+            )
+        _embedding_function = embedder
+        logger.info(f"Initialized {settings.EMBEDDING_PROVIDER} embedding function with model: {model_name} (cache enabled: {settings.EMBEDDING_CACHE_ENABLED})")
     except Exception as e:
-        logger.error(f"Failed to initialize OpenAI Embeddings: {e}")
+        logger.error(f"Failed to initialize embeddings ({settings.EMBEDDING_PROVIDER}): {e}")
         _embedding_function = None # Ensure it's None if init fails
         raise
 
-def get_embedding_function() -> OpenAIEmbeddings:
-    """Returns the initialized OpenAI embedding function. Initializes if needed."""
+def close_embedding_function():
+    """Stops the dispatcher threads (and with them the local model's inference thread)."""
+    global _embedding_function
+    embedder = _embedding_function
+    while not hasattr(embedder, "close") and hasattr(embedder, "underlying"): # Unwrap the caches
+        embedder = embedder.underlying
+    if hasattr(embedder, "close"):
+        embedder.close()
+    _embedding_function = None
+
+def get_embedding_function() -> Embeddings:
+    """Returns the initialized embedding function. Initializes if needed."""
     if _embedding_function is None:
-        logger.warning("OpenAI embedding function accessed before initialization. Initializing now.")
+        logger.warning("Embedding function accessed before initialization. Initializing now.")
         initialize_embedding_function()
         if _embedding_function is None: # Check again
-            raise RuntimeError("OpenAI Embedding function could not be initialized.")
+            raise RuntimeError("Embedding function could not be initialized.")
     return _embedding_function
 
+def get_embedding_stats() -> Dict[str, Dict[str, float]]:
+    """Returns the counters of the query cache, the content-hash cache and the batching
+       dispatcher (components that are disabled are left out).
+    """
+    stats: Dict[str, Dict[str, float]] = {}
+    embedder = _embedding_function
+    while embedder is not None:
+        if isinstance(embedder, QueryEmbeddingCache):
+            stats["query_cache"] = dict(embedder.stats)
+        elif isinstance(embedder, CachedEmbeddings):
+            stats["content_cache"] = dict(embedder.stats)
+        elif isinstance(embedder, EmbeddingDispatcher):
+            stats["dispatcher"] = dict(embedder.stats)
+        embedder = getattr(embedder, "underlying", None)
+    return stats
+
 def generate_embeddings(texts: List[str]) -> List[List[float]]:
     """Generates embeddings for a list of texts."""
     embedder = get_embedding_function()
@@ -52,4 +558,4 @@ def generate_embedding(text: str) -> List[float]:
     embedder = get_embedding_function()
     return embedder.embed_query(text) # Use embed_query for single text/queries
 
-# Consider initializing at startup similar to Pinecone 
\ No newline at end of file
+# Consider initializing at startup similar to Pinecone
\ No newline at end of file
@@ -0,0 +1,250 @@
+"""Asynchronous note enrichment: AI tagging, vector upserts and auto-linking.
+
+These steps used to run inline in crud_note.create_note/update_note. They are now
+queued as `enrich_note` jobs (see app.crud.crud_job) and executed by app.worker.
+Edits to the same note are coalesced into one pending job (debounced write-behind),
+and all jobs the worker claims together share one batched vector upsert.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from app.crud import crud_graph, crud_job, crud_note
+from app.crud.crud_note import ENRICHMENT_PROCESSING, ENRICHMENT_DONE
+from app.ai.vectorstore import aupsert_documents_bulk_detailed, adelete_documents, afetch_note_embeddings
+from app.ai.agents.organizer import suggest_tags_for_notes
+from app.ai.agents.keywords import (
+    TAG_ENGINE_LLM, TAG_ENGINE_LOCAL, TAG_ENGINE_HYBRID, suggest_keyword_tags, update_keyword_stats
+)
+from app.ai.tag_cache import content_signature, resolve_cached_tags, remember_tags
+from app.core.config import settings
+from app.models.note import Note
+from app.models.enrichment_job import EnrichmentJob
+
+logger = logging.getLogger(__name__)
+
+def set_enrichment_status(db: Session, note: Note, status: str) -> bool:
+    """Stores the enrichment status on the note (own commit).
+       Written with a query-level UPDATE, so a note deleted meanwhile is skipped (returns False)
+       instead of failing the flush with StaleDataError.
+    """
+    note_id = inspect(note).identity[0] # Available without reloading a deleted row
+    updated = (
+        db.query(Note)
+        .filter(Note.id == note_id)
+        .update({Note.enrichment_status: status}, synchronize_session=False)
+    )
+    db.commit()
+    return updated > 0
+
+def _existing_note_ids(db: Session, note_ids: List[int]) -> set:
+    if not note_ids:
+        return set()
+    return {note_id for (note_id,) in db.query(Note.id).filter(Note.id.in_(note_ids)).all()}
+
+def _current_tags(db: Session, note: Note) -> List[str]:
+    if note.graph_node_id is None:
+        return []
+    graph_node = crud_graph.get_graph_node(db, node_id=note.graph_node_id, user_id=note.user_id)
+    if graph_node and graph_node.data:
+        return graph_node.data.get('tags') or []
+    return []
+
+def note_vector_payload(note: Note, tags: List[str]) -> Dict[str, Any]:
+    """Builds the upsert_documents_bulk item for a note."""
+    return {
+        "note_id": note.id,
+        "text_content": note.content or "",
+        "summary_text": note.user_summary,
+        "metadata": {
+            "note_id": note.id,
+            "user_id": note.user_id,
+            "title": note.title,
+            "type": "note",
+            "tags": tags
+        },
+    }
+
+def _apply_ai_tags(db: Session, note: Note, tags: List[str]) -> bool:
+    """Writes the suggested tags to the note's graph node. Returns False if the update failed
+       (update_graph_node_tags logs and rolls back instead of raising).
+    """
+    logger.info(f"Suggested tags for note {note.id}: {tags}")
+    if note.graph_node_id is None:
+        return True
+    return crud_graph.update_graph_node_tags(db=db, graph_node_id=note.graph_node_id, tags=tags, user_id=note.user_id) is not None
+
+async def suggest_note_tags(
+    db: Session, notes: Dict[int, Note], current_tags: Dict[int, List[str]], use_cache: bool = True
+) -> Dict[int, List[str]]:
+    """Suggests tags with the configured TAG_ENGINE. Local keyword tags are used as they are
+       ("local") or when confident enough ("hybrid"); the remaining notes are looked up in the
+       tag cache (unless use_cache is False) and then tagged by the LLM in batched calls.
+       Returns {note_id: tags} for every given note.
+    """
+    suggested: Dict[int, List[str]] = {}
+    pending_notes = dict(notes)
+    if settings.TAG_ENGINE in (TAG_ENGINE_LOCAL, TAG_ENGINE_HYBRID):
+        for note_id, result in suggest_keyword_tags(db, list(notes.values())).items():
+            if settings.TAG_ENGINE == TAG_ENGINE_LOCAL or result.confidence >= settings.KEYWORD_MIN_CONFIDENCE:
+                suggested[note_id] = result.tags
+                pending_notes.pop(note_id)
+        db.commit() # Document frequency updates
+        logger.info(f"Local tag engine tagged {len(suggested)} of {len(notes)} notes.")
+    if not pending_notes:
+        return suggested
+
+    if settings.TAG_CACHE_ENABLED and use_cache:
+        resolved, signatures = resolve_cached_tags(db, pending_notes, current_tags)
+        suggested.update(resolved)
+    elif settings.TAG_CACHE_ENABLED:
+        signatures = {note_id: content_signature(note.content) for note_id, note in pending_notes.items()}
+    else:
+        signatures = dict.fromkeys(pending_notes)
+    from_llm = await suggest_tags_for_notes({note_id: pending_notes[note_id].content for note_id in signatures}) if signatures else {}
+    if settings.TAG_CACHE_ENABLED and from_llm:
+        try:
+            remember_tags(db, signatures, from_llm)
+        except Exception as e: # Best effort: a missed cache write only costs a later LLM call
+            logger.warning(f"Failed to cache tag suggestions: {e}")
+            db.rollback()
+    suggested.update(from_llm)
+    return suggested
+
+async def _auto_link(db: Session, note: Note) -> None:
+    """Summary and content auto-linking. Both stored vectors are fetched in one call and
+       searched directly, so linking costs no embedding round trip.
+    """
+    stored_vectors = await afetch_note_embeddings(note.id, user_id=note.user_id)
+    for embedding_type, threshold in (
+        ("summary", crud_note.SIMILARITY_THRESHOLD_SUMMARY),
+        ("content", crud_note.SIMILARITY_THRESHOLD_CONTENT),
+    ):
+        if embedding_type not in stored_vectors:
+            logger.warning(f"No stored {embedding_type} vector for note {note.id}; skipping {embedding_type} auto-linking.")
+            continue
+        await crud_note._find_and_create_similar_note_edges(
+            db=db,
+            new_note=note,
+            user_id=note.user_id,
+            threshold=threshold,
+            embedding_type=embedding_type,
+            query_vector=stored_vectors[embedding_type]
+        )
+
+async def _delete_vectors_of_deleted_notes(db: Session, upserted: Dict[int, int]) -> List[int]:
+    """Deletes the vectors just written for notes that were deleted meanwhile (upserted: note_id -> user_id).
+       Returns the IDs of those notes.
+    """
+    if not upserted:
+        return []
+    existing = {note_id for (note_id,) in db.query(Note.id).filter(Note.id.in_(list(upserted))).all()}
+    gone_by_user: Dict[int, List[int]] = {}
+    for note_id, user_id in upserted.items():
+        if note_id not in existing:
+            gone_by_user.setdefault(user_id, []).append(note_id)
+    for user_id, note_ids in gone_by_user.items():
+        logger.info(f"Notes {note_ids} were deleted during enrichment; removing their fresh vectors.")
+        try:
+            await adelete_documents(note_ids, user_id=user_id)
+        except Exception as e:
+            logger.error(f"Failed to delete vectors of deleted notes {note_ids}: {e}", exc_info=True)
+    return [note_id for note_ids in gone_by_user.values() for note_id in note_ids]
+
+async def enrich_notes(db: Session, jobs: List[EnrichmentJob]) -> Dict[int, Optional[str]]:
+    """Runs a batch of claimed enrich_note jobs. Tags are suggested in batched LLM calls and
+       the vectors of all notes go out in one batched upsert (write-behind flush); auto-links run per note.
+       Jobs of the same note are merged. Notes deleted before or during the run are skipped
+       (their jobs are deleted with them), and vectors written for them are deleted again.
+       Returns {job_id: error message, or None on success}.
+    """
+    job_ids = [crud_job.job_identity(job) for job in jobs]
+    errors: Dict[int, Optional[str]] = {job_id: None for job_id in job_ids}
+    # Job fields are read in one query up front: a job row disappears when its note is deleted
+    job_ids_by_note: Dict[int, List[int]] = {}
+    user_ids: Dict[int, int] = {}
+    steps: Dict[int, Dict[str, bool]] = {}
+    for job_id, note_id, user_id, payload in (
+        db.query(EnrichmentJob.id, EnrichmentJob.note_id, EnrichmentJob.user_id, EnrichmentJob.payload)
+        .filter(EnrichmentJob.id.in_(job_ids))
+        .all()
+    ):
+        job_ids_by_note.setdefault(note_id, []).append(job_id)
+        user_ids.setdefault(note_id, user_id)
+        note_steps = steps.setdefault(note_id, {"tags": False, "vectors": False, "links": False})
+        for step in note_steps:
+            note_steps[step] = note_steps[step] or bool((payload or {}).get(step))
+
+    notes: Dict[int, Note] = {}
+    for note_id, user_id in user_ids.items():
+        note = crud_note.get_note(db, note_id=note_id, user_id=user_id)
+        if not note:
+            logger.info(f"Skipping enrichment: Note {note_id} no longer exists.")
+            continue
+        notes[note_id] = note
+        set_enrichment_status(db, note, ENRICHMENT_PROCESSING)
+
+    def fail(note_id: int, error: str):
+        logger.error(f"Enrichment of note {note_id} failed: {error}")
+        for job_id in job_ids_by_note[note_id]:
+            errors[job_id] = error
+        notes.pop(note_id, None)
+
+    def drop_deleted_notes():
+        # Notes deleted while the batch ran are forgotten (touching their rows would raise)
+        existing = _existing_note_ids(db, list(notes))
+        for note_id in [note_id for note_id in notes if note_id not in existing]:
+            logger.info(f"Note {note_id} was deleted during enrichment; skipping its remaining steps.")
+            notes.pop(note_id)
+
+    # 1. Tags: local keywords, cached or barely edited content skip the LLM, the rest is batched
+    if settings.TAG_ENGINE != TAG_ENGINE_LLM:
+        content_changed = [note for note_id, note in notes.items() if steps[note_id]["tags"] or steps[note_id]["vectors"]]
+        update_keyword_stats(db, content_changed)
+        db.commit()
+    to_tag = {
+        note_id: note
+        for note_id, note in notes.items()
+        if steps[note_id]["tags"] and note.content and note.content.strip()
+    }
+    current_tags = {note_id: _current_tags(db, note) for note_id, note in to_tag.items()}
+    suggested = await suggest_note_tags(db, to_tag, current_tags) if to_tag else {}
+    drop_deleted_notes()
+    for note_id, tags in suggested.items():
+        if note_id not in notes or not tags or tags == current_tags[note_id]:
+            continue # Keep existing tags when no tags were suggested (e.g. a failed LLM batch)
+        try:
+            if not _apply_ai_tags(db, notes[note_id], tags):
+                fail(note_id, "Tagging failed: the graph node could not be updated")
+        except Exception as e:
+            db.rollback()
+            fail(note_id, f"Tagging failed: {e}")
+
+    # 2. Vectors of all notes in one batched upsert (content + summary per note)
+    to_upsert = [
+        note_vector_payload(note, _current_tags(db, note))
+        for note_id, note in notes.items()
+        if steps[note_id]["vectors"]
+    ]
+    if to_upsert:
+        for note_id in await aupsert_documents_bulk_detailed(to_upsert):
+            fail(note_id, "Vector upsert failed")
+        upserted = {item["note_id"]: item["metadata"]["user_id"] for item in to_upsert if item["note_id"] in notes}
+        for note_id in await _delete_vectors_of_deleted_notes(db, upserted):
+            notes.pop(note_id, None)
+
+    # 3. Auto-linking (needs the vectors from step 2)
+    drop_deleted_notes()
+    for note_id, note in list(notes.items()):
+        if steps[note_id]["links"]:
+            await _auto_link(db, note)
+
+    for note_id, note in notes.items():
+        if set_enrichment_status(db, note, ENRICHMENT_DONE):
+            logger.info(f"Enrichment finished for note {note_id} (steps: {steps[note_id]}).")
+        else:
+            logger.info(f"Note {note_id} was deleted before its enrichment finished.")
+    return errors
@@ -0,0 +1,195 @@
+# Shared chat model clients and compiled chains
+
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Global variable to hold the registry instance
+_llm_registry = None
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second refill a bucket of `capacity` tokens.
+
+    Callers wait until a token is available, so bursts up to `capacity` go through
+    immediately and sustained traffic is smoothed to `rate`.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Takes `tokens` from the bucket, sleeping until they are available. Returns seconds waited."""
+        waited = 0.0
+        async with self._lock: # Waiters are served in order
+            self._refill()
+            while self._tokens < tokens:
+                delay = (tokens - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= tokens
+        return waited
+
+
+class LLMRegistry:
+    """Process-wide chat model clients sharing pooled HTTP connections.
+
+    Chat models are created once per (model, temperature) on top of one keep-alive
+    httpx client pair, and chains are compiled once per name (see `chain`).
+    `ainvoke` runs a chain behind the per-process concurrency limit and rate limiter.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        default_model: str = "gpt-4o-mini",
+        max_concurrency: int = 8,
+        requests_per_minute: float = 0,
+        burst: int = 10,
+        max_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 60.0,
+        max_retries: int = 2,
+    ):
+        self.api_key = api_key
+        self.default_model = default_model
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._http_client = httpx.Client(limits=limits, timeout=timeout)
+        self._http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # requests_per_minute <= 0 disables rate limiting (the concurrency limit still applies)
+        self._bucket = TokenBucket(rate=requests_per_minute / 60.0, capacity=burst) if requests_per_minute > 0 else None
+
+        self._models: Dict[Tuple[str, float], ChatOpenAI] = {}
+        self._chains: Dict[str, Runnable] = {}
+        self.stats: Dict[str, float] = {
+            "calls": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "rate_limited_seconds": 0.0,
+            "total_latency_seconds": 0.0,
+        }
+
+    def chat_model(self, model: Optional[str] = None, temperature: float = 0.2) -> ChatOpenAI:
+        """Returns the shared chat model for (model, temperature), creating it on first use."""
+        key = (model or self.default_model, temperature)
+        llm = self._models.get(key)
+        if llm is None:
+            llm = ChatOpenAI(
+                model_name=key[0],
+                temperature=temperature,
+                api_key=self.api_key,
+                max_retries=self.max_retries,
+                request_timeout=self.timeout,
+                http_client=self._http_client,
+                http_async_client=self._http_async_client,
+            )
+            self._models[key] = llm
+        return llm
+
+    def chain(self, name: str, build: Callable[["LLMRegistry"], Runnable]) -> Runnable:
+        """Returns the compiled chain `name`, building it with `build(registry)` on first use."""
+        compiled = self._chains.get(name)
+        if compiled is None:
+            compiled = build(self)
+            self._chains[name] = compiled
+            logger.info(f"Compiled LLM chain '{name}'.")
+        return compiled
+
+    async def ainvoke(self, chain: Runnable, inputs: Dict[str, Any]) -> Any:
+        """Invokes a chain once a rate-limit token and a concurrency slot are available."""
+        if self._bucket is not None:
+            self.stats["rate_limited_seconds"] += await self._bucket.acquire()
+        async with self._semaphore:
+            self.stats["calls"] += 1
+            self.stats["in_flight"] += 1
+            started = time.monotonic()
+            try:
+                return await chain.ainvoke(inputs)
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                self.stats["in_flight"] -= 1
+                self.stats["total_latency_seconds"] += time.monotonic() - started
+
+    async def aclose(self):
+        """Closes the pooled HTTP connections."""
+        self._http_client.close()
+        await self._http_async_client.aclose()
+
+
+def initialize_llm_registry():
+    """Creates the shared LLM registry from settings. Safe to call more than once."""
+    global _llm_registry
+    if _llm_registry is not None:
+        return
+    if not settings.OPENAI_API_KEY:
+        logger.error("OPENAI_API_KEY not configured. Cannot initialize the LLM registry.")
+        raise ValueError("OPENAI_API_KEY is not configured.")
+
+    _llm_registry = LLMRegistry(
+        api_key=settings.OPENAI_API_KEY,
+        default_model=settings.LLM_MODEL,
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        burst=settings.LLM_RATE_LIMIT_BURST,
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+    )
+    logger.info(
+        f"Initialized LLM registry (model={settings.LLM_MODEL}, max_concurrency={settings.LLM_MAX_CONCURRENCY}, "
+        f"requests_per_minute={settings.LLM_REQUESTS_PER_MINUTE})"
+    )
+
+async def close_llm_registry():
+    """Closes the registry's HTTP connections (no-op if it was never initialized)."""
+    global _llm_registry
+    registry = _llm_registry
+    _llm_registry = None
+    if registry is not None:
+        await registry.aclose()
+
+def get_llm_registry() -> LLMRegistry:
+    """Returns the initialized LLM registry. Initializes if needed."""
+    if _llm_registry is None:
+        logger.warning("LLM registry accessed before initialization. Initializing now.")
+        initialize_llm_registry()
+    return _llm_registry
+
+def get_llm_stats() -> Dict[str, float]:
+    """Returns the registry's call counters (empty if it was never initialized)."""
+    if _llm_registry is None:
+        return {}
+    stats = dict(_llm_registry.stats)
+    if stats["calls"]:
+        stats["avg_latency_seconds"] = stats["total_latency_seconds"] / stats["calls"]
+    return stats
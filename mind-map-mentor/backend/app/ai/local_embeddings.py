@@ -0,0 +1,57 @@
+# Local CPU embedding provider (sentence-transformers), selected with EMBEDDING_PROVIDER=local
+
+import logging
+import time
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # pragma: no cover - depends on the deployment
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+
+class LocalSentenceTransformerEmbeddings(Embeddings):
+    """Embeds texts in-process with a sentence-transformers model.
+
+    The model is loaded once, in the constructor. Calls are not thread-safe on their
+    own: app.ai.embeddings wraps this provider in an EmbeddingDispatcher with a single
+    worker, so all inference runs on one dedicated thread in micro-batches.
+    With `dimensions`, vectors are cut to their first dimensions and re-normalised,
+    which suits Matryoshka-trained models.
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu", encode_batch_size: int = 64, dimensions: Optional[int] = None):
+        if SentenceTransformer is None:
+            raise RuntimeError("EMBEDDING_PROVIDER=local requires the sentence-transformers package.")
+        self.model_name = model_name
+        self.encode_batch_size = encode_batch_size
+
+        started = time.perf_counter()
+        self._model = SentenceTransformer(model_name, device=device)
+        full_dimensions = self._model.get_sentence_embedding_dimension()
+        if dimensions and dimensions > full_dimensions:
+            raise ValueError(f"EMBEDDING_DIMENSIONS={dimensions} exceeds the {full_dimensions} dimensions of {model_name}.")
+        self.dimensions = dimensions or full_dimensions
+        logger.info(f"Loaded local embedding model {model_name} on {device} ({self.dimensions} dims) in {time.perf_counter() - started:.1f}s.")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self._model.encode(
+            list(texts),
+            batch_size=self.encode_batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )[:, :self.dimensions]
+        # Normalised after truncation: cosine similarity == dot product, as with OpenAI embeddings
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
@@ -0,0 +1,666 @@
+# In-process vector index used as an offline alternative to Pinecone
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+try:
+    import hnswlib  # Optional: only needed once a user crosses the HNSW threshold
+except ImportError:  # pragma: no cover - depends on the deployment
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+VECTOR_FILE_NAME = "vectors.f32"
+STORE_FILE_NAME = "store.sqlite3"
+HNSW_FILE_NAME = "hnsw.bin"
+
+# Storage precision of the vector file. float16 halves and int8 quarters the memory of
+# float32; int8 rows are scaled per row (max |x| -> 127), the scales live in SCALE_FILE_NAME.
+VECTOR_DTYPES = ("float32", "float16", "int8")
+VECTOR_FILE_NAMES = {"float32": VECTOR_FILE_NAME, "float16": "vectors.f16", "int8": "vectors.i8"}
+SCALE_FILE_NAME = "scales.f32"
+
+_MIN_CAPACITY = 64
+# Deletes only mark HNSW elements as deleted; the graph is rebuilt once this share of its elements is stale
+HNSW_MAX_DELETED_RATIO = 0.2
+# Rows converted to float32 at a time when scoring a quantised partition
+_SCORE_BLOCK_ROWS = 16384
+
+
+def _matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluates a Pinecone-style metadata filter against a metadata dict.
+       Supports plain equality plus the $eq, $ne, $in and $nin operators.
+    """
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalises each row so that a dot product equals cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Converts float32 rows to the storage dtype. Returns (rows, per-row scales for int8 or None)."""
+    if dtype == "int8":
+        max_abs = np.abs(vectors).max(axis=1)
+        max_abs[max_abs == 0] = 1.0
+        scales = (max_abs / 127.0).astype(np.float32)
+        return np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8), scales
+    return vectors.astype(np.dtype(dtype)), None
+
+
+def _dequantize(rows: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    """Inverse of _quantize (up to rounding): float32 rows."""
+    vectors = np.asarray(rows, dtype=np.float32)
+    if scales is not None:
+        vectors = vectors * np.asarray(scales, dtype=np.float32)[:, None]
+    return vectors
+
+
+class _UserPartition:
+    """All vectors of a single user, stored in one directory.
+
+    Vectors live in a memory-mapped file (float32, float16 or int8) that grows by
+    doubling. IDs, texts and metadata live in a small SQLite file next to it. Rows
+    are kept dense (slot == row number), deletes move the last row into the freed slot.
+    HNSW labels are slots: a delete updates the moved row's label and marks the vacated
+    last label as deleted, so the graph is only rebuilt after HNSW_MAX_DELETED_RATIO.
+    """
+
+    def __init__(self, path: Path, hnsw_threshold: int, hnsw_save_interval: int, dtype: str = "float32"):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported local vector dtype '{dtype}'; use one of {VECTOR_DTYPES}.")
+        self.path = path
+        self.hnsw_threshold = hnsw_threshold
+        self.hnsw_save_interval = hnsw_save_interval
+        self.lock = threading.RLock()
+
+        self.dtype = dtype
+        self.dim: Optional[int] = None
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.id_to_slot: Dict[str, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None # int8 only
+        self._generation = 0
+
+        self._hnsw = None
+        self._hnsw_generation = -1
+        self._unsaved_hnsw_changes = 0
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path / STORE_FILE_NAME), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            "slot INTEGER PRIMARY KEY, doc_id TEXT UNIQUE NOT NULL, text TEXT, metadata TEXT)"
+        )
+        self._conn.commit()
+        self._load()
+
+    # --- Loading / persistence ---
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Any):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    def _load(self):
+        dim = self._get_meta("dim")
+        self.dim = int(dim) if dim else None
+        configured_dtype = self.dtype
+        # Partitions written before the dtype was recorded are float32
+        self.dtype = self._get_meta("dtype") or ("float32" if self.dim else configured_dtype)
+        self._generation = int(self._get_meta("generation") or 0)
+        for slot, doc_id, text, metadata in self._conn.execute(
+            "SELECT slot, doc_id, text, metadata FROM rows ORDER BY slot"
+        ):
+            if slot != len(self.ids):
+                raise RuntimeError(f"Local vector index at {self.path} has a gap at slot {len(self.ids)}.")
+            self.ids.append(doc_id)
+            self.texts.append(text or "")
+            self.metadatas.append(json.loads(metadata) if metadata else {})
+            self.id_to_slot[doc_id] = slot
+
+        vector_file = self.path / VECTOR_FILE_NAMES[self.dtype]
+        if self.dim and vector_file.exists():
+            row_bytes = self.dim * np.dtype(self.dtype).itemsize
+            capacity = vector_file.stat().st_size // row_bytes
+            if capacity < len(self.ids):
+                raise RuntimeError(f"Local vector index at {self.path} has fewer vectors than rows.")
+            self._vectors = np.memmap(vector_file, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+            if self.dtype == "int8":
+                self._scales = np.memmap(self.path / SCALE_FILE_NAME, dtype=np.float32, mode="r+", shape=(capacity,))
+        logger.debug(f"Loaded local vector partition {self.path} with {len(self.ids)} {self.dtype} vectors.")
+        if self.dtype != configured_dtype:
+            self._convert(configured_dtype)
+
+    def _convert(self, dtype: str):
+        """Rewrites the vector file in another storage dtype (e.g. after LOCAL_VECTOR_DTYPE changed)."""
+        count = len(self.ids)
+        logger.info(f"Converting local vector partition {self.path} from {self.dtype} to {dtype} ({count} vectors).")
+        old_files = [self.path / VECTOR_FILE_NAMES[self.dtype]] + ([self.path / SCALE_FILE_NAME] if self.dtype == "int8" else [])
+        new_files = [self.path / VECTOR_FILE_NAMES[dtype]] + ([self.path / SCALE_FILE_NAME] if dtype == "int8" else [])
+        if self._vectors is not None:
+            # Written to temp files and swapped in, so a failed conversion leaves the old file intact
+            capacity = max(_MIN_CAPACITY, count)
+            rows, scales = _quantize(self._read_rows(0, count), dtype)
+            converted = [(rows, dtype, (capacity, self.dim))] + ([(scales, np.float32, (capacity,))] if scales is not None else [])
+            for target, (data, file_dtype, shape) in zip(new_files, converted):
+                tmp_file = target.with_name(target.name + ".tmp")
+                out = np.memmap(tmp_file, dtype=file_dtype, mode="w+", shape=shape)
+                out[:count] = data
+                out.flush()
+                del out
+                os.replace(tmp_file, target)
+        self._vectors = None
+        self._scales = None
+        # The new files are complete: only now does the partition switch to them
+        self.dtype = dtype
+        self._set_meta("dtype", dtype)
+        self._conn.commit()
+        for old_file in old_files:
+            if old_file not in new_files and old_file.exists():
+                old_file.unlink()
+        vector_file = new_files[0]
+        if vector_file.exists():
+            capacity = vector_file.stat().st_size // (self.dim * np.dtype(dtype).itemsize)
+            self._vectors = np.memmap(vector_file, dtype=dtype, mode="r+", shape=(capacity, self.dim))
+            if dtype == "int8":
+                self._scales = np.memmap(new_files[1], dtype=np.float32, mode="r+", shape=(capacity,))
+
+    def _read_rows(self, start: int, stop: int) -> np.ndarray:
+        """Rows start..stop as float32 (dequantised when stored as int8/float16)."""
+        return _dequantize(self._vectors[start:stop], self._scales[start:stop] if self._scales is not None else None)
+
+    def _write_rows(self, slots, vectors: np.ndarray):
+        """Stores float32 rows at the given slots in the partition's dtype."""
+        rows, scales = _quantize(vectors, self.dtype)
+        self._vectors[slots] = rows
+        self._vectors.flush()
+        if scales is not None:
+            self._scales[slots] = scales
+            self._scales.flush()
+
+    def _ensure_capacity(self, needed: int):
+        """Grows the memory-mapped vector file so it can hold at least `needed` rows."""
+        capacity = self._vectors.shape[0] if self._vectors is not None else 0
+        if needed <= capacity:
+            return
+        new_capacity = max(_MIN_CAPACITY, capacity * 2, needed)
+        self._vectors = self._grow_file(VECTOR_FILE_NAMES[self.dtype], self._vectors, self.dtype, (new_capacity, self.dim))
+        if self.dtype == "int8":
+            self._scales = self._grow_file(SCALE_FILE_NAME, self._scales, np.float32, (new_capacity,))
+        logger.debug(f"Grew local vector partition {self.path} to capacity {new_capacity}.")
+
+    def _grow_file(self, file_name: str, current: Optional[np.memmap], dtype, shape: Tuple[int, ...]) -> np.memmap:
+        """Copies the live rows of a memory-mapped file into a larger one and swaps it in."""
+        target = self.path / file_name
+        tmp_file = self.path / (file_name + ".tmp")
+        grown = np.memmap(tmp_file, dtype=dtype, mode="w+", shape=shape)
+        if current is not None and len(self.ids):
+            grown[: len(self.ids)] = current[: len(self.ids)]
+        grown.flush()
+        del grown, current
+        os.replace(tmp_file, target)
+        return np.memmap(target, dtype=dtype, mode="r+", shape=shape)
+
+    def _bump_generation(self):
+        self._generation += 1
+        self._set_meta("generation", self._generation)
+
+    # --- HNSW ---
+
+    def _use_hnsw(self) -> bool:
+        return hnswlib is not None and len(self.ids) >= self.hnsw_threshold
+
+    def _get_hnsw(self):
+        """Returns an HNSW index in sync with the vector file, loading or building it if needed."""
+        if self._hnsw is not None and self._hnsw_generation == self._generation:
+            return self._hnsw
+
+        count = len(self.ids)
+        hnsw_file = self.path / HNSW_FILE_NAME
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        saved_generation = self._get_meta("hnsw_generation")
+        built = False
+        if hnsw_file.exists() and saved_generation is not None and int(saved_generation) == self._generation:
+            index.load_index(str(hnsw_file), max_elements=max(count, _MIN_CAPACITY))
+            logger.info(f"Loaded HNSW index for {self.path} ({count} vectors).")
+        else:
+            index.init_index(max_elements=max(count * 2, _MIN_CAPACITY), ef_construction=200, M=16)
+            index.add_items(self._read_rows(0, count), np.arange(count))
+            logger.info(f"Built HNSW index for {self.path} ({count} vectors).")
+            built = True
+        index.set_ef(max(64, self.hnsw_threshold // 100))
+        self._hnsw = index
+        self._hnsw_generation = self._generation
+        if built:
+            self._save_hnsw()
+        return index
+
+    def _save_hnsw(self):
+        if self._hnsw is None:
+            return
+        self._hnsw.save_index(str(self.path / HNSW_FILE_NAME))
+        self._set_meta("hnsw_generation", self._hnsw_generation)
+        self._conn.commit()
+        self._unsaved_hnsw_changes = 0
+
+    # --- Mutations ---
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]):
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._set_meta("dim", self.dim)
+                self._set_meta("dtype", self.dtype)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dim}.")
+
+            if len(set(ids)) < len(ids):
+                # One slot per ID: a repeated ID keeps its last occurrence
+                keep = sorted({doc_id: i for i, doc_id in enumerate(ids)}.values())
+                ids = [ids[i] for i in keep]
+                vectors = vectors[keep]
+                texts = [texts[i] for i in keep]
+                metadatas = [metadatas[i] for i in keep]
+
+            slots = []
+            new_count = len(self.ids)
+            for doc_id in ids:
+                slot = self.id_to_slot.get(doc_id)
+                if slot is None:
+                    slot = new_count
+                    new_count += 1
+                slots.append(slot)
+            self._ensure_capacity(new_count)
+
+            self._write_rows(slots, vectors)
+
+            for doc_id, slot, text, metadata in zip(ids, slots, texts, metadatas):
+                if slot == len(self.ids):
+                    self.ids.append(doc_id)
+                    self.texts.append(text)
+                    self.metadatas.append(metadata)
+                    self.id_to_slot[doc_id] = slot
+                else:
+                    self.texts[slot] = text
+                    self.metadatas[slot] = metadata
+            self._conn.executemany(
+                "INSERT INTO rows (slot, doc_id, text, metadata) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(slot) DO UPDATE SET doc_id = excluded.doc_id, text = excluded.text, metadata = excluded.metadata",
+                [(slot, doc_id, text, json.dumps(metadata)) for doc_id, slot, text, metadata in zip(ids, slots, texts, metadatas)],
+            )
+
+            hnsw_in_sync = self._hnsw is not None and self._hnsw_generation == self._generation
+            self._bump_generation()
+            self._conn.commit()
+
+            # Keep a loaded HNSW graph current instead of rebuilding it on the next query
+            if hnsw_in_sync:
+                # Labels of deleted slots are still counted until a slot is reused
+                needed = max(new_count, self._hnsw.get_current_count())
+                if needed > self._hnsw.get_max_elements():
+                    self._hnsw.resize_index(max(needed * 2, _MIN_CAPACITY))
+                self._hnsw.add_items(vectors, np.asarray(slots))
+                self._hnsw_generation = self._generation
+                self._unsaved_hnsw_changes += len(ids)
+                if self._unsaved_hnsw_changes >= self.hnsw_save_interval:
+                    self._save_hnsw()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        with self.lock:
+            hnsw_in_sync = self._hnsw is not None and self._hnsw_generation == self._generation
+            deleted = 0
+            for doc_id in ids:
+                slot = self.id_to_slot.pop(doc_id, None)
+                if slot is None:
+                    continue
+                last = len(self.ids) - 1
+                self._conn.execute("DELETE FROM rows WHERE slot = ?", (slot,))
+                if slot != last:
+                    # Move the last row into the freed slot to keep rows dense
+                    moved_id = self.ids[last]
+                    self._vectors[slot] = self._vectors[last]
+                    if self._scales is not None:
+                        self._scales[slot] = self._scales[last]
+                    self.ids[slot] = moved_id
+                    self.texts[slot] = self.texts[last]
+                    self.metadatas[slot] = self.metadatas[last]
+                    self.id_to_slot[moved_id] = slot
+                    self._conn.execute("UPDATE rows SET slot = ? WHERE slot = ?", (slot, last))
+                    if hnsw_in_sync:
+                        self._hnsw.add_items(self._read_rows(slot, slot + 1), [slot]) # Label `slot` now holds the moved row
+                if hnsw_in_sync:
+                    self._hnsw.mark_deleted(last) # Slot `last` no longer exists; re-added if the slot is reused
+                self.ids.pop()
+                self.texts.pop()
+                self.metadatas.pop()
+                deleted += 1
+            if deleted:
+                self._vectors.flush()
+                if self._scales is not None:
+                    self._scales.flush()
+                self._bump_generation()
+                self._conn.commit()
+                # Labels at or above the row count are exactly the marked-deleted elements
+                stale = self._hnsw.get_current_count() - len(self.ids) if hnsw_in_sync else 0
+                if hnsw_in_sync and stale <= HNSW_MAX_DELETED_RATIO * max(len(self.ids), 1):
+                    self._hnsw_generation = self._generation
+                    self._unsaved_hnsw_changes += deleted
+                    if self._unsaved_hnsw_changes >= self.hnsw_save_interval:
+                        self._save_hnsw()
+                else:
+                    # Too many stale elements (or no graph loaded): rebuilt lazily on the next query
+                    self._hnsw = None
+            return deleted
+
+    # --- Queries ---
+
+    def search(
+        self, query: np.ndarray, k: int, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[int, float]]:
+        """Returns (slot, cosine similarity) pairs for the top k rows matching the filter."""
+        with self.lock:
+            count = len(self.ids)
+            if count == 0 or k <= 0:
+                return []
+            mask = np.fromiter(
+                (_matches_filter(metadata, filter) for metadata in self.metadatas), dtype=bool, count=count
+            )
+            matching = int(mask.sum())
+            if matching == 0:
+                return []
+            k = min(k, matching)
+
+            if self._use_hnsw():
+                try:
+                    index = self._get_hnsw()
+                    labels, distances = index.knn_query(
+                        query.reshape(1, -1), k=k, num_threads=1, filter=lambda label: label < count and bool(mask[label])
+                    )
+                    return [(int(label), float(1.0 - dist)) for label, dist in zip(labels[0], distances[0])]
+                except RuntimeError as e:
+                    # hnswlib raises when it cannot find k filtered neighbours; exact search always can
+                    logger.warning(f"HNSW query failed for {self.path}, falling back to brute force: {e}")
+
+            scores = self._scores(count, query)
+            scores[~mask] = -np.inf
+            if k < count:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(count)
+            top = top[np.argsort(-scores[top])]
+            return [(int(slot), float(scores[slot])) for slot in top]
+
+    def close(self):
+        with self.lock:
+            if self._hnsw is not None and self._unsaved_hnsw_changes:
+                self._save_hnsw()
+            self._conn.close()
+
+
+    def _scores(self, count: int, query: np.ndarray) -> np.ndarray:
+        """Dot products of the first `count` rows with the query."""
+        if self.dtype == "float32":
+            return np.asarray(self._vectors[:count]) @ query
+        # Quantised rows are widened block by block, so the float32 copy stays small
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _SCORE_BLOCK_ROWS):
+            stop = min(start + _SCORE_BLOCK_ROWS, count)
+            block_scores = np.asarray(self._vectors[start:stop], dtype=np.float32) @ query
+            if self._scales is not None:
+                block_scores *= self._scales[start:stop]
+            scores[start:stop] = block_scores
+        return scores
+
+    def vector(self, slot: int) -> List[float]:
+        """The stored vector of a slot as floats."""
+        return self._read_rows(slot, slot + 1)[0].tolist()
+
+    def memory_bytes(self) -> int:
+        """Bytes used by the live vectors (plus int8 scales)."""
+        count = len(self.ids)
+        if not self.dim:
+            return 0
+        return count * (self.dim * np.dtype(self.dtype).itemsize + (4 if self.dtype == "int8" else 0))
+
+
+class LocalVectorStore(VectorStore):
+    """LangChain vector store backed by per-user on-disk indexes.
+
+    Small users are searched with NumPy brute force; once a user holds at least
+    `hnsw_threshold` vectors an HNSW graph (hnswlib) is used instead. Every
+    document must carry a `user_id` in its metadata and every query must filter
+    on it, which mirrors how the Pinecone index is used. `vector_dtype` sets the
+    storage precision; partitions stored in another dtype are converted when opened.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        root_path: str,
+        hnsw_threshold: int = 20000,
+        hnsw_save_interval: int = 500,
+        vector_dtype: str = "float32",
+    ):
+        if vector_dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported local vector dtype '{vector_dtype}'; use one of {VECTOR_DTYPES}.")
+        self._embedding = embedding
+        self.root_path = Path(root_path)
+        self.hnsw_threshold = hnsw_threshold
+        self.hnsw_save_interval = hnsw_save_interval
+        self.vector_dtype = vector_dtype
+        self._partitions: Dict[int, _UserPartition] = {}
+        self._lock = threading.Lock()
+        self.root_path.mkdir(parents=True, exist_ok=True)
+        if hnswlib is None:
+            logger.warning("hnswlib is not installed; the local vector index will use brute force search only.")
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _partition(self, user_id: Any) -> _UserPartition:
+        if user_id is None:
+            raise ValueError("The local vector index requires a user_id to select a partition.")
+        user_id = int(user_id)
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            if partition is None:
+                partition = _UserPartition(
+                    self.root_path / f"user_{user_id}",
+                    hnsw_threshold=self.hnsw_threshold,
+                    hnsw_save_interval=self.hnsw_save_interval,
+                    dtype=self.vector_dtype,
+                )
+                self._partitions[user_id] = partition
+            return partition
+
+    def list_user_ids(self) -> List[int]:
+        """IDs of the users that have a partition on disk."""
+        user_ids = []
+        for entry in self.root_path.glob("user_*"):
+            try:
+                user_ids.append(int(entry.name.split("_", 1)[1]))
+            except ValueError:
+                continue
+        return user_ids
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str],
+    ) -> List[str]:
+        """Stores precomputed embeddings, grouped into one write per user partition."""
+        vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        by_user: Dict[int, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            by_user.setdefault(int(metadata.get("user_id")), []).append(i)
+        for user_id, rows in by_user.items():
+            self._partition(user_id).upsert(
+                [ids[i] for i in rows],
+                vectors[rows],
+                [texts[i] for i in rows],
+                [metadatas[i] for i in rows],
+            )
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = [dict(m) for m in metadatas] if metadatas else [{} for _ in texts]
+        if ids is None or len(ids) != len(texts):
+            raise ValueError("The local vector index requires one explicit ID per text.")
+        if any(m.get("user_id") is None for m in metadatas):
+            raise ValueError("Every document stored in the local vector index needs a user_id in its metadata.")
+        embeddings = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas, list(ids))
+
+    def delete(self, ids: Optional[List[str]] = None, filter: Optional[dict] = None, **kwargs: Any) -> None:
+        """Deletes vectors by ID. A `user_id` in `filter` limits the delete to that user's partition."""
+        if not ids:
+            return None
+        user_id = (filter or {}).get("user_id")
+        user_ids = [user_id] if user_id is not None else self.list_user_ids()
+        for uid in user_ids:
+            self._partition(uid).delete(ids)
+        return None
+
+    def iter_ids(self, user_ids: Optional[List[int]] = None) -> Iterator[Tuple[str, int]]:
+        """Yields (vector ID, user ID) for every stored vector of the given users (default: all partitions)."""
+        existing = self.list_user_ids()
+        if user_ids is not None:
+            existing = [user_id for user_id in existing if user_id in set(user_ids)] # Don't create empty partitions
+        for user_id in existing:
+            partition = self._partition(user_id)
+            with partition.lock:
+                ids = list(partition.ids)
+            for doc_id in ids:
+                yield doc_id, int(user_id)
+
+    def get_vectors_by_ids(self, ids: List[str], user_id: Any) -> Dict[str, Tuple[List[float], Dict[str, Any]]]:
+        """Returns {id: (normalised vector, metadata)} for the IDs present in the user's partition."""
+        partition = self._partition(user_id)
+        found = {}
+        with partition.lock:
+            for doc_id in ids:
+                slot = partition.id_to_slot.get(doc_id)
+                if slot is not None:
+                    found[doc_id] = (partition.vector(slot), dict(partition.metadatas[slot]))
+        return found
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        *,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        user_id = (filter or {}).get("user_id")
+        partition = self._partition(user_id)
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        if partition.dim is not None and query.shape[0] != partition.dim:
+            raise ValueError(f"Query dimension {query.shape[0]} does not match index dimension {partition.dim}.")
+
+        results = []
+        with partition.lock:
+            for slot, score in partition.search(query, k, filter):
+                results.append((
+                    Document(
+                        id=partition.ids[slot],
+                        page_content=partition.texts[slot],
+                        metadata=dict(partition.metadatas[slot]),
+                    ),
+                    score,
+                ))
+        return results
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def drop_user(self, user_id: Any) -> None:
+        """Deletes a user's whole partition (all vectors, metadata and HNSW graph)."""
+        user_id = int(user_id)
+        with self._lock:
+            partition = self._partitions.pop(user_id, None)
+            if partition is not None:
+                partition.close()
+            shutil.rmtree(self.root_path / f"user_{user_id}", ignore_errors=True)
+
+    def close(self):
+        """Flushes pending HNSW state and closes all open partitions."""
+        with self._lock:
+            for partition in self._partitions.values():
+                partition.close()
+            self._partitions.clear()
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        root_path: str = "./vector_index",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding=embedding, root_path=root_path, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,116 @@
+"""Moves Pinecone vectors between the shared namespace and per-user namespaces.
+
+With PINECONE_NAMESPACE_MODE=per_user every user's vectors live in namespace user_{id},
+so a query only scans that user's corpus instead of filtering the whole index on
+user_id, and deleting a user's vectors is a single namespace drop.
+
+Switching an existing index:
+    python -m app.ai.namespaces migrate --keep-source  # copy while still in shared mode
+    # set PINECONE_NAMESPACE_MODE=per_user and restart the API and the worker
+    python -m app.ai.namespaces migrate                # move vectors written meanwhile, clear the shared namespace
+Roll back with `migrate --to shared`. Drop a user's vectors with `drop-user --user-id 1`.
+The local index (VECTOR_STORE_BACKEND=local) is always partitioned per user.
+"""
+
+import argparse
+import logging
+import sys
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.ai.vectorstore import (
+    PINECONE_FETCH_BATCH_SIZE,
+    PINECONE_NAMESPACE_MODE_PER_USER,
+    PINECONE_NAMESPACE_MODE_SHARED,
+    PINECONE_VECTOR_ID_PREFIX,
+    USER_NAMESPACE_PREFIX,
+    VECTOR_STORE_BACKEND_PINECONE,
+    close_vector_store,
+    delete_user_vectors,
+    get_vector_store,
+    list_vector_user_ids,
+    user_namespace,
+)
+
+logger = logging.getLogger(__name__)
+
+# Vectors per upsert request (Pinecone caps requests at 2 MB)
+NAMESPACE_UPSERT_BATCH_SIZE = 100
+SHARED_NAMESPACE = ""
+
+def _move_namespace(index: Any, source: str, to_per_user: bool, keep_source: bool, counts: Dict[str, int]) -> None:
+    """Copies every note vector of `source` to its target namespace, then deletes it from `source`."""
+    for page in index.list(prefix=PINECONE_VECTOR_ID_PREFIX, namespace=source):
+        ids = list(page)
+        for i in range(0, len(ids), PINECONE_FETCH_BATCH_SIZE):
+            fetched = index.fetch(ids=ids[i:i + PINECONE_FETCH_BATCH_SIZE], namespace=source).vectors
+            by_target: Dict[str, List[tuple]] = {}
+            moved_ids: List[str] = []
+            for vector_id, vector in fetched.items():
+                user_id = (vector.metadata or {}).get("user_id")
+                if to_per_user and user_id is None:
+                    counts["skipped"] += 1 # No owner to pick a namespace for
+                    continue
+                target = user_namespace(user_id) if to_per_user else SHARED_NAMESPACE
+                by_target.setdefault(target, []).append((vector_id, list(vector.values), vector.metadata or {}))
+                moved_ids.append(vector_id)
+            for target, vectors in by_target.items():
+                for j in range(0, len(vectors), NAMESPACE_UPSERT_BATCH_SIZE):
+                    index.upsert(vectors=vectors[j:j + NAMESPACE_UPSERT_BATCH_SIZE], namespace=target)
+            # Only delete what was written to the target; a failed upsert raises before this
+            if moved_ids and not keep_source:
+                index.delete(ids=moved_ids, namespace=source)
+            counts["moved"] += len(moved_ids)
+        logger.info(f"Namespace migration from '{source or 'default'}': {counts}")
+
+def migrate_namespaces(to: str = PINECONE_NAMESPACE_MODE_PER_USER, keep_source: bool = False) -> Dict[str, int]:
+    """Moves the note vectors of the Pinecone index into per-user namespaces (to="per_user")
+       or back into the shared default namespace (to="shared"). Safe to re-run: vectors are
+       upserted by ID, and each batch is only deleted from its source once it was written.
+       Returns {"moved", "skipped"}.
+    """
+    if settings.VECTOR_STORE_BACKEND.lower() != VECTOR_STORE_BACKEND_PINECONE:
+        raise ValueError("Namespaces only apply to Pinecone; the local index is always partitioned per user.")
+    index = get_vector_store().index
+    counts = {"moved": 0, "skipped": 0}
+    if to == PINECONE_NAMESPACE_MODE_PER_USER:
+        _move_namespace(index, SHARED_NAMESPACE, to_per_user=True, keep_source=keep_source, counts=counts)
+    elif to == PINECONE_NAMESPACE_MODE_SHARED:
+        namespaces = (index.describe_index_stats().namespaces or {}).keys()
+        for namespace in namespaces:
+            if namespace.startswith(USER_NAMESPACE_PREFIX):
+                _move_namespace(index, namespace, to_per_user=False, keep_source=keep_source, counts=counts)
+    else:
+        raise ValueError(f"Unknown namespace mode '{to}'.")
+    logger.info(f"Namespace migration to '{to}' finished: {counts}")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage per-user vector namespaces.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="Move existing vectors between the shared and per-user namespaces.")
+    migrate.add_argument("--to", choices=[PINECONE_NAMESPACE_MODE_PER_USER, PINECONE_NAMESPACE_MODE_SHARED], default=PINECONE_NAMESPACE_MODE_PER_USER)
+    migrate.add_argument("--keep-source", action="store_true", help="Copy only; leave the source vectors in place.")
+    drop = commands.add_parser("drop-user", help="Delete all vectors of a user.")
+    drop.add_argument("--user-id", type=int, required=True)
+    commands.add_parser("list-users", help="List the users that have their own namespace or partition.")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    try:
+        if args.command == "migrate":
+            migrate_namespaces(to=args.to, keep_source=args.keep_source)
+        elif args.command == "drop-user":
+            delete_user_vectors(args.user_id)
+        else:
+            user_ids: Optional[List[int]] = list_vector_user_ids()
+            print("shared namespace" if user_ids is None else sorted(user_ids))
+    finally:
+        close_vector_store()
+
+if __name__ == "__main__":
+    main()
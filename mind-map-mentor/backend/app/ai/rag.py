@@ -6,13 +6,13 @@ from typing import List, Dict, Any, Optional
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import Runnable, RunnableLambda
 
 # Local imports
-from app.ai.vectorstore import query_similar_notes
+from app.ai.vectorstore import aquery_similar_notes
 from app.ai.embeddings import get_embedding_function  # May not be directly needed here
 from app.core.config import settings
+from app.ai.llm import LLMRegistry, get_llm_registry
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +35,40 @@ def format_docs(docs: List[Dict[str, Any]]) -> str:
     return "\n\n".join(content_list)
 
 
+# --- RAG Chain ---
+
+RAG_CHAIN = "rag_answer"
+
+RAG_TEMPLATE = """
+You are a helpful assistant. Answer the following question based ONLY on the context provided below.
+Keep your answer concise and informative.
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:
+"""
+RAG_PROMPT = ChatPromptTemplate.from_template(RAG_TEMPLATE)
+
+def _log_prompt(prompt_value):
+    logger.debug(f"Formatted prompt being sent to LLM:\n---\n{prompt_value}\n---")
+    return prompt_value
+
+def _build_rag_chain(registry: LLMRegistry) -> Runnable:
+    return (
+        {
+            "context": itemgetter("retrieved_docs") | RunnableLambda(format_docs),
+            "question": itemgetter("question")
+        }
+        | RAG_PROMPT
+        | RunnableLambda(_log_prompt)
+        | registry.chat_model(temperature=0.2)
+        | StrOutputParser()
+    )
+
+
 # --- RAG Function ---
 
 async def generate_rag_answer(query: str, user_id: int) -> Dict[str, Any]:
@@ -45,7 +79,7 @@ async def generate_rag_answer(query: str, user_id: int) -> Dict[str, Any]:
         # 1. Retrieve relevant documents from vector store
         try:
             logger.info(f"Performing vector search for RAG query: '{query}' for user {user_id}")
-            retrieved_docs = query_similar_notes(
+            retrieved_docs = await aquery_similar_notes(
                 query_text=query, 
                 user_id=user_id, 
                 top_k=4, # Retrieve top 4 relevant notes
@@ -66,56 +100,22 @@ async def generate_rag_answer(query: str, user_id: int) -> Dict[str, Any]:
             # Maybe return an error message to the user
             raise HTTPException(status_code=500, detail="Error retrieving information from knowledge base.")
 
-        # 2. Define RAG Prompt Template (Improved Instructions)
-        template = """
-        You are a helpful assistant. Answer the following question based ONLY on the context provided below.
-        Keep your answer concise and informative.
-        
-        Context:
-        {context}
-        
-        Question: {question}
-        
-        Answer:
-        """
-        prompt = ChatPromptTemplate.from_template(template)
-        logger.debug(f"Using RAG Prompt Template:\n---\n{template}\n---")
-
-        # 3. Initialize LLM
-        llm = ChatOpenAI(
-            model_name="gpt-4o-mini",
-            temperature=0.2,
-            api_key=settings.OPENAI_API_KEY
-        )
-
-        # 4. Create RAG Chain using LCEL
-        def log_prompt(prompt_value):
-            logger.debug(f"Formatted prompt being sent to LLM:\n---\n{prompt_value}\n---")
-            return prompt_value
-
-        rag_chain = (
-            {
-                "context": itemgetter("retrieved_docs") | RunnableLambda(format_docs),
-                "question": itemgetter("question")
-            }
-            | prompt
-            | RunnableLambda(log_prompt)
-            | llm
-            | StrOutputParser()
-        )
-
-        # 5. Invoke Chain
+        # 2. Shared chat model and compiled RAG chain (built once per process)
+        registry = get_llm_registry()
+        rag_chain = registry.chain(RAG_CHAIN, _build_rag_chain)
+
+        # 3. Invoke Chain (rate- and concurrency-limited by the registry)
         logger.info("Invoking RAG chain...")
         chain_input = {
             "question": query,
             "retrieved_docs": retrieved_docs
         }
         logger.debug(f"Chain input: {chain_input}")
-        answer = await rag_chain.ainvoke(chain_input)
+        answer = await registry.ainvoke(rag_chain, chain_input)
         logger.info("RAG chain finished.")
         logger.debug(f"LLM generated answer: {answer}")
 
-        # 6. Format and Return Response (Including sources)
+        # 4. Format and Return Response (Including sources)
         sources = []
         for doc in retrieved_docs:
             metadata = doc.get('metadata', {})
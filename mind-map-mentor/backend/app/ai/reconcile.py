@@ -0,0 +1,218 @@
+"""Vector store / Postgres consistency reconciler.
+
+Vector deletes are best-effort and failed upserts only fail their job, so over time the
+index collects orphaned vectors (deleted notes, or summary vectors of notes whose summary
+was cleared) and misses vectors of live notes. Orphans take top_k slots in similarity
+queries and each costs a get_note lookup that returns nothing.
+
+The reconciler streams the stored vector IDs and the note IDs, diffs them with set
+operations, bulk-deletes the orphans and queues a vector-only enrich_note job for every
+note with missing vectors. It returns (and logs) drift metrics per user.
+
+The local index is reconciled one user partition at a time. Pinecone IDs carry no user,
+so there the whole index is listed once and orphans are attributed via their metadata.
+
+Run with:  python -m app.ai.reconcile --all-users [--dry-run]
+or queue it through POST /api/v1/ai/admin/vectors/reconcile (handled by app.worker).
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, case
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.crud import crud_job
+from app.models.note import Note
+from app.ai.vectorstore import (
+    EMBEDDING_TYPES,
+    close_vector_store,
+    delete_vectors,
+    fetch_vector_owners,
+    iter_vector_ids,
+    list_vector_user_ids,
+    parse_vector_id,
+)
+
+logger = logging.getLogger(__name__)
+
+# Notes read from Postgres per keyset page
+NOTE_PAGE_SIZE = 5000
+
+DRIFT_COUNTERS = ("notes", "stored_vectors", "expected_vectors", "orphaned_vectors", "missing_vectors", "notes_missing_vectors")
+
+_HAS_SUMMARY = case((and_(Note.user_summary.isnot(None), Note.user_summary != ""), True), else_=False)
+
+def expected_vector_ids(note_id: int, has_summary: bool) -> List[str]:
+    """Vector IDs a note should have: always content, summary only when it has one."""
+    return [f"note_{note_id}_content"] + ([f"note_{note_id}_summary"] if has_summary else [])
+
+def _iter_note_pages(db: Session, user_ids: Optional[List[int]]) -> Iterator[List[Tuple[int, int, bool]]]:
+    """Yields pages of (note_id, user_id, has_summary), keyset-paginated on Note.id."""
+    query = db.query(Note.id, Note.user_id, _HAS_SUMMARY)
+    if user_ids is not None:
+        query = query.filter(Note.user_id.in_(user_ids))
+    last_note_id = 0
+    while True:
+        page = query.filter(Note.id > last_note_id).order_by(Note.id).limit(NOTE_PAGE_SIZE).all()
+        if not page:
+            return
+        last_note_id = page[-1][0]
+        yield page
+
+def _live_vector_ids(db: Session, vector_ids: List[str]) -> Dict[str, int]:
+    """Returns {vector ID: owner} for those of vector_ids that belong to an existing note and are expected for it."""
+    wanted = set(vector_ids)
+    note_id_list = sorted({parsed[0] for parsed in map(parse_vector_id, vector_ids) if parsed})
+    live: Dict[str, int] = {}
+    for i in range(0, len(note_id_list), NOTE_PAGE_SIZE):
+        rows = db.query(Note.id, Note.user_id, _HAS_SUMMARY).filter(Note.id.in_(note_id_list[i:i + NOTE_PAGE_SIZE])).all()
+        for note_id, user_id, has_summary in rows:
+            for vector_id in expected_vector_ids(note_id, has_summary):
+                if vector_id in wanted:
+                    live[vector_id] = user_id
+    return live
+
+def _reconcile_scope(
+    db: Session,
+    user_ids: Optional[List[int]],
+    dry_run: bool,
+    per_user: Dict[Any, Dict[str, int]],
+) -> Dict[str, int]:
+    """Diffs one scope (the given users, or everything when None) and applies the fixes.
+       Adds drift counters to per_user. Returns {"deleted_vectors", "enqueued_notes"}.
+    """
+    def counters(user_id: Any) -> Dict[str, int]:
+        return per_user.setdefault(user_id, dict.fromkeys(DRIFT_COUNTERS, 0))
+
+    # 1. Stored vector IDs, listed before the notes: a note created meanwhile is merely re-enqueued
+    stored: Dict[str, Optional[int]] = dict(iter_vector_ids(user_ids))
+
+    # 2. Stream the notes; every expected ID found is removed from `stored`
+    missing_by_user: Dict[int, List[int]] = {}
+    for page in _iter_note_pages(db, user_ids):
+        expected: Dict[str, Tuple[int, int]] = {}
+        for note_id, user_id, has_summary in page:
+            counters(user_id)["notes"] += 1
+            for vector_id in expected_vector_ids(note_id, has_summary):
+                expected[vector_id] = (note_id, user_id)
+        present = expected.keys() & stored.keys()
+        absent = expected.keys() - present
+        for vector_id in present:
+            del stored[vector_id]
+            counters(expected[vector_id][1])["stored_vectors"] += 1
+        notes_missing = set()
+        for vector_id, (note_id, user_id) in expected.items():
+            counters(user_id)["expected_vectors"] += 1
+            if vector_id in absent:
+                counters(user_id)["missing_vectors"] += 1
+                notes_missing.add((note_id, user_id))
+        for note_id, user_id in sorted(notes_missing):
+            counters(user_id)["notes_missing_vectors"] += 1
+            missing_by_user.setdefault(user_id, []).append(note_id)
+
+    # 3. What is left has no matching note in this scope. Re-check it against all notes, since
+    #    Pinecone lists every user's vectors and notes may have been created during the run.
+    leftover = [vector_id for vector_id in stored if parse_vector_id(vector_id)]
+    live = _live_vector_ids(db, leftover)
+    orphans = [vector_id for vector_id in leftover if vector_id not in live]
+    unknown_owner = [vector_id for vector_id in orphans if stored[vector_id] is None]
+    if unknown_owner:
+        stored.update(fetch_vector_owners(unknown_owner))
+    orphans_by_user: Dict[Optional[int], List[str]] = {}
+    for vector_id in orphans:
+        owner = stored.get(vector_id)
+        if user_ids is not None and owner not in user_ids:
+            continue # Another user's orphan (Pinecone lists the whole index)
+        orphans_by_user.setdefault(owner, []).append(vector_id)
+        user_counters = counters(owner if owner is not None else "unknown")
+        user_counters["orphaned_vectors"] += 1
+        user_counters["stored_vectors"] += 1
+    for owner in live.values():
+        if user_ids is None or owner in user_ids:
+            counters(owner)["stored_vectors"] += 1 # Notes created during the run
+
+    fixes = {"deleted_vectors": 0, "enqueued_notes": 0}
+    if dry_run:
+        return fixes
+
+    # 4. Bulk-delete orphans and queue vector-only enrichment for notes with missing vectors
+    for owner, vector_ids in orphans_by_user.items():
+        try:
+            delete_vectors(vector_ids, user_id=owner)
+            fixes["deleted_vectors"] += len(vector_ids)
+        except Exception as e:
+            logger.error(f"Failed to delete {len(vector_ids)} orphaned vectors of user {owner}: {e}", exc_info=True)
+    for user_id, note_ids in missing_by_user.items():
+        for note_id in note_ids:
+            crud_job.enqueue_note_enrichment(db, note_id=note_id, user_id=user_id, tags=False, vectors=True, links=False, commit=False)
+        db.commit()
+        fixes["enqueued_notes"] += len(note_ids)
+    return fixes
+
+def reconcile_vectors(db: Session, user_ids: Optional[List[int]] = None, dry_run: bool = False) -> Dict[str, Any]:
+    """Finds orphaned and missing vectors for the given users (default: all) and fixes them
+       unless dry_run. Returns the drift report: totals, drift_ratio, fixes and per_user counters.
+    """
+    started = time.perf_counter()
+    per_user: Dict[Any, Dict[str, int]] = {}
+    fixes = {"deleted_vectors": 0, "enqueued_notes": 0}
+
+    partitioned_user_ids = list_vector_user_ids()
+    if partitioned_user_ids is None:
+        scopes = [user_ids] # Pinecone: one pass over the whole index
+    else:
+        if user_ids is None:
+            note_user_ids = [row[0] for row in db.query(Note.user_id).distinct().all()]
+            user_ids = sorted(set(note_user_ids) | set(partitioned_user_ids))
+        scopes = [[user_id] for user_id in user_ids] # Local index: one partition at a time
+
+    for scope in scopes:
+        for key, value in _reconcile_scope(db, scope, dry_run, per_user).items():
+            fixes[key] += value
+
+    totals = {counter: sum(counts[counter] for counts in per_user.values()) for counter in DRIFT_COUNTERS}
+    drifted = totals["orphaned_vectors"] + totals["missing_vectors"]
+    report = {
+        **totals,
+        "drift_ratio": round(drifted / max(totals["expected_vectors"], 1), 6),
+        **fixes,
+        "dry_run": dry_run,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+        "per_user": {str(user_id): counts for user_id, counts in per_user.items() if counts["orphaned_vectors"] or counts["missing_vectors"]},
+    }
+    logger.info(
+        f"Vector reconcile: {totals['notes']} notes, {totals['expected_vectors']} expected vectors, "
+        f"{totals['orphaned_vectors']} orphaned, {totals['missing_vectors']} missing "
+        f"(drift {report['drift_ratio']:.4%}); deleted {fixes['deleted_vectors']}, re-enqueued {fixes['enqueued_notes']} notes."
+    )
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile the vector store with the notes in Postgres.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", type=int, action="append", help="User to reconcile (repeatable).")
+    target.add_argument("--all-users", action="store_true", help="Reconcile every user.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report drift; delete and enqueue nothing.")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    db = SessionLocal()
+    try:
+        report = reconcile_vectors(db, user_ids=args.user_id, dry_run=args.dry_run)
+    finally:
+        db.close()
+        close_vector_store()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
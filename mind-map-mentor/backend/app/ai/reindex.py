@@ -0,0 +1,219 @@
+"""Resumable bulk reindex of note vectors.
+
+Notes are streamed from Postgres in keyset-paginated chunks (ordered by note ID) and
+each chunk is upserted with upsert_documents_bulk_detailed, i.e. embedded and written in
+VECTOR_UPSERT_BATCH_SIZE batches. Chunks run on a bounded thread pool. A checkpoint file
+records the note ID up to which every chunk has finished, so an interrupted run resumes
+there instead of starting over; the file is removed once a run completes.
+
+Use it after switching embedding models or to rebuild a lost index:
+    python -m app.ai.reindex --all-users
+    python -m app.ai.reindex --user-id 1 --updated-since 2024-01-01 --embedding-type summary
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.note import Note
+from app.models.graph_node import GraphNode
+from app.ai.enrichment import note_vector_payload
+from app.ai.embeddings import EMBEDDING_PROVIDER_LOCAL, initialize_embedding_function, close_embedding_function
+from app.ai.vectorstore import EMBEDDING_TYPES, upsert_documents_bulk_detailed, close_vector_store
+
+logger = logging.getLogger(__name__)
+
+def _new_checkpoint(filters: Dict[str, Any]) -> Dict[str, Any]:
+    return {"filters": filters, "last_note_id": 0, "indexed": 0, "failed_note_ids": []}
+
+def load_checkpoint(path: str, filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Loads the checkpoint at path, or starts a new one. A checkpoint written for other
+       filters is rejected, since resuming it would skip notes the new filters select.
+    """
+    if not os.path.exists(path):
+        return _new_checkpoint(filters)
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("filters") != filters:
+        raise ValueError(
+            f"Checkpoint {path} was written for filters {checkpoint.get('filters')}, not {filters}. "
+            "Pass --restart to discard it."
+        )
+    logger.info(f"Resuming reindex after note {checkpoint['last_note_id']} ({checkpoint['indexed']} notes already indexed).")
+    return checkpoint
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    """Writes the checkpoint atomically (temp file + rename)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def iter_note_chunks(
+    db: Session,
+    after_note_id: int,
+    chunk_size: int,
+    user_ids: Optional[List[int]] = None,
+    updated_since: Optional[datetime] = None,
+    updated_until: Optional[datetime] = None,
+    embedding_types: Sequence[str] = EMBEDDING_TYPES,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yields upsert_documents_bulk items for the selected notes, chunk_size at a time.
+       Keyset pagination on Note.id keeps every page an index range scan, however deep the run.
+       Notes never updated are filtered on created_at.
+    """
+    query = (
+        db.query(Note, GraphNode.data)
+        .outerjoin(GraphNode, GraphNode.id == Note.graph_node_id) # Tags live on the graph node
+    )
+    if user_ids:
+        query = query.filter(Note.user_id.in_(user_ids))
+    last_changed = func.coalesce(Note.updated_at, Note.created_at)
+    if updated_since is not None:
+        query = query.filter(last_changed >= updated_since)
+    if updated_until is not None:
+        query = query.filter(last_changed < updated_until)
+    if "content" not in embedding_types:
+        # Only summary vectors requested: notes without a summary have nothing to index
+        query = query.filter(Note.user_summary.isnot(None), Note.user_summary != "")
+
+    while True:
+        rows = query.filter(Note.id > after_note_id).order_by(Note.id).limit(chunk_size).all()
+        if not rows:
+            return
+        chunk = [note_vector_payload(note, (data or {}).get("tags") or []) for note, data in rows]
+        after_note_id = rows[-1][0].id
+        for note, _ in rows:
+            db.expunge(note) # Don't keep every streamed note in the session
+        yield chunk
+
+def reindex_notes(
+    db: Session,
+    user_ids: Optional[List[int]] = None,
+    updated_since: Optional[datetime] = None,
+    updated_until: Optional[datetime] = None,
+    embedding_types: Sequence[str] = EMBEDDING_TYPES,
+    chunk_size: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    restart: bool = False,
+) -> Dict[str, Any]:
+    """Re-embeds and upserts the vectors of all notes matching the filters.
+       With a checkpoint_path, progress is saved after every finished chunk and a later call
+       with the same filters continues from there (restart=True starts over).
+       Returns the final checkpoint ({"last_note_id", "indexed", "failed_note_ids", ...}).
+    """
+    chunk_size = chunk_size or settings.REINDEX_CHUNK_SIZE
+    max_workers = max_workers or settings.REINDEX_MAX_WORKERS
+    filters = {
+        "user_ids": sorted(user_ids) if user_ids else None,
+        "updated_since": updated_since.isoformat() if updated_since else None,
+        "updated_until": updated_until.isoformat() if updated_until else None,
+        "embedding_types": sorted(embedding_types),
+    }
+    if checkpoint_path and not restart:
+        checkpoint = load_checkpoint(checkpoint_path, filters)
+    else:
+        checkpoint = _new_checkpoint(filters)
+
+    # (note IDs, future) per submitted chunk, oldest first. The checkpoint only advances past a
+    # chunk once it and every older chunk have finished, so resuming never skips a note.
+    in_flight: Deque[Tuple[List[int], Future]] = deque()
+
+    def finish_oldest_chunk():
+        note_ids, future = in_flight.popleft()
+        try:
+            failed = future.result()
+        except Exception as e:
+            logger.error(f"Reindex chunk ending at note {note_ids[-1]} failed: {e}", exc_info=True)
+            failed = note_ids
+        checkpoint["indexed"] += len(note_ids) - len(failed)
+        checkpoint["failed_note_ids"].extend(failed)
+        checkpoint["last_note_id"] = note_ids[-1]
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, checkpoint)
+        logger.info(f"Reindexed notes up to {note_ids[-1]}: {checkpoint['indexed']} indexed, {len(checkpoint['failed_note_ids'])} failed so far.")
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reindex")
+    try:
+        chunks = iter_note_chunks(
+            db,
+            after_note_id=checkpoint["last_note_id"],
+            chunk_size=chunk_size,
+            user_ids=user_ids,
+            updated_since=updated_since,
+            updated_until=updated_until,
+            embedding_types=embedding_types,
+        )
+        for chunk in chunks:
+            future = executor.submit(upsert_documents_bulk_detailed, chunk, embedding_types=embedding_types)
+            in_flight.append(([item["note_id"] for item in chunk], future))
+            # Bounded read-ahead: at most two chunks per worker are held in memory
+            while len(in_flight) >= 2 * max_workers or (in_flight and in_flight[0][1].done()):
+                finish_oldest_chunk()
+        while in_flight:
+            finish_oldest_chunk()
+    finally:
+        # On interruption, drop queued chunks; the checkpoint already excludes them
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path) # Completed: the next run starts from the first note again
+    if checkpoint["failed_note_ids"]:
+        logger.warning(f"Reindex finished with {len(checkpoint['failed_note_ids'])} failed notes: {checkpoint['failed_note_ids'][:50]}")
+    logger.info(f"Reindex finished: {checkpoint['indexed']} notes indexed.")
+    return checkpoint
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed and upsert note vectors in bulk (resumable).")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", type=int, action="append", help="User to reindex (repeatable).")
+    target.add_argument("--all-users", action="store_true", help="Reindex the notes of every user.")
+    parser.add_argument("--updated-since", type=datetime.fromisoformat, help="Only notes changed at or after this ISO timestamp.")
+    parser.add_argument("--updated-until", type=datetime.fromisoformat, help="Only notes changed before this ISO timestamp.")
+    parser.add_argument("--embedding-type", choices=EMBEDDING_TYPES, action="append", help="Vectors to rebuild (repeatable, default: both).")
+    parser.add_argument("--chunk-size", type=int, default=settings.REINDEX_CHUNK_SIZE)
+    parser.add_argument("--max-workers", type=int, default=settings.REINDEX_MAX_WORKERS)
+    parser.add_argument("--checkpoint", default=settings.REINDEX_CHECKPOINT_PATH, help="Checkpoint file used to resume interrupted runs.")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start from the first note.")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    if settings.EMBEDDING_PROVIDER == EMBEDDING_PROVIDER_LOCAL:
+        initialize_embedding_function() # Load the local model once, before the pool starts
+    db = SessionLocal()
+    try:
+        checkpoint = reindex_notes(
+            db,
+            user_ids=args.user_id,
+            updated_since=args.updated_since,
+            updated_until=args.updated_until,
+            embedding_types=args.embedding_type or EMBEDDING_TYPES,
+            chunk_size=args.chunk_size,
+            max_workers=args.max_workers,
+            checkpoint_path=args.checkpoint,
+            restart=args.restart,
+        )
+    finally:
+        db.close()
+        close_vector_store()
+        close_embedding_function()
+    sys.exit(1 if checkpoint["failed_note_ids"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Retag all notes of a user with the configured tag engine (batched LLM calls by default).
+
+Notes are read in keyset-paginated pages and tagged with suggest_note_tags, which packs
+many notes into each LLM prompt (the tag cache is bypassed, then refreshed). Graph nodes
+whose tags changed are updated, and a vector refresh is queued for those notes so the
+tags in the vector metadata follow (the embeddings themselves come from the embedding
+cache, since the content is unchanged).
+
+Run with:  python -m app.ai.retag --all-users
+or queue it through POST /api/v1/ai/admin/tags/retag (handled by app.worker).
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session, undefer
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.crud import crud_graph, crud_job
+from app.models.note import Note
+from app.models.graph_node import GraphNode
+from app.ai.enrichment import suggest_note_tags
+from app.ai.llm import initialize_llm_registry, close_llm_registry
+
+logger = logging.getLogger(__name__)
+
+async def retag_notes(
+    db: Session,
+    user_id: int,
+    chunk_size: Optional[int] = None,
+    only_untagged: bool = False,
+) -> Dict[str, int]:
+    """Suggests fresh tags for every note of the user that has content and a graph node.
+       With only_untagged, notes that already have tags are skipped.
+       Returns counters: notes (tagged), changed, vector_syncs_queued.
+    """
+    chunk_size = chunk_size or settings.RETAG_CHUNK_SIZE
+    report = {"notes": 0, "changed": 0, "vector_syncs_queued": 0}
+    query = (
+        db.query(Note, GraphNode.data)
+        .options(undefer(Note.keyword_terms)) # Read by the local tag engine
+        .join(GraphNode, GraphNode.id == Note.graph_node_id) # Tags live on the graph node
+        .filter(Note.user_id == user_id, Note.content.isnot(None), Note.content != "")
+    )
+
+    after_note_id = 0
+    while True:
+        rows = query.filter(Note.id > after_note_id).order_by(Note.id).limit(chunk_size).all()
+        if not rows:
+            break
+        after_note_id = rows[-1][0].id
+        current_tags = {note.id: (data or {}).get("tags") or [] for note, data in rows}
+        notes = {note.id: note for note, _ in rows if not (only_untagged and current_tags[note.id])}
+        # Fresh suggestions: the tag cache is not consulted, but refreshed
+        suggested = await suggest_note_tags(db, notes, current_tags, use_cache=False) if notes else {}
+
+        for note in notes.values():
+            tags = suggested.get(note.id) or []
+            report["notes"] += 1
+            if not tags or tags == current_tags[note.id]:
+                continue # Keep existing tags when no tags were suggested
+            if crud_graph.update_graph_node_tags(db=db, graph_node_id=note.graph_node_id, tags=tags, user_id=user_id):
+                report["changed"] += 1
+                crud_job.enqueue_note_enrichment(
+                    db, note_id=note.id, user_id=user_id, tags=False, vectors=True, links=False, commit=False
+                )
+                report["vector_syncs_queued"] += 1
+        db.commit()
+        for note, _ in rows:
+            db.expunge(note) # Don't keep every streamed note in the session
+        logger.info(f"Retagged notes of user {user_id} up to note {after_note_id}: {report}")
+
+    logger.info(f"Retag finished for user {user_id}: {report}")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Suggest fresh AI tags for all notes of a user (batched LLM calls).")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", type=int, action="append", help="User to retag (repeatable).")
+    target.add_argument("--all-users", action="store_true", help="Retag every user with notes.")
+    parser.add_argument("--only-untagged", action="store_true", help="Skip notes that already have tags.")
+    parser.add_argument("--chunk-size", type=int, default=settings.RETAG_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+    async def run():
+        if settings.OPENAI_API_KEY: # Not needed with TAG_ENGINE=local
+            initialize_llm_registry()
+        db = SessionLocal()
+        try:
+            user_ids = args.user_id or [row[0] for row in db.query(Note.user_id).distinct().all()]
+            for user_id in user_ids:
+                await retag_notes(db, user_id, chunk_size=args.chunk_size, only_untagged=args.only_untagged)
+        finally:
+            db.close()
+            await close_llm_registry()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Note search: vector, lexical (Postgres full-text) or hybrid.
+
+Hybrid mode merges both rankings with reciprocal rank fusion (RRF). Lexical search is
+answered by Postgres alone, so it keeps working when the embedding or vector provider
+is slow or down, and exact-keyword ("quoted") queries skip the vector call entirely.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_note, crud_tag
+from app.ai.vectorstore import query_similar_notes, query_similar_notes_multi
+
+# search_notes(embedding_type=...) value that searches content and summary vectors together
+EMBEDDING_TYPE_ANY = "any"
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODE_VECTOR = "vector"
+SEARCH_MODE_LEXICAL = "lexical"
+SEARCH_MODE_HYBRID = "hybrid"
+
+def is_exact_keyword_query(query: str) -> bool:
+    """Quoted phrases ask for literal matches, which embeddings handle poorly."""
+    return '"' in query
+
+def reciprocal_rank_fusion(ranked_lists: List[List[str]], k: int) -> Dict[str, float]:
+    """Fuses rankings of IDs: score(id) = sum over lists of 1 / (k + rank), rank starting at 1."""
+    scores: Dict[str, float] = {}
+    for ranked_ids in ranked_lists:
+        for rank, item_id in enumerate(ranked_ids, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+def _lexical_matches(
+    db: Session, query: str, user_id: int, limit: int, note_ids=None
+) -> List[Dict[str, Any]]:
+    try:
+        rows = crud_note.search_notes_fulltext(db, user_id=user_id, query=query, limit=limit, note_ids=note_ids)
+    except Exception as e:
+        logger.error(f"Full-text search failed for user {user_id}: {e}", exc_info=True)
+        db.rollback()
+        return []
+    return [
+        {
+            'id': f"note_{note_id}",
+            'score': float(rank),
+            'metadata': {'note_id': note_id, 'user_id': user_id, 'title': title, 'type': 'note'},
+        }
+        for note_id, title, rank in rows
+    ]
+
+def search_notes(
+    db: Session,
+    query: str,
+    user_id: int,
+    top_k: int = 5,
+    mode: str = SEARCH_MODE_HYBRID,
+    embedding_type: str = "content",
+    tags: Optional[List[str]] = None,
+    match_all_tags: bool = False,
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """Searches the user's notes. Returns (mode actually used, matches).
+       Each match has 'id' (note_{id}), 'score', 'metadata' and 'sources' (which searches found it).
+       In hybrid mode the score is the RRF score; otherwise it is the cosine similarity or ts_rank_cd.
+       embedding_type "any" searches content and summary vectors in one query (see query_similar_notes_multi).
+       tags restricts the search to notes carrying any (with match_all_tags, every one) of them,
+       looked up in the node_tags index. The full-text search filters on them in SQL. The vector
+       search gets a note_id $in metadata filter while at most SEARCH_TAG_FILTER_MAX_IDS notes
+       match (Pinecone caps $in lists); for larger tag sets it over-fetches candidates and
+       keeps the tagged ones, checked in Postgres.
+    """
+    if mode == SEARCH_MODE_HYBRID and is_exact_keyword_query(query):
+        logger.info(f"Exact-keyword query, skipping the vector search: '{query}'")
+        mode = SEARCH_MODE_LEXICAL
+
+    tagged = None # SELECT of the tagged note IDs, for the full-text query
+    vector_filter: Optional[Dict[str, Any]] = None
+    filter_after_retrieval = False
+    if crud_tag.normalize_tags(tags):
+        tagged = crud_tag.tagged_note_ids(user_id, tags, match_all=match_all_tags)
+        max_ids = settings.SEARCH_TAG_FILTER_MAX_IDS
+        note_ids = crud_tag.get_tagged_note_ids(db, user_id=user_id, tags=tags, match_all=match_all_tags, limit=max_ids + 1)
+        if not note_ids:
+            logger.info(f"No notes of user {user_id} carry the tags {tags}; nothing to search.")
+            return mode, []
+        if len(note_ids) <= max_ids:
+            vector_filter = {"note_id": {"$in": note_ids}}
+        else:
+            filter_after_retrieval = True
+            logger.info(f"Tags {tags} match more than {max_ids} notes of user {user_id}; filtering vector results after retrieval.")
+
+    if mode == SEARCH_MODE_LEXICAL:
+        matches = _lexical_matches(db, query, user_id, limit=top_k, note_ids=tagged)
+        return mode, [dict(match, sources=[SEARCH_MODE_LEXICAL]) for match in matches]
+
+    # Vector results are requested from query_similar_notes(_multi), which return [] when the provider fails
+    candidates = top_k * 2 if mode == SEARCH_MODE_HYBRID else top_k
+    vector_candidates = candidates * settings.SEARCH_TAG_FILTER_OVERFETCH if filter_after_retrieval else candidates
+    if embedding_type == EMBEDDING_TYPE_ANY:
+        # Content and summary vectors in one query; a note found by both counts once, with its best score
+        _, vector_matches = query_similar_notes_multi(
+            query_text=query, user_id=user_id, top_k=vector_candidates, filter=vector_filter
+        )
+    else:
+        vector_matches = query_similar_notes(
+            query_text=query,
+            user_id=user_id,
+            embedding_type_filter=embedding_type,
+            top_k=vector_candidates,
+            filter=vector_filter
+        )
+    if filter_after_retrieval:
+        kept = set(crud_tag.get_tagged_note_ids(
+            db, user_id=user_id, tags=tags, match_all=match_all_tags,
+            among=[match['metadata'].get('note_id') for match in vector_matches],
+        ))
+        vector_matches = [match for match in vector_matches if match['metadata'].get('note_id') in kept][:candidates]
+    if mode == SEARCH_MODE_VECTOR:
+        return mode, [
+            {
+                'id': match['id'],
+                'score': match['score'],
+                'metadata': match['metadata'],
+                'sources': [SEARCH_MODE_VECTOR],
+                'type_scores': match.get('type_scores'),
+            }
+            for match in vector_matches
+        ]
+
+    lexical_matches = _lexical_matches(db, query, user_id, limit=candidates, note_ids=tagged)
+    if not vector_matches:
+        logger.warning(f"Hybrid search for user {user_id} got no vector results; returning lexical results only.")
+
+    fused = reciprocal_rank_fusion(
+        [[match['id'] for match in vector_matches], [match['id'] for match in lexical_matches]],
+        k=settings.SEARCH_RRF_K
+    )
+    # Vector metadata is richer (tags), so it wins when a note is found by both
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for source, matches in ((SEARCH_MODE_LEXICAL, lexical_matches), (SEARCH_MODE_VECTOR, vector_matches)):
+        for match in matches:
+            entry = by_id.setdefault(match['id'], {'id': match['id'], 'sources': []})
+            entry['metadata'] = match['metadata']
+            if match.get('type_scores'):
+                entry['type_scores'] = match['type_scores']
+            if source not in entry['sources']:
+                entry['sources'].append(source)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return mode, [dict(by_id[item_id], score=score) for item_id, score in ranked]
@@ -0,0 +1,161 @@
+"""Full-graph similarity rebuild for a user's notes.
+
+Auto-linking (crud_note._find_and_create_similar_note_edges) only runs when a note is
+created or its summary changes, so older notes never link to newer ones. This module
+fetches all stored summary vectors of a user at once and computes top-k neighbours for
+every note with blocked matrix products, then rewrites the `related_summary` edges in bulk.
+
+Run with:  python -m app.ai.similarity_graph --user-id 1
+or queue it through POST /api/v1/ai/admin/similarity-graph/rebuild (handled by app.worker).
+"""
+
+import argparse
+import logging
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.crud import crud_graph
+from app.crud.crud_note import RELATED_SUMMARY_EDGE_TYPE, get_relationship_label_from_score
+from app.models.note import Note
+from app.ai.vectorstore import fetch_note_vectors, close_vector_store
+
+logger = logging.getLogger(__name__)
+
+def top_k_neighbours(vectors: np.ndarray, k: int, block_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns (indices, scores), both shaped (n, k'), of the k most cosine-similar rows
+       for every row, excluding the row itself. k' = min(k, n - 1).
+       Similarities are computed one block of rows at a time, so memory stays at
+       block_size * n floats instead of n * n.
+    """
+    n = vectors.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float32)
+
+    matrix = vectors.astype(np.float32, copy=True)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    indices = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block_scores = matrix[start:stop] @ matrix.T
+        rows = np.arange(stop - start)
+        block_scores[rows, rows + start] = -np.inf # Don't match a note with itself
+        # Unordered top-k per row, then sort just those k columns
+        top = np.argpartition(block_scores, -k, axis=1)[:, -k:]
+        top_scores = np.take_along_axis(block_scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        indices[start:stop] = np.take_along_axis(top, order, axis=1)
+        scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+def rebuild_summary_edges(
+    db: Session,
+    user_id: int,
+    top_k: Optional[int] = None,
+    threshold: Optional[float] = None,
+    block_size: Optional[int] = None,
+) -> Dict[str, int]:
+    """Recomputes all summary-similarity edges of a user.
+       A pair of notes is linked when either is among the other's top_k neighbours and the
+       score reaches the threshold. As with auto-linking, the newer note is the edge source.
+       Existing `related_summary` edges are replaced in one transaction.
+       Returns {"notes", "vectors", "deleted", "created", "updated"}.
+    """
+    top_k = top_k or settings.SIMILARITY_REBUILD_TOP_K
+    threshold = settings.SIMILARITY_THRESHOLD_SUMMARY if threshold is None else threshold
+    block_size = block_size or settings.SIMILARITY_REBUILD_BLOCK_SIZE
+    counts = {"notes": 0, "vectors": 0, "deleted": 0, "created": 0, "updated": 0}
+
+    # 1. Notes that can take part in summary links
+    graph_node_ids = dict(
+        db.query(Note.id, Note.graph_node_id)
+        .filter(
+            Note.user_id == user_id,
+            Note.graph_node_id.isnot(None),
+            Note.user_summary.isnot(None),
+            Note.user_summary != "",
+        )
+        .all()
+    )
+    counts["notes"] = len(graph_node_ids)
+
+    # 2. Their stored summary vectors (no re-embedding)
+    vectors_by_note_id = fetch_note_vectors(list(graph_node_ids), user_id=user_id, embedding_type="summary")
+    note_ids: List[int] = [note_id for note_id in graph_node_ids if note_id in vectors_by_note_id]
+    counts["vectors"] = len(note_ids)
+    if len(note_ids) < len(graph_node_ids):
+        logger.warning(f"{len(graph_node_ids) - len(note_ids)} notes of user {user_id} have a summary but no summary vector; they are not linked.")
+
+    # 3. Blocked top-k over the whole matrix
+    edges = []
+    if len(note_ids) > 1:
+        matrix = np.asarray([vectors_by_note_id[note_id] for note_id in note_ids], dtype=np.float32)
+        indices, scores = top_k_neighbours(matrix, k=top_k, block_size=block_size)
+
+        pair_scores: Dict[Tuple[int, int], float] = {}
+        for row, note_id in enumerate(note_ids):
+            for column, score in zip(indices[row], scores[row]):
+                if score < threshold:
+                    break # Sorted descending
+                other_id = note_ids[column]
+                pair = (max(note_id, other_id), min(note_id, other_id)) # (newer, older)
+                pair_scores[pair] = float(score)
+
+        for (source_note_id, target_note_id), score in pair_scores.items():
+            edges.append({
+                "source_node_id": graph_node_ids[source_note_id],
+                "target_node_id": graph_node_ids[target_note_id],
+                "relationship_type": RELATED_SUMMARY_EDGE_TYPE,
+                "label": get_relationship_label_from_score(score),
+                "data": {'similarity_score': score, 'based_on': 'summary'},
+            })
+
+    # 4. Replace the old summary edges atomically
+    try:
+        counts["deleted"] = crud_graph.delete_graph_edges_by_type(
+            db, user_id=user_id, relationship_type=RELATED_SUMMARY_EDGE_TYPE, commit=False
+        )
+        counts.update(crud_graph.upsert_graph_edges_bulk(db, edges=edges, user_id=user_id, commit=False))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(f"Rebuilt summary similarity graph for user {user_id}: {counts}")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild summary-similarity edges for all notes of a user.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", type=int, action="append", help="User to rebuild (repeatable).")
+    target.add_argument("--all-users", action="store_true", help="Rebuild for every user with notes.")
+    parser.add_argument("--top-k", type=int, default=settings.SIMILARITY_REBUILD_TOP_K)
+    parser.add_argument("--threshold", type=float, default=settings.SIMILARITY_THRESHOLD_SUMMARY)
+    parser.add_argument("--block-size", type=int, default=settings.SIMILARITY_REBUILD_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    db = SessionLocal()
+    try:
+        user_ids = args.user_id or [row[0] for row in db.query(Note.user_id).distinct().all()]
+        for user_id in user_ids:
+            rebuild_summary_edges(db, user_id, top_k=args.top_k, threshold=args.threshold, block_size=args.block_size)
+    finally:
+        db.close()
+        close_vector_store()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Tag suggestion cache and near-duplicate skip for AI tagging.
+
+Every AI tag suggestion is stored under a fingerprint of the normalised content
+(lowercased, punctuation and whitespace collapsed) together with a MinHash signature of
+its character shingles. Before a note is sent to the LLM:
+
+- content that normalises to what the current tags were suggested for keeps its tags,
+- content seen before (any note) gets the cached tags,
+- content whose shingle overlap with the last tagged version is still high (estimated
+  Jaccard distance below TAG_REUSE_MAX_DISTANCE) keeps its current tags.
+
+The comparison is always against the version the tags were suggested for, so many small
+edits in a row still add up to a fresh suggestion.
+"""
+
+import hashlib
+import logging
+import re
+import unicodedata
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.note import Note
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 5 # Characters per shingle; small edits change only a few shingles
+MINHASH_PERMUTATIONS = 128 # Standard error of the Jaccard estimate ~ sqrt(J(1-J)/128)
+_SHINGLE_BLOCK = 4096 # Shingles hashed per numpy block (memory ~ block * permutations * 8 bytes)
+
+# Fixed seed: signatures are persisted and must be comparable across processes
+_rng = np.random.default_rng(20240601)
+_HASH_A = _rng.integers(0, 2**64 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64, endpoint=True) | np.uint64(1)
+_HASH_B = _rng.integers(0, 2**64 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64, endpoint=True)
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+class ContentSignature(NamedTuple):
+    fingerprint: str # sha256 of the normalised content
+    minhash: np.ndarray # uint32[MINHASH_PERMUTATIONS]
+
+
+def normalize_content(text: str) -> str:
+    """Lowercases and drops punctuation and repeated whitespace, so cosmetic edits normalise to the same text."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+def content_fingerprint(text: str) -> str:
+    return hashlib.sha256(normalize_content(text).encode("utf-8")).hexdigest()
+
+def minhash_signature(normalized: str) -> np.ndarray:
+    """MinHash of the character shingles of an already normalised text.
+       Each permutation is a multiply-shift hash of the shingle's crc32.
+    """
+    shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(max(1, len(normalized) - SHINGLE_SIZE + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    signature = np.full(MINHASH_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint64)
+    for start in range(0, len(hashes), _SHINGLE_BLOCK):
+        block = hashes[start:start + _SHINGLE_BLOCK]
+        # Multiply-shift: (a * x + b) mod 2^64 (uint64 wraps around), top 32 bits are the permuted hash
+        permuted = (_HASH_A[:, None] * block[None, :] + _HASH_B[:, None]) >> np.uint64(32)
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+def content_signature(text: str) -> ContentSignature:
+    normalized = normalize_content(text)
+    return ContentSignature(
+        fingerprint=hashlib.sha256(normalized.encode("utf-8")).hexdigest(),
+        minhash=minhash_signature(normalized),
+    )
+
+def estimate_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two MinHash signatures."""
+    return float(np.mean(a == b))
+
+def _pack_minhash(signature: np.ndarray) -> bytes:
+    return signature.astype(np.uint32).tobytes()
+
+def _unpack_minhash(packed: bytes) -> np.ndarray:
+    return np.frombuffer(packed, dtype=np.uint32)
+
+def resolve_cached_tags(
+    db: Session, notes: Dict[int, Note], current_tags: Dict[int, List[str]]
+) -> Tuple[Dict[int, List[str]], Dict[int, ContentSignature]]:
+    """Decides which notes can skip the LLM.
+       Returns ({note_id: tags} for notes resolved from the cache or kept as they are,
+       {note_id: signature} for notes that still need a suggestion).
+       Notes that got cached tags have their tags_fingerprint updated (not committed).
+    """
+    # Imported lazily: app.crud imports this module (via crud_note) while it initializes
+    from app.crud import crud_tag_cache
+    signatures = {note_id: content_signature(note.content) for note_id, note in notes.items()}
+    lookups = [signature.fingerprint for signature in signatures.values()]
+    lookups += [note.tags_fingerprint for note in notes.values() if note.tags_fingerprint]
+    cached = crud_tag_cache.get_cached_tags(db, model=settings.LLM_MODEL, fingerprints=lookups)
+
+    resolved: Dict[int, List[str]] = {}
+    pending: Dict[int, ContentSignature] = {}
+    fingerprint_updates = []
+    counts = {"unchanged": 0, "cache_hits": 0, "near_duplicates": 0}
+    for note_id, note in notes.items():
+        signature = signatures[note_id]
+        tags = current_tags.get(note_id) or []
+        previous = cached.get(note.tags_fingerprint) if note.tags_fingerprint else None
+        if tags and signature.fingerprint == note.tags_fingerprint:
+            resolved[note_id] = tags # Only whitespace/punctuation/case changed
+            counts["unchanged"] += 1
+        elif signature.fingerprint in cached:
+            resolved[note_id] = cached[signature.fingerprint][0]
+            fingerprint_updates.append({"id": note_id, "tags_fingerprint": signature.fingerprint})
+            counts["cache_hits"] += 1
+        elif (
+            tags and previous is not None
+            and 1.0 - estimate_similarity(signature.minhash, _unpack_minhash(previous[1])) < settings.TAG_REUSE_MAX_DISTANCE
+        ):
+            resolved[note_id] = tags # Small edit: keep the tags, still compared against the tagged version
+            counts["near_duplicates"] += 1
+        else:
+            pending[note_id] = signature
+    if fingerprint_updates:
+        db.bulk_update_mappings(Note, fingerprint_updates)
+    if resolved:
+        logger.info(f"Tag cache resolved {len(resolved)} of {len(notes)} notes without the LLM: {counts}")
+    return resolved, pending
+
+def remember_tags(
+    db: Session, signatures: Dict[int, ContentSignature], tags_by_note: Dict[int, List[str]], commit: bool = True
+) -> None:
+    """Caches fresh suggestions and points the notes' tags_fingerprint at them.
+       Empty suggestions are not cached (they usually mean the LLM call failed).
+    """
+    from app.crud import crud_tag_cache
+    entries: Dict[str, Tuple[List[str], bytes]] = {}
+    fingerprint_updates = []
+    for note_id, tags in tags_by_note.items():
+        signature: Optional[ContentSignature] = signatures.get(note_id)
+        if signature is None or not tags:
+            continue
+        entries[signature.fingerprint] = (tags, _pack_minhash(signature.minhash))
+        fingerprint_updates.append({"id": note_id, "tags_fingerprint": signature.fingerprint})
+    if not entries:
+        return
+    crud_tag_cache.store_tags(db, model=settings.LLM_MODEL, entries=entries, commit=False)
+    db.bulk_update_mappings(Note, fingerprint_updates)
+    if commit:
+        db.commit()
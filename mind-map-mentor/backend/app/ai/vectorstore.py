@@ -1,24 +1,88 @@
-# Functions for interacting with the Pinecone vector store using LangChain integration
+# Functions for interacting with the vector store (Pinecone or the local index) using LangChain integration
 
 import pinecone
 # Import the Pinecone class directly
 from pinecone import Pinecone, Index, ServerlessSpec 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple, Callable
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
 import logging
 
 # Langchain specific imports
 from langchain_pinecone import PineconeVectorStore
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
 
 from app.core.config import settings
 from app.ai.embeddings import get_embedding_function # Import function to get embedder
+from app.ai.local_index import LocalVectorStore
 
 logger = logging.getLogger(__name__)
 
+VECTOR_STORE_BACKEND_PINECONE = "pinecone"
+VECTOR_STORE_BACKEND_LOCAL = "local"
+
+# Pinecone recommends fetching at most ~1000 IDs per request
+PINECONE_FETCH_BATCH_SIZE = 1000
+
+EMBEDDING_TYPES = ("content", "summary")
+# All note vector IDs look like note_{note_id}_{embedding_type}
+PINECONE_VECTOR_ID_PREFIX = "note_"
+
+PINECONE_NAMESPACE_MODE_SHARED = "shared"
+PINECONE_NAMESPACE_MODE_PER_USER = "per_user"
+USER_NAMESPACE_PREFIX = "user_"
+
 # Store the Pinecone client instance and VectorStore instance globally
 _pinecone_client: Pinecone | None = None
-_vector_store_instance: PineconeVectorStore | None = None
+_vector_store_instance: VectorStore | None = None
+# Bounded pool that runs the blocking vector store calls for the async helpers (a*)
+_vector_executor: ThreadPoolExecutor | None = None
+
+def initialize_vector_store():
+    """Initializes the vector store selected by settings.VECTOR_STORE_BACKEND."""
+    backend = settings.VECTOR_STORE_BACKEND.lower()
+    if backend == VECTOR_STORE_BACKEND_LOCAL:
+        initialize_local_vector_store()
+    elif backend == VECTOR_STORE_BACKEND_PINECONE:
+        initialize_pinecone_and_vector_store()
+    else:
+        raise ValueError(f"Unknown VECTOR_STORE_BACKEND '{settings.VECTOR_STORE_BACKEND}'.")
+
+def initialize_local_vector_store():
+    """Initializes the in-process LocalVectorStore stored under settings.LOCAL_VECTOR_INDEX_PATH."""
+    global _vector_store_instance
+    if _vector_store_instance:
+        logger.info("Local vector store already initialized.")
+        return
+
+    try:
+        logger.info(f"Initializing local vector store at '{settings.LOCAL_VECTOR_INDEX_PATH}'...")
+        embedding_function: Embeddings = get_embedding_function()
+        _vector_store_instance = LocalVectorStore(
+            embedding=embedding_function,
+            root_path=settings.LOCAL_VECTOR_INDEX_PATH,
+            hnsw_threshold=settings.LOCAL_VECTOR_HNSW_THRESHOLD,
+            hnsw_save_interval=settings.LOCAL_VECTOR_HNSW_SAVE_INTERVAL,
+            vector_dtype=settings.LOCAL_VECTOR_DTYPE,
+        )
+        logger.info("LocalVectorStore initialized successfully.")
+    except Exception as e:
+        logger.exception(f"Failed to initialize local vector store: {e}", exc_info=True)
+        _vector_store_instance = None
+        raise
+
+def close_vector_store():
+    """Releases resources held by the vector store (flushes the local index to disk)."""
+    global _vector_store_instance, _vector_executor
+    if _vector_executor is not None:
+        _vector_executor.shutdown(wait=True)
+        _vector_executor = None
+    if isinstance(_vector_store_instance, LocalVectorStore):
+        _vector_store_instance.close()
+        _vector_store_instance = None
 
 def initialize_pinecone_and_vector_store():
     """Initializes the Pinecone client, gets index, gets embedder, and creates PineconeVectorStore."""
@@ -90,16 +154,74 @@ def initialize_pinecone_and_vector_store():
         _vector_store_instance = None 
         raise # Re-raise after logging
 
-def get_vector_store() -> PineconeVectorStore:
-    """Returns the initialized PineconeVectorStore instance. Initializes if needed."""
+def uses_user_namespaces() -> bool:
+    """True when every user's vectors live in their own Pinecone namespace."""
+    return (
+        settings.VECTOR_STORE_BACKEND.lower() == VECTOR_STORE_BACKEND_PINECONE
+        and settings.PINECONE_NAMESPACE_MODE == PINECONE_NAMESPACE_MODE_PER_USER
+    )
+
+def user_namespace(user_id: int) -> str:
+    return f"{USER_NAMESPACE_PREFIX}{int(user_id)}"
+
+def _namespace_kwargs(user_id: Optional[int]) -> Dict[str, Any]:
+    """namespace=user_{id} in per-user namespace mode, otherwise nothing (default namespace)."""
+    if user_id is not None and uses_user_namespaces():
+        return {"namespace": user_namespace(user_id)}
+    return {}
+
+def _user_scope_kwargs(user_id: Optional[int], filter: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Keyword arguments that confine a vector store call to one user's vectors: the user's
+       namespace in per-user mode (no metadata filter needed), otherwise a user_id filter,
+       which also selects the partition of the local index.
+    """
+    filter = dict(filter or {})
+    if user_id is not None and not uses_user_namespaces():
+        filter = {"user_id": user_id, **filter}
+    kwargs = _namespace_kwargs(user_id)
+    if filter:
+        kwargs["filter"] = filter
+    return kwargs
+
+def get_vector_store() -> VectorStore:
+    """Returns the initialized vector store instance (Pinecone or local). Initializes if needed."""
     if _vector_store_instance is None:
-        logger.warning("Pinecone vector store accessed before initialization. Initializing now.")
-        initialize_pinecone_and_vector_store()
+        logger.warning("Vector store accessed before initialization. Initializing now.")
+        initialize_vector_store()
         if _vector_store_instance is None:
-            raise RuntimeError("Pinecone vector store could not be initialized.")
+            raise RuntimeError("Vector store could not be initialized.")
     return _vector_store_instance
 
-# --- Modified CRUD Operations using PineconeVectorStore ---
+# --- Modified CRUD Operations using the configured VectorStore ---
+
+def _build_note_documents(
+    note_id: int,
+    text_content: str,
+    metadata: Dict[str, Any],
+    summary_text: Optional[str] = None,
+    embedding_types: Sequence[str] = EMBEDDING_TYPES
+) -> Tuple[List[Document], List[str]]:
+    """Builds the content (and, if present, summary) Documents for a note, plus their vector IDs.
+       embedding_types limits which of the two are built.
+    """
+    documents: List[Document] = []
+    ids: List[str] = []
+    if "content" in embedding_types:
+        content_metadata = metadata.copy() # Avoid modifying original dict
+        content_metadata["embedding_type"] = "content"
+        documents.append(Document(page_content=text_content, metadata=content_metadata))
+        ids.append(f"note_{note_id}_content")
+
+    if "summary" in embedding_types:
+        if summary_text and summary_text.strip():
+            summary_metadata = metadata.copy() # Use a fresh copy
+            summary_metadata["embedding_type"] = "summary"
+            documents.append(Document(page_content=summary_text, metadata=summary_metadata))
+            ids.append(f"note_{note_id}_summary")
+        else:
+            logger.debug(f"No summary provided or empty for Note ID: {note_id}. Skipping summary vector upsert.")
+
+    return documents, ids
 
 def upsert_document(
     note_id: int, 
@@ -107,53 +229,247 @@ def upsert_document(
     metadata: Dict[str, Any], 
     summary_text: Optional[str] = None
 ):
-    """Creates LangChain Documents and upserts content and summary vectors using PineconeVectorStore."""
+    """Creates LangChain Documents and upserts content and summary vectors using the configured vector store.
+       Both documents go through one add_documents call, i.e. one embedding request and one upsert.
+    """
     logger.info(f"Attempting to upsert vectors for Note ID: {note_id}")
     try:
         vector_store = get_vector_store()
-        
-        # 1. Upsert Content Vector
-        content_doc_id = f"note_{note_id}_content"
-        content_metadata = metadata.copy() # Avoid modifying original dict
-        content_metadata["embedding_type"] = "content"
-        
-        content_doc = Document(page_content=text_content, metadata=content_metadata)
-        logger.debug(f"Upserting content vector (ID: {content_doc_id}) for Note ID: {note_id}")
-        vector_store.add_documents(documents=[content_doc], ids=[content_doc_id])
-        logger.debug(f"Successfully submitted content vector upsert for Note ID: {note_id}")
-        
-        # 2. Upsert Summary Vector (if summary provided)
-        if summary_text and summary_text.strip():
-            summary_doc_id = f"note_{note_id}_summary"
-            summary_metadata = metadata.copy() # Use a fresh copy
-            summary_metadata["embedding_type"] = "summary"
-            
-            summary_doc = Document(page_content=summary_text, metadata=summary_metadata)
-            logger.debug(f"Upserting summary vector (ID: {summary_doc_id}) for Note ID: {note_id}")
-            vector_store.add_documents(documents=[summary_doc], ids=[summary_doc_id])
-            logger.debug(f"Successfully submitted summary vector upsert for Note ID: {note_id}")
-        else:
-            logger.debug(f"No summary provided or empty for Note ID: {note_id}. Skipping summary vector upsert.")
-
+        documents, ids = _build_note_documents(note_id, text_content, metadata, summary_text)
+        logger.debug(f"Upserting vectors (IDs: {ids}) for Note ID: {note_id}")
+        vector_store.add_documents(
+            documents=documents, ids=ids, batch_size=len(ids), **_namespace_kwargs(metadata.get("user_id"))
+        )
         logger.info(f"Vector upsert process completed for Note ID: {note_id}")
 
     except Exception as e:
         logger.error(f"Failed during vector upsert process for Note ID: {note_id}: {e}", exc_info=True)
 
-def delete_document(note_id: int):
-    """Deletes both content and summary vectors for a given note ID using PineconeVectorStore."""
+def upsert_documents_bulk_detailed(
+    notes: List[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    embedding_types: Sequence[str] = EMBEDDING_TYPES
+) -> List[int]:
+    """Upserts content/summary vectors for many notes in provider-sized batches.
+
+    Each item in `notes` takes the same keys as upsert_document's arguments
+    (note_id, text_content, metadata, summary_text). A note's documents are never
+    split across batches, and each batch costs one embedding call and one upsert.
+    embedding_types limits which vectors are written (e.g. only "summary").
+    In per-user namespace mode a batch only holds notes of one user.
+    Returns the IDs of the notes whose batch failed (empty when everything succeeded).
+    """
+    batch_size = batch_size or settings.VECTOR_UPSERT_BATCH_SIZE
+    vector_store = get_vector_store()
+    failed_note_ids: List[int] = []
+    per_user = uses_user_namespaces()
+    if per_user:
+        notes = sorted(notes, key=lambda note: int(note["metadata"]["user_id"]))
+
+    def flush(documents: List[Document], ids: List[str], note_ids: List[int]):
+        try:
+            user_id = documents[0].metadata.get("user_id") if per_user else None
+            vector_store.add_documents(documents=documents, ids=ids, batch_size=len(ids), **_namespace_kwargs(user_id))
+            logger.debug(f"Bulk upserted {len(ids)} vectors for {len(note_ids)} notes.")
+        except Exception as e:
+            logger.error(f"Failed bulk vector upsert for notes {note_ids}: {e}", exc_info=True)
+            failed_note_ids.extend(note_ids)
+
+    batch_documents: List[Document] = []
+    batch_ids: List[str] = []
+    batch_note_ids: List[int] = []
+    for note in notes:
+        documents, ids = _build_note_documents(
+            note_id=note["note_id"],
+            text_content=note.get("text_content") or "",
+            metadata=note["metadata"],
+            summary_text=note.get("summary_text"),
+            embedding_types=embedding_types,
+        )
+        if not ids:
+            continue
+        user_changed = per_user and batch_documents and batch_documents[0].metadata.get("user_id") != note["metadata"]["user_id"]
+        if batch_ids and (len(batch_ids) + len(ids) > batch_size or user_changed):
+            flush(batch_documents, batch_ids, batch_note_ids)
+            batch_documents, batch_ids, batch_note_ids = [], [], []
+        batch_documents.extend(documents)
+        batch_ids.extend(ids)
+        batch_note_ids.append(note["note_id"])
+    if batch_ids:
+        flush(batch_documents, batch_ids, batch_note_ids)
+
+    logger.info(f"Bulk vector upsert completed: {len(notes) - len(failed_note_ids)}/{len(notes)} notes submitted.")
+    return failed_note_ids
+
+def upsert_documents_bulk(notes: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+    """Like upsert_documents_bulk_detailed, but returns the number of notes whose vectors were submitted successfully."""
+    return len(notes) - len(upsert_documents_bulk_detailed(notes, batch_size=batch_size))
+
+def delete_document(note_id: int, user_id: Optional[int] = None):
+    """Deletes both content and summary vectors for a given note ID.
+       Passing user_id lets the local index go straight to the owner's partition; in per-user
+       namespace mode it selects the namespace the vectors live in.
+    """
     content_doc_id = f"note_{note_id}_content"
     summary_doc_id = f"note_{note_id}_summary"
     ids_to_delete = [content_doc_id, summary_doc_id]
     logger.info(f"Attempting to delete vectors for Note ID: {note_id} (IDs: {ids_to_delete})")
     try:
         vector_store = get_vector_store()
-        vector_store.delete(ids=ids_to_delete)
+        # Pinecone ignores the filter when ids are given; the local index uses it to pick the partition
+        vector_store.delete(ids=ids_to_delete, **_user_scope_kwargs(user_id))
         logger.info(f"Successfully submitted deletion request for vectors associated with Note ID: {note_id}")
     except Exception as e:
         # Log error but don't prevent other operations, deletion is best-effort
         logger.error(f"Failed during vector deletion process for Note ID: {note_id}: {e}", exc_info=True)
 
+def delete_vectors(ids: List[str], user_id: Optional[int] = None):
+    """Deletes vectors by ID (the store splits large deletes into requests).
+       Unlike delete_document, failures are raised to the caller.
+    """
+    if not ids:
+        return
+    get_vector_store().delete(ids=ids, **_user_scope_kwargs(user_id))
+
+def delete_documents(note_ids: List[int], user_id: Optional[int] = None):
+    """Deletes the content and summary vectors of many notes in one request. Failures are raised."""
+    if not note_ids:
+        return
+    delete_vectors(
+        [f"note_{note_id}_{embedding_type}" for note_id in note_ids for embedding_type in EMBEDDING_TYPES],
+        user_id=user_id
+    )
+    logger.info(f"Deleted vectors of {len(note_ids)} notes (user {user_id}).")
+
+def parse_vector_id(vector_id: str) -> Optional[Tuple[int, str]]:
+    """'note_12_summary' -> (12, "summary"); None for IDs not written by this module."""
+    parts = vector_id.split("_")
+    if len(parts) != 3 or parts[0] != "note" or not parts[1].isdigit() or parts[2] not in EMBEDDING_TYPES:
+        return None
+    return int(parts[1]), parts[2]
+
+def list_vector_user_ids() -> Optional[List[int]]:
+    """Users that have their own local partition or Pinecone namespace; None for a shared
+       Pinecone namespace, whose IDs aren't partitioned by user."""
+    vector_store = get_vector_store()
+    if isinstance(vector_store, LocalVectorStore):
+        return vector_store.list_user_ids()
+    if not uses_user_namespaces():
+        return None
+    namespaces = vector_store.index.describe_index_stats().namespaces or {}
+    return [
+        int(namespace[len(USER_NAMESPACE_PREFIX):]) for namespace in namespaces
+        if namespace.startswith(USER_NAMESPACE_PREFIX) and namespace[len(USER_NAMESPACE_PREFIX):].isdigit()
+    ]
+
+def iter_vector_ids(user_ids: Optional[List[int]] = None) -> Iterator[Tuple[str, Optional[int]]]:
+    """Streams (vector ID, owner user ID) for the stored vectors.
+       The local index is read per user partition and per-user Pinecone namespaces one
+       namespace at a time (all of them, or only user_ids). A shared Pinecone namespace can
+       only list IDs, which carry no owner: it is listed whole by the "note_" prefix and the
+       owner is None (see fetch_vector_owners).
+    """
+    vector_store = get_vector_store()
+    if isinstance(vector_store, LocalVectorStore):
+        yield from vector_store.iter_ids(user_ids)
+        return
+    if uses_user_namespaces():
+        for user_id in (user_ids if user_ids is not None else list_vector_user_ids()):
+            for page in vector_store.index.list(prefix=PINECONE_VECTOR_ID_PREFIX, namespace=user_namespace(user_id)):
+                for vector_id in page:
+                    yield vector_id, user_id
+        return
+    # index.list pages through IDs (serverless indexes) without loading them all at once
+    for page in vector_store.index.list(prefix=PINECONE_VECTOR_ID_PREFIX):
+        for vector_id in page:
+            yield vector_id, None
+
+def fetch_vector_owners(ids: List[str]) -> Dict[str, Optional[int]]:
+    """Returns {vector ID: user_id from its metadata} for the IDs that exist in the shared
+       Pinecone namespace (local partitions and per-user namespaces already know the owner)."""
+    vector_store = get_vector_store()
+    owners: Dict[str, Optional[int]] = {}
+    if isinstance(vector_store, LocalVectorStore):
+        wanted = set(ids)
+        for vector_id, user_id in vector_store.iter_ids():
+            if vector_id in wanted:
+                owners[vector_id] = user_id
+        return owners
+    for i in range(0, len(ids), PINECONE_FETCH_BATCH_SIZE):
+        response = vector_store.index.fetch(ids=ids[i:i + PINECONE_FETCH_BATCH_SIZE])
+        for vector_id, vector in response.vectors.items():
+            user_id = (vector.metadata or {}).get("user_id")
+            owners[vector_id] = int(user_id) if user_id is not None else None
+    return owners
+
+def _fetch_vectors(ids: List[str], user_id: int) -> List[Tuple[List[float], Dict[str, Any]]]:
+    """Fetches stored vectors by ID without re-embedding anything.
+       Returns (values, metadata) pairs; missing vectors and vectors of other users are left out.
+    """
+    vector_store = get_vector_store()
+    if isinstance(vector_store, LocalVectorStore):
+        items = list(vector_store.get_vectors_by_ids(ids, user_id=user_id).values())
+    else:
+        items = []
+        for i in range(0, len(ids), PINECONE_FETCH_BATCH_SIZE):
+            response = vector_store.index.fetch(ids=ids[i:i + PINECONE_FETCH_BATCH_SIZE], **_namespace_kwargs(user_id))
+            items.extend((list(vector.values), vector.metadata or {}) for vector in response.vectors.values())
+    return [
+        (values, metadata) for values, metadata in items
+        if metadata.get('user_id') is not None and int(metadata['user_id']) == user_id
+    ]
+
+def fetch_note_vectors(note_ids: List[int], user_id: int, embedding_type: str) -> Dict[int, List[float]]:
+    """Fetches the stored note_{id}_{embedding_type} vectors of many notes. Returns {note_id: vector}."""
+    ids = [f"note_{note_id}_{embedding_type}" for note_id in note_ids]
+    vectors = {int(metadata['note_id']): values for values, metadata in _fetch_vectors(ids, user_id)}
+    logger.debug(f"Fetched {len(vectors)}/{len(ids)} {embedding_type} vectors for user {user_id}.")
+    return vectors
+
+def fetch_note_embeddings(
+    note_id: int, user_id: int, embedding_types: Tuple[str, ...] = ("content", "summary")
+) -> Dict[str, List[float]]:
+    """Fetches the stored vectors of one note for several embedding types in a single call.
+       Returns {embedding_type: vector} for the types that exist.
+    """
+    ids = [f"note_{note_id}_{embedding_type}" for embedding_type in embedding_types]
+    return {metadata.get('embedding_type'): values for values, metadata in _fetch_vectors(ids, user_id)}
+
+def _format_search_results(results_with_scores: List[Tuple[Any, float]]) -> List[Dict[str, Any]]:
+    """Converts (Document, score) pairs into dicts with 'id' (note_{id}), 'score', 'metadata' and 'page_content'."""
+    similar_notes_data = []
+    for doc, score in results_with_scores: # doc is a LangChain Document object
+        page_content = doc.page_content  # Extract page content
+        metadata = doc.metadata or {}
+
+        # Extract note_id as int
+        note_id_float = metadata.get('note_id')
+        note_id = int(note_id_float) if note_id_float is not None else None
+
+        # Extract user_id as int
+        user_id_float = metadata.get('user_id')
+        retrieved_user_id = int(user_id_float) if user_id_float is not None else None # Use different variable name
+
+        # Update metadata dict in-place with integer versions if they exist
+        if note_id is not None:
+            metadata['note_id'] = note_id
+        if retrieved_user_id is not None:
+            metadata['user_id'] = retrieved_user_id # Update with the int version
+
+        # Construct vector ID using integer note_id
+        vector_id = f"note_{note_id}" if note_id is not None else None
+
+        if vector_id:
+            similar_notes_data.append({
+                'id': vector_id,
+                'score': score,
+                'metadata': metadata,
+                'page_content': page_content # <-- Add page_content here
+            })
+        else:
+            logger.warning(f"Could not determine vector ID from metadata for a search result: {metadata}")
+    return similar_notes_data
+
 def query_similar_notes(
     query_text: str,
     user_id: int,
@@ -161,18 +477,13 @@ def query_similar_notes(
     top_k: int = 5,
     filter: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
-    """Finds vectors similar to the query text using PineconeVectorStore, filtered by user_id and embedding_type.
+    """Finds vectors similar to the query text using the configured vector store, filtered by user_id and embedding_type.
        Returns a list of dicts, each containing 'id', 'score', 'metadata', and 'page_content'.
     """
-    # Ensure base filter includes the user_id and embedding_type
-    final_filter = {
-        "user_id": user_id,
-        "embedding_type": embedding_type_filter # Add the mandatory type filter
-    }
-    if filter: # Allow merging with other potential filters if needed later
-        final_filter.update(filter)
-
-    logger.info(f"Attempting vector search for query: '{query_text}', user_id: {user_id}, top_k={top_k}, filter={final_filter}")
+    # Scope to the user (namespace or user_id filter) and the mandatory embedding_type
+    scope = _user_scope_kwargs(user_id, {"embedding_type": embedding_type_filter, **(filter or {})})
+
+    logger.info(f"Attempting vector search for query: '{query_text}', user_id: {user_id}, top_k={top_k}, scope={scope}")
     try:
         vector_store = get_vector_store()
 
@@ -180,48 +491,191 @@ def query_similar_notes(
         results_with_scores = vector_store.similarity_search_with_score(
             query=query_text,
             k=top_k,
-            filter=final_filter # Use the final filter
+            **scope
         )
         logger.debug(f"vector_store.similarity_search_with_score returned: {results_with_scores}")
 
-        # Process results
-        similar_notes_data = []
-        for doc, score in results_with_scores: # doc is a LangChain Document object
-            page_content = doc.page_content  # Extract page content
-            metadata = doc.metadata or {}
-
-            # Extract note_id as int
-            note_id_float = metadata.get('note_id')
-            note_id = int(note_id_float) if note_id_float is not None else None
-
-            # Extract user_id as int
-            user_id_float = metadata.get('user_id')
-            retrieved_user_id = int(user_id_float) if user_id_float is not None else None # Use different variable name
-
-            # Update metadata dict in-place with integer versions if they exist
-            if note_id is not None:
-                metadata['note_id'] = note_id
-            if retrieved_user_id is not None:
-                metadata['user_id'] = retrieved_user_id # Update with the int version
-
-            # Construct vector ID using integer note_id
-            vector_id = f"note_{note_id}" if note_id is not None else None
-
-            if vector_id:
-                similar_notes_data.append({
-                    'id': vector_id,
-                    'score': score,
-                    'metadata': metadata,
-                    'page_content': page_content # <-- Add page_content here
-                })
-            else:
-                logger.warning(f"Could not determine vector ID from metadata for a search result: {metadata}")
-
-        logger.debug(f"Processed {len(similar_notes_data)} similar notes for query via PineconeVectorStore.")
+        similar_notes_data = _format_search_results(results_with_scores)
+        logger.debug(f"Processed {len(similar_notes_data)} similar notes for query via {type(vector_store).__name__}.")
         return similar_notes_data
 
     except Exception as e:
-        logger.exception(f"Error querying PineconeVectorStore for similar notes: {e}", exc_info=True)
+        logger.exception(f"Error querying vector store for similar notes: {e}", exc_info=True)
         return [] # Return empty list on error
 
-# Consider calling initialize_pinecone_and_vector_store() at application startup
\ No newline at end of file
+def query_similar_notes_by_vector(
+    query_vector: List[float],
+    user_id: int,
+    embedding_type_filter: str,
+    top_k: int = 5,
+    filter: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Like query_similar_notes, but searches with an already stored vector (see fetch_note_embeddings),
+       so no embedding API call is made. Returns the same list of dicts.
+    """
+    scope = _user_scope_kwargs(user_id, {"embedding_type": embedding_type_filter, **(filter or {})})
+
+    logger.info(f"Attempting vector search by vector, user_id: {user_id}, top_k={top_k}, scope={scope}")
+    try:
+        vector_store = get_vector_store()
+        results_with_scores = vector_store.similarity_search_by_vector_with_score(
+            embedding=query_vector,
+            k=top_k,
+            **scope
+        )
+        similar_notes_data = _format_search_results(results_with_scores)
+        logger.debug(f"Processed {len(similar_notes_data)} similar notes for vector query via {type(vector_store).__name__}.")
+        return similar_notes_data
+
+    except Exception as e:
+        logger.exception(f"Error querying vector store by vector: {e}", exc_info=True)
+        return []
+
+def merge_matches_by_note(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Deduplicates matches per note, keeping the highest score (max aggregation).
+       Each merged match gets 'type_scores' ({embedding_type: score}). Sorted best first.
+    """
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for match in matches:
+        embedding_type = match['metadata'].get('embedding_type')
+        merged = by_id.get(match['id'])
+        if merged is None:
+            merged = by_id[match['id']] = dict(match, type_scores={})
+        elif match['score'] > merged['score']:
+            merged.update({key: value for key, value in match.items() if key != 'type_scores'})
+        merged['type_scores'][embedding_type] = max(match['score'], merged['type_scores'].get(embedding_type, match['score']))
+    return sorted(by_id.values(), key=lambda match: match['score'], reverse=True)
+
+def query_similar_notes_multi(
+    query_text: str,
+    user_id: int,
+    embedding_types: Sequence[str] = EMBEDDING_TYPES,
+    top_k: int = 5,
+    filter: Optional[Dict[str, Any]] = None
+) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Searches several embedding types with one query embedding and one vector query
+       (an $in filter on embedding_type), instead of one query_similar_notes call per type.
+       Returns (matches grouped by embedding type, matches deduplicated per note with max score),
+       both best first. top_k * len(embedding_types) vectors are requested, so at least
+       top_k distinct notes come back when the user has them.
+    """
+    embedding_types = list(embedding_types)
+    by_type: Dict[str, List[Dict[str, Any]]] = {embedding_type: [] for embedding_type in embedding_types}
+    scope = _user_scope_kwargs(user_id, {"embedding_type": {"$in": embedding_types}, **(filter or {})})
+
+    logger.info(f"Attempting multi-type vector search for query: '{query_text}', user_id: {user_id}, top_k={top_k}, scope={scope}")
+    try:
+        vector_store = get_vector_store()
+        results_with_scores = vector_store.similarity_search_with_score(
+            query=query_text,
+            k=top_k * len(embedding_types),
+            **scope
+        )
+        matches = _format_search_results(results_with_scores)
+    except Exception as e:
+        logger.exception(f"Error in multi-type vector search: {e}", exc_info=True)
+        return by_type, []
+
+    for match in matches:
+        by_type.setdefault(match['metadata'].get('embedding_type'), []).append(match)
+    return by_type, merge_matches_by_note(matches)[:top_k]
+
+def delete_user_vectors(user_id: int) -> None:
+    """Deletes every vector of a user. With the local index or per-user namespaces this is
+       a single partition / namespace drop. In a shared Pinecone namespace it is a metadata
+       delete, which serverless indexes don't support. Failures are raised.
+    """
+    vector_store = get_vector_store()
+    if isinstance(vector_store, LocalVectorStore):
+        vector_store.drop_user(user_id)
+    elif uses_user_namespaces():
+        vector_store.delete(delete_all=True, namespace=user_namespace(user_id))
+    else:
+        vector_store.delete(filter={"user_id": user_id})
+    logger.info(f"Deleted all vectors of user {user_id}.")
+
+# --- Async variants ---
+# The Pinecone client and the embedding calls are blocking network I/O. These wrappers run
+# them on a bounded thread pool so async handlers and the worker never block the event loop.
+
+def _get_vector_executor() -> ThreadPoolExecutor:
+    global _vector_executor
+    if _vector_executor is None:
+        _vector_executor = ThreadPoolExecutor(
+            max_workers=settings.VECTOR_STORE_MAX_WORKERS,
+            thread_name_prefix="vectorstore"
+        )
+    return _vector_executor
+
+async def _run_in_vector_executor(func: Callable, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_vector_executor(), functools.partial(func, *args, **kwargs))
+
+async def aupsert_document(
+    note_id: int,
+    text_content: str,
+    metadata: Dict[str, Any],
+    summary_text: Optional[str] = None
+) -> None:
+    """Async variant of upsert_document."""
+    await _run_in_vector_executor(upsert_document, note_id, text_content, metadata, summary_text=summary_text)
+
+async def aupsert_documents_bulk(notes: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+    """Async variant of upsert_documents_bulk."""
+    return await _run_in_vector_executor(upsert_documents_bulk, notes, batch_size=batch_size)
+
+async def aupsert_documents_bulk_detailed(notes: List[Dict[str, Any]], batch_size: Optional[int] = None) -> List[int]:
+    """Async variant of upsert_documents_bulk_detailed."""
+    return await _run_in_vector_executor(upsert_documents_bulk_detailed, notes, batch_size=batch_size)
+
+async def adelete_documents(note_ids: List[int], user_id: Optional[int] = None) -> None:
+    """Async variant of delete_documents."""
+    await _run_in_vector_executor(delete_documents, note_ids, user_id=user_id)
+
+async def adelete_document(note_id: int, user_id: Optional[int] = None) -> None:
+    """Async variant of delete_document."""
+    await _run_in_vector_executor(delete_document, note_id, user_id=user_id)
+
+async def afetch_note_embeddings(
+    note_id: int, user_id: int, embedding_types: Tuple[str, ...] = ("content", "summary")
+) -> Dict[str, List[float]]:
+    """Async variant of fetch_note_embeddings."""
+    return await _run_in_vector_executor(fetch_note_embeddings, note_id, user_id, embedding_types=embedding_types)
+
+async def aquery_similar_notes(
+    query_text: str,
+    user_id: int,
+    embedding_type_filter: str,
+    top_k: int = 5,
+    filter: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Async variant of query_similar_notes."""
+    return await _run_in_vector_executor(
+        query_similar_notes, query_text, user_id, embedding_type_filter, top_k=top_k, filter=filter
+    )
+
+async def aquery_similar_notes_multi(
+    query_text: str,
+    user_id: int,
+    embedding_types: Sequence[str] = EMBEDDING_TYPES,
+    top_k: int = 5,
+    filter: Optional[Dict[str, Any]] = None
+) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Async variant of query_similar_notes_multi."""
+    return await _run_in_vector_executor(
+        query_similar_notes_multi, query_text, user_id, embedding_types, top_k=top_k, filter=filter
+    )
+
+async def aquery_similar_notes_by_vector(
+    query_vector: List[float],
+    user_id: int,
+    embedding_type_filter: str,
+    top_k: int = 5,
+    filter: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """Async variant of query_similar_notes_by_vector."""
+    return await _run_in_vector_executor(
+        query_similar_notes_by_vector, query_vector, user_id, embedding_type_filter, top_k=top_k, filter=filter
+    )
+
+# Consider calling initialize_vector_store() at application startup
\ No newline at end of file
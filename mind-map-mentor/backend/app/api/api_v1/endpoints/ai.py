@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Query, Depends, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Query, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Dict, List, Literal, Optional
 import logging # Add logging
 
 from app import schemas # Assuming schemas.__init__ will expose AI schemas
 from app.api import deps
-from app.models import User
+from app.models import User, Note
+from app.crud import crud_job, crud_note
 # Uncomment the vector store import 
-from app.ai.vectorstore import query_similar_notes 
+from app.ai.vectorstore import query_similar_notes_by_vector, fetch_note_embeddings
+from app.ai.search import search_notes
+from app.ai.embeddings import get_embedding_stats
 from app.ai.rag import generate_rag_answer # Import the new RAG function
+from app.ai.llm import get_llm_stats
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -16,30 +21,83 @@ logger = logging.getLogger(__name__)
 def search_notes_endpoint(
     query: str = Query(..., description="The search query string."),
     top_k: Optional[int] = Query(5, description="Number of results to return.", ge=1, le=20),
+    mode: Literal["hybrid", "vector", "lexical"] = Query("hybrid", description="hybrid merges full-text and vector results; quoted queries are answered lexically."),
+    embedding_type: Literal["content", "summary", "any"] = Query("content", description="Embeddings searched by the vector part; any searches both in one query."),
+    tag: Optional[List[str]] = Query(None, description="Only notes carrying this tag (repeatable)."),
+    match_all_tags: bool = Query(False, description="Require every given tag instead of any of them."),
+    db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_user) # Require authenticated user
 ):
     """
-    Performs semantic search for notes based on the query for the current user.
+    Searches the current user's notes with Postgres full-text search, vector similarity, or both.
     """
-    if not query:
+    if not query or not query.strip():
         raise HTTPException(status_code=400, detail="Query parameter cannot be empty.")
     
     try:
-        # Pass user_id for filtering
-        search_results = query_similar_notes(
-            query_text=query, 
-            user_id=current_user.id, 
-            top_k=top_k
+        mode_used, search_results = search_notes(
+            db,
+            query=query,
+            user_id=current_user.id,
+            top_k=top_k,
+            mode=mode,
+            embedding_type=embedding_type,
+            tags=tag,
+            match_all_tags=match_all_tags
         )
         
         pydantic_results = [schemas.ai.SearchMatch(**result) for result in search_results]
         
-        return schemas.ai.SearchResponse(query=query, results=pydantic_results)
+        return schemas.ai.SearchResponse(query=query, mode=mode_used, results=pydantic_results)
     
     except Exception as e:
         logger.exception(f"Error during note search for query '{query}', user {current_user.id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error during search.") 
 
+@router.get("/notes/{note_id}/similar", response_model=schemas.ai.SimilarNotesResponse)
+def similar_notes_endpoint(
+    note_id: int,
+    embedding_type: Literal["content", "summary"] = Query("content", description="Compare note content or summaries."),
+    top_k: int = Query(5, description="Number of results to return.", ge=1, le=20),
+    min_score: float = Query(0.0, description="Drop matches scoring below this.", ge=0.0, le=1.0),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user)
+):
+    """
+    "More like this": finds notes similar to an existing note.
+    Searches with the note's stored vector, so no embedding API call is made.
+    """
+    note = crud_note.get_note(db, note_id=note_id, user_id=current_user.id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    stored_vectors = fetch_note_embeddings(note_id, user_id=current_user.id, embedding_types=(embedding_type,))
+    if embedding_type not in stored_vectors:
+        # Not enriched yet, or the note has no summary
+        raise HTTPException(status_code=404, detail=f"No {embedding_type} embedding stored for this note")
+
+    matches = query_similar_notes_by_vector(
+        query_vector=stored_vectors[embedding_type],
+        user_id=current_user.id,
+        embedding_type_filter=embedding_type,
+        top_k=top_k,
+        filter={"note_id": {"$ne": note_id}}
+    )
+    scores = {
+        match['metadata']['note_id']: match['score']
+        for match in matches
+        if match['score'] >= min_score
+    }
+
+    # Hydrate titles with one query; vectors without a note (e.g. just deleted) are dropped
+    titles = crud_note.get_note_titles(db, note_ids=list(scores), user_id=current_user.id)
+    results = [
+        schemas.ai.SimilarNote(note_id=similar_id, title=titles[similar_id][0], graph_node_id=titles[similar_id][1], score=score)
+        for similar_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if similar_id in titles
+    ]
+    return schemas.ai.SimilarNotesResponse(note_id=note_id, embedding_type=embedding_type, results=results)
+
 # --- New RAG Endpoint --- #
 @router.post("/rag-query", response_model=schemas.ai.RagQueryResponse)
 async def rag_query_endpoint(
@@ -69,4 +127,107 @@ async def rag_query_endpoint(
     except Exception as e:
         # Catch unexpected errors during the RAG process
         logger.exception(f"Unhandled error during RAG query for user {current_user.id}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error during RAG processing.") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error during RAG processing.")
+
+# --- Admin Endpoints --- #
+@router.post(
+    "/admin/similarity-graph/rebuild",
+    response_model=schemas.ai.QueuedJobsResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+def rebuild_similarity_graph_endpoint(
+    request: schemas.ai.SimilarityGraphRebuildRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    Queues a full rebuild of the summary-similarity edges (one job per user).
+    The worker recomputes top-k neighbours for every note in one vectorised pass.
+    """
+    if request.user_id is not None:
+        user_ids = [request.user_id]
+    else:
+        user_ids = [row[0] for row in db.query(Note.user_id).distinct().all()]
+
+    payload = {"top_k": request.top_k, "threshold": request.threshold}
+    jobs = [
+        crud_job.enqueue_job(
+            db, user_id=user_id, job_type=crud_job.JOB_TYPE_REBUILD_SIMILARITY_GRAPH, payload=payload, commit=False
+        )
+        for user_id in user_ids
+    ]
+    db.commit()
+    logger.info(f"Admin {current_user.id} queued similarity graph rebuild for users {user_ids}")
+    return schemas.ai.QueuedJobsResponse(
+        job_type=crud_job.JOB_TYPE_REBUILD_SIMILARITY_GRAPH,
+        job_ids=[job.id for job in jobs]
+    )
+
+@router.post(
+    "/admin/vectors/reconcile",
+    response_model=schemas.ai.QueuedJobsResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+def reconcile_vectors_endpoint(
+    request: schemas.ai.VectorReconcileRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    Queues a vector store / Postgres consistency check. The worker deletes orphaned vectors,
+    re-enqueues notes with missing vectors and stores the drift report in the job payload.
+    """
+    payload = {"user_ids": request.user_ids, "dry_run": request.dry_run}
+    job = crud_job.enqueue_job(
+        db, user_id=current_user.id, job_type=crud_job.JOB_TYPE_RECONCILE_VECTORS, payload=payload
+    )
+    logger.info(f"Admin {current_user.id} queued vector reconcile job {job.id} (users={request.user_ids}, dry_run={request.dry_run})")
+    return schemas.ai.QueuedJobsResponse(job_type=crud_job.JOB_TYPE_RECONCILE_VECTORS, job_ids=[job.id])
+
+@router.post(
+    "/admin/tags/retag",
+    response_model=schemas.ai.QueuedJobsResponse,
+    status_code=status.HTTP_202_ACCEPTED
+)
+def retag_notes_endpoint(
+    request: schemas.ai.RetagNotesRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    Queues an AI retag of all notes (one job per user). The worker packs many notes into
+    each LLM call and queues vector refreshes for notes whose tags changed.
+    """
+    if request.user_id is not None:
+        user_ids = [request.user_id]
+    else:
+        user_ids = [row[0] for row in db.query(Note.user_id).distinct().all()]
+
+    payload = {"only_untagged": request.only_untagged}
+    jobs = [
+        crud_job.enqueue_job(
+            db, user_id=user_id, job_type=crud_job.JOB_TYPE_RETAG_NOTES, payload=payload, commit=False
+        )
+        for user_id in user_ids
+    ]
+    db.commit()
+    logger.info(f"Admin {current_user.id} queued retag for users {user_ids}")
+    return schemas.ai.QueuedJobsResponse(job_type=crud_job.JOB_TYPE_RETAG_NOTES, job_ids=[job.id for job in jobs])
+
+@router.get("/admin/embedding-stats", response_model=Dict[str, Dict[str, float]])
+def embedding_stats_endpoint(
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    Counters of the embedding caches and the micro-batching dispatcher (e.g. avg_fill_ratio).
+    """
+    return get_embedding_stats()
+
+@router.get("/admin/llm-stats", response_model=Dict[str, float])
+def llm_stats_endpoint(
+    current_user: User = Depends(deps.get_current_admin_user)
+):
+    """
+    Counters of the shared chat model registry (calls, errors, in_flight, rate_limited_seconds, latency).
+    """
+    return get_llm_stats()
@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List, Any
+from typing import List, Any, Optional
 
 # Import new schemas, models, crud, and deps
 from app import models # Keep models for dependency
 from app.schemas import graph as graph_schemas # Use aliased import for new schemas
-from app.crud import crud_graph # Import new CRUD functions
+from app.crud import crud_graph, crud_tag # Import new CRUD functions
 from app.api import deps
 
 # Placeholder for graph endpoints
@@ -18,10 +18,14 @@ async def list_graph_nodes(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
+    tag: Optional[List[str]] = Query(None, description="Only nodes carrying this tag (repeatable)."),
+    match_all_tags: bool = Query(False, description="Require every given tag instead of any of them."),
     current_user: models.User = Depends(deps.get_current_active_user)
 ):
-    """Retrieve graph nodes for the current user."""
-    nodes = crud_graph.get_graph_nodes_for_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    """Retrieve graph nodes for the current user, optionally filtered by tag."""
+    nodes = crud_graph.get_graph_nodes_for_user(
+        db, user_id=current_user.id, skip=skip, limit=limit, tags=tag, match_all_tags=match_all_tags
+    )
     return nodes
 
 @router.post("/nodes", response_model=graph_schemas.GraphNode, status_code=status.HTTP_201_CREATED, summary="Create a new graph node")
@@ -79,12 +83,29 @@ def list_graph_nodes_all(
     db: Session = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 1000, # Increase limit potentially
+    tag: Optional[List[str]] = Query(None, description="Only nodes carrying this tag (repeatable)."),
+    match_all_tags: bool = Query(False, description="Require every given tag instead of any of them."),
     current_user: models.User = Depends(deps.get_current_active_user)
 ):
-    """Retrieve all graph nodes (notes, files, etc.) for the current user."""
-    nodes = crud_graph.get_graph_nodes_for_user(db, user_id=current_user.id, skip=skip, limit=limit)
+    """Retrieve all graph nodes (notes, files, etc.) for the current user, optionally filtered by tag."""
+    nodes = crud_graph.get_graph_nodes_for_user(
+        db, user_id=current_user.id, skip=skip, limit=limit, tags=tag, match_all_tags=match_all_tags
+    )
     return nodes
 
+# --- Tags ---
+
+@router.get("/tags", response_model=List[graph_schemas.TagCount], summary="List the current user's tags with node counts")
+def list_tags(
+    db: Session = Depends(deps.get_db),
+    prefix: Optional[str] = Query(None, description="Only tags starting with this text (e.g. for autocomplete)."),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: models.User = Depends(deps.get_current_active_user)
+):
+    """Tag cloud data: each tag in use with the number of nodes carrying it, most used first."""
+    rows = crud_tag.get_tag_counts(db, user_id=current_user.id, prefix=prefix, limit=limit)
+    return [graph_schemas.TagCount(name=name, count=count) for name, count in rows]
+
 # --- Graph Edges ---
 
 @router.get("/edges", response_model=List[graph_schemas.GraphEdge], summary="List graph edges for the current user")
@@ -107,8 +128,9 @@ async def create_graph_edge(
 ):
     """Create a new graph edge. 
     Validates that source/target nodes exist and belong to the user.
+    Creating an edge that already exists (same source, target and type) updates its label/data instead.
     """
-    db_edge = crud_graph.create_graph_edge(db=db, edge=edge_in, user_id=current_user.id)
+    db_edge = crud_graph.upsert_graph_edge(db=db, edge=edge_in, user_id=current_user.id)
     if db_edge is None:
         # CRUD function prints details, return a generic error
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create edge. Source or target node may not exist or belong to user.")
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Any
 
 from app import schemas, models, crud
+from app.crud import crud_job
 from app.api import deps
 from app.db.session import get_db
 
@@ -43,6 +44,26 @@ async def get_note(
         raise HTTPException(status_code=404, detail="Note not found")
     return note
 
+@router.get("/{note_id}/enrichment", response_model=schemas.NoteEnrichmentStatus, summary="Get the AI enrichment status of a note")
+async def get_note_enrichment_status(
+    note_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(deps.get_current_active_user)
+):
+    """Report whether tags, vectors and auto-links for a note have been generated yet."""
+    note = crud.get_note(db, note_id=note_id, user_id=current_user.id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    job = crud_job.get_latest_job_for_note(db, note_id=note_id, user_id=current_user.id)
+    return schemas.NoteEnrichmentStatus(
+        note_id=note.id,
+        status=note.enrichment_status,
+        job_status=job.status if job else None,
+        attempts=job.attempts if job else 0,
+        last_error=job.last_error if job else None,
+        updated_at=(job.updated_at or job.created_at) if job else None,
+    )
+
 @router.put("/{note_id}", response_model=schemas.Note, summary="Update a specific note")
 async def update_note(
     note_id: int,
@@ -64,7 +85,7 @@ async def delete_note(
     current_user: models.User = Depends(deps.get_current_active_user)
 ):
     """Delete a note owned by the current user."""
-    note = crud.delete_note(db, note_id=note_id, user_id=current_user.id)
+    note = await crud.delete_note(db, note_id=note_id, user_id=current_user.id)
     if not note:
         raise HTTPException(status_code=404, detail="Note not found")
     return # Return None/implicitly for 204
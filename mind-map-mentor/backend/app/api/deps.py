@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app import crud, models, schemas # Import necessary modules
 from app.db.session import get_db
 from app.core.security import decode_token
+from app.core.config import settings
 
 # Setup OAuth2 scheme
 # tokenUrl should match the path to your login endpoint
@@ -42,4 +43,15 @@ def get_current_active_user(
     """
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user
+
+def get_current_admin_user(
+    current_user: models.User = Depends(get_current_active_user)
+) -> models.User:
+    """
+    Dependency to get the current user if they are an admin.
+    Admins are configured by email in settings.ADMIN_EMAILS.
+    """
+    if current_user.email not in settings.ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -14,18 +14,100 @@ class Settings(BaseSettings):
     # File Storage Path
     FILE_STORAGE_PATH: str = "./storage"
 
-    # Pinecone Settings
-    PINECONE_API_KEY: str
-    PINECONE_ENVIRONMENT: str
-    PINECONE_INDEX_NAME: str
+    # Vector Store Settings
+    VECTOR_STORE_BACKEND: str = "pinecone" # "pinecone" or "local" (in-process index on disk)
+    LOCAL_VECTOR_INDEX_PATH: str = "./vector_index" # Root directory for per-user local indexes
+    LOCAL_VECTOR_HNSW_THRESHOLD: int = 20000 # Users with at least this many vectors are searched via HNSW
+    LOCAL_VECTOR_HNSW_SAVE_INTERVAL: int = 500 # Persist the HNSW graph after this many incremental upserts
+    LOCAL_VECTOR_DTYPE: str = "float32" # Storage precision: "float32", "float16" (1/2 memory) or "int8" (~1/4 memory)
+    VECTOR_UPSERT_BATCH_SIZE: int = 100 # Max vectors per embedding call / upsert request in bulk upserts
+    VECTOR_STORE_MAX_WORKERS: int = 8 # Threads running blocking vector store calls for async callers
+    REINDEX_CHUNK_SIZE: int = 500 # Notes read from Postgres per keyset page in app.ai.reindex
+    REINDEX_MAX_WORKERS: int = 4 # Concurrent chunk upserts in app.ai.reindex
+    REINDEX_CHECKPOINT_PATH: str = "./reindex_checkpoint.json"
+
+    # Pinecone Settings (only required when VECTOR_STORE_BACKEND is "pinecone")
+    PINECONE_API_KEY: Optional[str] = None
+    PINECONE_ENVIRONMENT: Optional[str] = None
+    PINECONE_INDEX_NAME: Optional[str] = None
+    # "shared": one namespace, tenants isolated by a user_id metadata filter.
+    # "per_user": every user gets namespace user_{id}; run `python -m app.ai.namespaces migrate` when switching.
+    PINECONE_NAMESPACE_MODE: str = "shared"
 
     # OpenAI Settings (Optional, e.g., for embeddings)
     OPENAI_API_KEY: Optional[str] = None
 
+    # Chat model settings (shared client registry, see app.ai.llm)
+    LLM_MODEL: str = "gpt-4o-mini"
+    LLM_MAX_CONCURRENCY: int = 8 # Chat completions in flight at once per process
+    LLM_REQUESTS_PER_MINUTE: float = 0 # Token-bucket rate limit per process (0 = unlimited)
+    LLM_RATE_LIMIT_BURST: int = 10 # Requests allowed back to back before the rate limit applies
+    LLM_HTTP_MAX_CONNECTIONS: int = 20 # Pooled keep-alive connections to the API
+    LLM_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_RETRIES: int = 2
+    TAG_BATCH_TOKEN_BUDGET: int = 6000 # Approximate note tokens per batched tagging prompt
+    TAG_BATCH_MAX_NOTES: int = 25 # Notes per batched tagging prompt
+    TAG_BATCH_MAX_NOTE_TOKENS: int = 1000 # Longer notes are truncated in batched prompts
+    RETAG_CHUNK_SIZE: int = 200 # Notes read from Postgres per page by the retag-all job
+    # "llm", "local" (keyword extraction against the user's notes, no API calls) or
+    # "hybrid" (local first, LLM for notes where the local engine has low confidence)
+    TAG_ENGINE: str = "llm"
+    KEYWORD_MIN_CONFIDENCE: float = 0.5 # Hybrid: local tags below this go to the LLM
+    KEYWORD_MIN_CORPUS_DOCS: int = 20 # Fewer notes than this make document frequencies unreliable
+    KEYWORD_MIN_NOTE_TOKENS: int = 40 # Shorter notes lower the local engine's confidence
+    KEYWORD_MAX_TERMS_PER_NOTE: int = 500 # Distinct terms a note contributes to the document frequencies
+    TAG_CACHE_ENABLED: bool = True # Reuse tag suggestions for identical (normalised) or barely edited content
+    TAG_REUSE_MAX_DISTANCE: float = 0.2 # Keep tags while the shingle Jaccard distance to the tagged version is below this
+
+    # Embedding Provider Settings
+    EMBEDDING_PROVIDER: str = "openai" # "openai" or "local" (sentence-transformers on this machine)
+    LOCAL_EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    LOCAL_EMBEDDING_DEVICE: str = "cpu"
+    # Shorter embeddings (text-embedding-3 models and Matryoshka-trained local models keep most quality).
+    # None = the model's full size (1536 for text-embedding-3-small). Reindex after changing it.
+    EMBEDDING_DIMENSIONS: Optional[int] = None
+
+    # Embedding micro-batching: concurrent embed calls are coalesced into one provider call
+    EMBEDDING_BATCHING_ENABLED: bool = True # Always on for the local provider
+    EMBEDDING_BATCH_MAX_SIZE: int = 64 # Texts per provider call
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0 # How long to wait for more requests before sending a batch
+    EMBEDDING_BATCH_MAX_PENDING: int = 2048 # Queued + in-flight texts before submitters block (backpressure)
+    EMBEDDING_BATCH_CONCURRENCY: int = 4 # Provider calls in flight at once (1 for the local provider)
+    EMBEDDING_BATCH_SUBMIT_TIMEOUT_SECONDS: float = 30.0 # Give up waiting for queue space after this
+
+    # Embedding Cache Settings (keyed by model + sha256 of the text)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10000 # Size of the in-process LRU tier
+    EMBEDDING_CACHE_MAX_ROWS: int = 500000 # Least recently used rows beyond this are evicted from Postgres
+    EMBEDDING_CACHE_MAX_AGE_DAYS: int = 90 # Rows unused for longer than this are evicted
+    EMBEDDING_CACHE_PRUNE_INTERVAL: int = 1000 # Run eviction after this many new cache rows
+    QUERY_EMBEDDING_CACHE_ENABLED: bool = True # In-process cache for search/RAG query embeddings
+    QUERY_EMBEDDING_CACHE_SIZE: int = 2048
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 600
+
+    # Enrichment Job Queue Settings (see app.worker)
+    ENRICHMENT_WORKER_BATCH_SIZE: int = 10 # Jobs claimed per poll
+    ENRICHMENT_WORKER_POLL_INTERVAL: float = 1.0 # Seconds to sleep when the queue is empty
+    ENRICHMENT_JOB_MAX_ATTEMPTS: int = 5
+    ENRICHMENT_JOB_RETRY_BACKOFF_SECONDS: int = 30 # Doubled on every further attempt
+    ENRICHMENT_JOB_LEASE_SECONDS: int = 600 # Running jobs older than this are reclaimed (worker crashed)
+    VECTOR_SYNC_DEBOUNCE_SECONDS: float = 5.0 # Note edits within this window are embedded/upserted once
+    VECTOR_SYNC_MAX_DELAY_SECONDS: float = 60.0 # Upper bound on how long edits can keep postponing a sync
+
     # AI Feature Settings
     SIMILARITY_THRESHOLD: float = 0.5# Default threshold for auto-edges
     SIMILARITY_THRESHOLD_SUMMARY: float = 0.5 # Default threshold for summary-based edges
     SIMILARITY_THRESHOLD_CONTENT: float = 0.5 # Default threshold for content-based edges (if implemented)
+    SIMILARITY_REBUILD_TOP_K: int = 5 # Neighbours per note when rebuilding the whole similarity graph
+    SIMILARITY_REBUILD_BLOCK_SIZE: int = 512 # Rows per matrix block (memory ~ block_size * notes * 4 bytes)
+
+    SEARCH_RRF_K: int = 60 # Reciprocal rank fusion constant for hybrid (full-text + vector) search
+    SEARCH_TAG_FILTER_MAX_IDS: int = 1000 # Tag filters matching more notes are applied after vector retrieval, not as a note_id $in filter
+    SEARCH_TAG_FILTER_OVERFETCH: int = 5 # Vector candidates fetched per result when the tag filter is applied after retrieval
+
+    # Admin Settings
+    ADMIN_EMAILS: List[str] = [] # JSON list in .env, e.g. ADMIN_EMAILS='["admin@example.com"]'
 
     # Add other application settings here as needed
     # e.g., OPENAI_API_KEY: str | None = None
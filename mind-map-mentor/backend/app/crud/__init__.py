@@ -12,6 +12,7 @@ from .crud_file import (
 from .crud_graph import (
     get_graph_node, get_graph_nodes_for_user, create_graph_node, update_graph_node, delete_graph_node,
     get_graph_edge, get_graph_edges_for_user, create_graph_edge, update_graph_edge, delete_graph_edge,
+    upsert_graph_edge, upsert_graph_edges_bulk,
     update_graph_node_tags
 )
 # Add imports for file and graph CRUD later when implemented 
\ No newline at end of file
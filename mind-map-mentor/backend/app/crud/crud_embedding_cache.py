@@ -0,0 +1,68 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import logging
+
+from app.models.embedding_cache import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+def get_cached_embeddings(db: Session, model: str, text_hashes: List[str]) -> Dict[str, Tuple[int, bytes]]:
+    """Looks up packed embeddings for the given hashes in one query and bumps their last_used_at.
+    Returns {text_hash: (dimensions, packed_embedding)} for the hashes that were found.
+    """
+    if not text_hashes:
+        return {}
+    rows = (
+        db.query(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.dimensions, EmbeddingCacheEntry.embedding)
+        .filter(EmbeddingCacheEntry.model == model, EmbeddingCacheEntry.text_hash.in_(text_hashes))
+        .all()
+    )
+    found = {text_hash: (dimensions, bytes(embedding)) for text_hash, dimensions, embedding in rows}
+    if found:
+        db.query(EmbeddingCacheEntry).filter(
+            EmbeddingCacheEntry.model == model, EmbeddingCacheEntry.text_hash.in_(list(found))
+        ).update({EmbeddingCacheEntry.last_used_at: func.now()}, synchronize_session=False)
+        db.commit()
+    return found
+
+def store_embeddings(db: Session, model: str, entries: Dict[str, Tuple[int, bytes]]) -> None:
+    """Inserts packed embeddings with a single multi-row INSERT, ignoring hashes that already exist."""
+    if not entries:
+        return
+    stmt = pg_insert(EmbeddingCacheEntry).values([
+        {"model": model, "text_hash": text_hash, "dimensions": dimensions, "embedding": embedding}
+        for text_hash, (dimensions, embedding) in entries.items()
+    ])
+    db.execute(stmt.on_conflict_do_nothing(index_elements=["model", "text_hash"]))
+    db.commit()
+
+def prune_embedding_cache(db: Session, max_rows: Optional[int] = None, max_age_days: Optional[int] = None) -> int:
+    """Evicts entries unused for more than max_age_days, then the least recently used beyond max_rows.
+    Returns the number of deleted rows.
+    """
+    deleted = 0
+    if max_age_days:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+        deleted += (
+            db.query(EmbeddingCacheEntry)
+            .filter(EmbeddingCacheEntry.last_used_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+    if max_rows:
+        keep = (
+            db.query(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash)
+            .order_by(EmbeddingCacheEntry.last_used_at.desc())
+            .offset(max_rows)
+        )
+        deleted += (
+            db.query(EmbeddingCacheEntry)
+            .filter(tuple_(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash).in_(keep.subquery().select()))
+            .delete(synchronize_session=False)
+        )
+    db.commit()
+    if deleted:
+        logger.info(f"Pruned {deleted} embedding cache entries (max_rows={max_rows}, max_age_days={max_age_days}).")
+    return deleted
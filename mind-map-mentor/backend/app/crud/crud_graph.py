@@ -1,11 +1,14 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified # Import flag_modified
-from typing import List, Optional
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import List, Optional, Dict, Any
 import logging # Add logging
 
 from app.models.graph_node import GraphNode
 from app.models.graph_edge import GraphEdge
 from app.schemas.graph import GraphNodeCreate, GraphNodeUpdate, GraphEdgeCreate, GraphEdgeUpdate
+from app.crud.crud_tag import sync_node_tags, tagged_node_ids
 from app.db.base import Base # Used for potential type hinting if needed
 
 logger = logging.getLogger(__name__) # Add logger
@@ -20,10 +23,17 @@ def get_graph_node(db: Session, node_id: int, user_id: int) -> Optional[GraphNod
     return result
 
 def get_graph_nodes_for_user(
-    db: Session, user_id: int, skip: int = 0, limit: int = 100
+    db: Session, user_id: int, skip: int = 0, limit: int = 100,
+    tags: Optional[List[str]] = None, match_all_tags: bool = False
 ) -> List[GraphNode]:
-    """Get all graph nodes for a specific user."""
-    return db.query(GraphNode).filter(GraphNode.user_id == user_id).offset(skip).limit(limit).all()
+    """Get all graph nodes for a specific user.
+    With tags, only nodes carrying any of them (every one of them with match_all_tags),
+    looked up in the node_tags index.
+    """
+    query = db.query(GraphNode).filter(GraphNode.user_id == user_id)
+    if tags:
+        query = query.filter(GraphNode.id.in_(tagged_node_ids(user_id, tags, match_all=match_all_tags)))
+    return query.offset(skip).limit(limit).all()
 
 def create_graph_node(db: Session, node: GraphNodeCreate, user_id: int, commit: bool = True) -> GraphNode:
     """Create a new graph node.
@@ -63,6 +73,9 @@ def create_graph_node(db: Session, node: GraphNodeCreate, user_id: int, commit:
         position=position_data # Always set position data
     )
     db.add(db_node)
+    if node.data and node.data.get("tags"):
+        db.flush() # node_tags rows need the node ID
+        sync_node_tags(db, node_id=db_node.id, user_id=user_id, tags=node.data["tags"])
     
     if commit:
         db.commit()
@@ -169,6 +182,8 @@ def update_graph_node(
 
     db.add(db_node) # Add to session even if no changes (SQLAlchemy handles it)
     try:
+        if "data" in update_data: # A replaced data payload may add or drop tags
+            sync_node_tags(db, node_id=db_node.id, user_id=user_id, tags=(db_node.data or {}).get("tags"))
         db.commit()
         db.refresh(db_node)
     except Exception as e:
@@ -191,6 +206,7 @@ def update_graph_node_tags(
         current_data['tags'] = tags # Add or overwrite the tags list
         db_node.data = current_data # Assign the modified dictionary back
         flag_modified(db_node, "data") # Mark the JSON field as modified
+        sync_node_tags(db, node_id=db_node.id, user_id=user_id, tags=tags) # Keep the tag index in step
         
         db.add(db_node) # Add to session
         db.commit() # Commit the change
@@ -264,6 +280,89 @@ def create_graph_edge(db: Session, edge: GraphEdgeCreate, user_id: int) -> Optio
     print(f"[create_graph_edge] Edge created successfully: ID={db_edge.id}") # DEBUG LOG
     return db_edge
 
+# Columns of the uq_graph_edges_user_source_target_type index used as the ON CONFLICT target
+EDGE_UNIQUE_COLUMNS = ["user_id", "source_node_id", "target_node_id", "relationship_type"]
+DEFAULT_RELATIONSHIP_TYPE = "related"
+EDGE_UPSERT_CHUNK_SIZE = 1000 # Rows per INSERT statement (6 bind parameters per row)
+
+def _edge_upsert_statement(rows: List[Dict[str, Any]]):
+    """INSERT ... ON CONFLICT DO UPDATE that refreshes label/data of an existing edge.
+    RETURNING reports whether each row was inserted (xmax = 0) or updated.
+    """
+    stmt = pg_insert(GraphEdge).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=EDGE_UNIQUE_COLUMNS,
+        set_={
+            "label": stmt.excluded.label,
+            "data": stmt.excluded.data,
+            "updated_at": func.now(),
+        },
+    ).returning(GraphEdge.id, literal_column("(xmax = 0)").label("inserted"))
+
+def _edge_row(edge: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "source_node_id": edge["source_node_id"],
+        "target_node_id": edge["target_node_id"],
+        "relationship_type": edge.get("relationship_type") or DEFAULT_RELATIONSHIP_TYPE,
+        "label": edge.get("label"),
+        "data": edge.get("data"),
+    }
+
+def upsert_graph_edge(db: Session, edge: GraphEdgeCreate, user_id: int) -> Optional[GraphEdge]:
+    """Create an edge, or refresh label/data (e.g. the similarity score) if the same
+    (source, target, relationship_type) edge already exists for the user.
+    Ensures both nodes exist and belong to the user.
+    """
+    node_ids = {edge.source_node_id, edge.target_node_id}
+    owned = db.query(GraphNode.id).filter(GraphNode.id.in_(node_ids), GraphNode.user_id == user_id).count()
+    if owned != len(node_ids):
+        logger.warning(f"Cannot upsert edge {edge.source_node_id}->{edge.target_node_id}: node missing or not owned by user {user_id}")
+        return None
+
+    edge_id, inserted = db.execute(_edge_upsert_statement([_edge_row(edge.model_dump(), user_id)])).one()
+    db.commit()
+    logger.info(f"{'Created' if inserted else 'Refreshed'} graph edge {edge_id} ({edge.source_node_id}->{edge.target_node_id})")
+    return db.query(GraphEdge).filter(GraphEdge.id == edge_id).first()
+
+def upsert_graph_edges_bulk(
+    db: Session, edges: List[Dict[str, Any]], user_id: int, commit: bool = True
+) -> Dict[str, int]:
+    """Upsert many edges with multi-row INSERT ... ON CONFLICT DO UPDATE and one commit.
+    Callers must pass node IDs already known to belong to the user (no per-edge node lookups).
+    With commit=False the caller commits (e.g. together with a preceding delete).
+    Returns {"created": n, "updated": m}.
+    """
+    counts = {"created": 0, "updated": 0}
+    if not edges:
+        return counts
+    # Postgres rejects a statement that touches the same conflict key twice, so keep the last one
+    rows = {}
+    for edge in edges:
+        row = _edge_row(edge, user_id)
+        rows[tuple(row[column] for column in EDGE_UNIQUE_COLUMNS)] = row
+    rows = list(rows.values())
+    # Chunked to stay well below Postgres' bind parameter limit; still a single transaction
+    for i in range(0, len(rows), EDGE_UPSERT_CHUNK_SIZE):
+        for _, inserted in db.execute(_edge_upsert_statement(rows[i:i + EDGE_UPSERT_CHUNK_SIZE])).all():
+            counts["created" if inserted else "updated"] += 1
+    if commit:
+        db.commit()
+    logger.info(f"Upserted graph edges for user {user_id}: {counts}")
+    return counts
+
+def delete_graph_edges_by_type(db: Session, user_id: int, relationship_type: str, commit: bool = True) -> int:
+    """Deletes all of a user's edges of one relationship type. Returns the number of deleted edges."""
+    deleted = (
+        db.query(GraphEdge)
+        .filter(GraphEdge.user_id == user_id, GraphEdge.relationship_type == relationship_type)
+        .delete(synchronize_session=False)
+    )
+    if commit:
+        db.commit()
+    logger.info(f"Deleted {deleted} '{relationship_type}' edges for user {user_id}")
+    return deleted
+
 def update_graph_edge(
     db: Session, edge_id: int, edge_update: GraphEdgeUpdate, user_id: int
 ) -> Optional[GraphEdge]:
@@ -0,0 +1,205 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_, inspect
+from typing import List, Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+import logging
+
+from app.models.enrichment_job import EnrichmentJob
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUS_PENDING = "pending"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_DONE = "done"
+JOB_STATUS_FAILED = "failed"
+
+# Job types
+JOB_TYPE_ENRICH_NOTE = "enrich_note" # AI tags, vector upsert and auto-linking for one note
+JOB_TYPE_REBUILD_SIMILARITY_GRAPH = "rebuild_similarity_graph" # Recompute all summary edges of a user
+JOB_TYPE_RECONCILE_VECTORS = "reconcile_vectors" # Diff the vector store against Postgres (queued by an admin)
+JOB_TYPE_RETAG_NOTES = "retag_notes" # Re-suggest AI tags for all notes of a user in batched LLM calls
+
+def enqueue_job(
+    db: Session,
+    user_id: int,
+    job_type: str,
+    note_id: Optional[int] = None,
+    payload: Optional[Dict[str, Any]] = None,
+    run_after: Optional[datetime] = None,
+    commit: bool = True,
+) -> EnrichmentJob:
+    """Adds a job to the queue.
+    With commit=False the job is only flushed, so it is committed atomically with the caller's changes.
+    """
+    job = EnrichmentJob(
+        user_id=user_id,
+        note_id=note_id,
+        job_type=job_type,
+        status=JOB_STATUS_PENDING,
+        payload=payload or {},
+        attempts=0,
+        run_after=run_after or datetime.now(timezone.utc),
+    )
+    db.add(job)
+    if commit:
+        db.commit()
+        db.refresh(job)
+    else:
+        db.flush()
+    logger.debug(f"Enqueued {job_type} job {job.id} (note={note_id}, user={user_id}, payload={job.payload})")
+    return job
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+def enqueue_note_enrichment(
+    db: Session,
+    note_id: int,
+    user_id: int,
+    tags: bool = True,
+    vectors: bool = True,
+    links: bool = True,
+    debounce_seconds: float = 0,
+    manual_tags: bool = False,
+    commit: bool = True,
+) -> EnrichmentJob:
+    """Queues an enrich_note job; the flags select which enrichment steps the worker runs.
+
+    Write-behind debounce: if the note already has a pending (not yet running) job, that
+    job is reused - its flags are OR-ed with the new ones and its run_after is pushed to
+    now + debounce_seconds, capped at VECTOR_SYNC_MAX_DELAY_SECONDS after it was first
+    queued. A burst of autosaves therefore costs one embedding of the latest version.
+    """
+    now = datetime.now(timezone.utc)
+    run_after = now + timedelta(seconds=debounce_seconds)
+    pending = (
+        db.query(EnrichmentJob)
+        .filter(
+            EnrichmentJob.note_id == note_id,
+            EnrichmentJob.job_type == JOB_TYPE_ENRICH_NOTE,
+            EnrichmentJob.status == JOB_STATUS_PENDING,
+        )
+        .order_by(EnrichmentJob.id)
+        .with_for_update()
+        .first()
+    )
+    if pending is None:
+        payload = {"tags": tags, "vectors": vectors, "links": links}
+        return enqueue_job(
+            db, user_id=user_id, job_type=JOB_TYPE_ENRICH_NOTE, note_id=note_id,
+            payload=payload, run_after=run_after, commit=commit
+        )
+
+    previous = pending.payload or {}
+    pending.payload = {
+        "tags": (bool(previous.get("tags")) or tags) and not manual_tags,
+        "vectors": bool(previous.get("vectors")) or vectors,
+        "links": bool(previous.get("links")) or links,
+    }
+    # Don't let continuous editing postpone the sync forever
+    latest = _as_utc(pending.created_at or now) + timedelta(seconds=settings.VECTOR_SYNC_MAX_DELAY_SECONDS)
+    if pending.attempts == 0: # Retries keep their backoff
+        pending.run_after = max(now, min(run_after, latest))
+    db.add(pending)
+    if commit:
+        db.commit()
+        db.refresh(pending)
+    else:
+        db.flush()
+    logger.debug(f"Coalesced enrichment of note {note_id} into pending job {pending.id} (payload={pending.payload}, run_after={pending.run_after})")
+    return pending
+
+def claim_jobs(db: Session, limit: int, job_types: Optional[List[str]] = None) -> List[EnrichmentJob]:
+    """Atomically claims up to `limit` due jobs for this worker using SELECT ... FOR UPDATE SKIP LOCKED.
+    Running jobs whose lease expired (worker crashed) are claimed again.
+    """
+    now = datetime.now(timezone.utc)
+    lease_expired_before = now - timedelta(seconds=settings.ENRICHMENT_JOB_LEASE_SECONDS)
+    query = db.query(EnrichmentJob).filter(
+        or_(
+            and_(EnrichmentJob.status == JOB_STATUS_PENDING, EnrichmentJob.run_after <= now),
+            and_(EnrichmentJob.status == JOB_STATUS_RUNNING, EnrichmentJob.locked_at < lease_expired_before),
+        )
+    )
+    if job_types:
+        query = query.filter(EnrichmentJob.job_type.in_(job_types))
+    jobs = (
+        query.order_by(EnrichmentJob.run_after, EnrichmentJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for job in jobs:
+        job.status = JOB_STATUS_RUNNING
+        job.locked_at = now
+        job.attempts = (job.attempts or 0) + 1
+    db.commit()
+    return jobs
+
+def job_identity(job: EnrichmentJob) -> int:
+    """ID of a job instance without loading it, so it also works after the row was deleted
+    (enrich_note jobs are deleted together with their note).
+    """
+    return inspect(job).identity[0]
+
+def _forget_deleted_job(db: Session, job: EnrichmentJob, job_id: int) -> None:
+    logger.info(f"Job {job_id} no longer exists (its note was deleted); nothing to record.")
+    if job in db:
+        db.expunge(job) # Pending changes to the vanished row must not be flushed
+    db.commit()
+
+def complete_job(db: Session, job: EnrichmentJob) -> None:
+    """Marks a claimed job as done. A job deleted meanwhile (with its note) is skipped.
+    Other pending changes to the job (e.g. a report in its payload) are committed with it.
+    """
+    job_id = job_identity(job)
+    updated = (
+        db.query(EnrichmentJob)
+        .filter(EnrichmentJob.id == job_id)
+        .update(
+            {EnrichmentJob.status: JOB_STATUS_DONE, EnrichmentJob.locked_at: None, EnrichmentJob.last_error: None},
+            synchronize_session=False,
+        )
+    )
+    if not updated:
+        _forget_deleted_job(db, job, job_id)
+        return
+    db.commit()
+
+def retry_delay_seconds(attempts: int) -> float:
+    """Exponential backoff before the next attempt, after `attempts` failed attempts."""
+    return settings.ENRICHMENT_JOB_RETRY_BACKOFF_SECONDS * (2 ** (attempts - 1))
+
+def fail_job(db: Session, job: EnrichmentJob, error: str) -> bool:
+    """Records a failed attempt. The job is retried with exponential backoff until
+    ENRICHMENT_JOB_MAX_ATTEMPTS is reached. Returns True if the job is now permanently failed.
+    A job deleted meanwhile (with its note) is skipped and reported as not failed.
+    """
+    job_id = job_identity(job)
+    attempts = db.query(EnrichmentJob.attempts).filter(EnrichmentJob.id == job_id).scalar()
+    if attempts is None:
+        _forget_deleted_job(db, job, job_id)
+        return False
+    values = {EnrichmentJob.last_error: error[:2000], EnrichmentJob.locked_at: None}
+    permanently_failed = attempts >= settings.ENRICHMENT_JOB_MAX_ATTEMPTS
+    if permanently_failed:
+        values[EnrichmentJob.status] = JOB_STATUS_FAILED
+    else:
+        values[EnrichmentJob.status] = JOB_STATUS_PENDING
+        values[EnrichmentJob.run_after] = datetime.now(timezone.utc) + timedelta(seconds=retry_delay_seconds(attempts))
+    updated = db.query(EnrichmentJob).filter(EnrichmentJob.id == job_id).update(values, synchronize_session=False)
+    if not updated:
+        _forget_deleted_job(db, job, job_id)
+        return False
+    db.commit()
+    return permanently_failed
+
+def get_latest_job_for_note(db: Session, note_id: int, user_id: int) -> Optional[EnrichmentJob]:
+    """Gets the most recently created job for a note."""
+    return (
+        db.query(EnrichmentJob)
+        .filter(EnrichmentJob.note_id == note_id, EnrichmentJob.user_id == user_id)
+        .order_by(EnrichmentJob.id.desc())
+        .first()
+    )
@@ -0,0 +1,51 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, List
+import logging
+
+from app.models.keyword_stats import KeywordDocumentFrequency
+from app.models.note import Note
+
+logger = logging.getLogger(__name__)
+
+def get_document_frequencies(db: Session, user_id: int, terms: List[str]) -> Dict[str, int]:
+    """Returns {term: number of the user's notes containing it} for the given terms (missing terms are 0)."""
+    if not terms:
+        return {}
+    rows = (
+        db.query(KeywordDocumentFrequency.term, KeywordDocumentFrequency.doc_count)
+        .filter(KeywordDocumentFrequency.user_id == user_id, KeywordDocumentFrequency.term.in_(set(terms)))
+        .all()
+    )
+    return {term: doc_count for term, doc_count in rows}
+
+def count_counted_notes(db: Session, user_id: int) -> int:
+    """Number of the user's notes whose terms are included in the document frequencies (the corpus size)."""
+    return db.query(Note.id).filter(Note.user_id == user_id, Note.keyword_terms.isnot(None)).count()
+
+def apply_document_frequency_deltas(db: Session, user_id: int, deltas: Dict[str, int]) -> None:
+    """Adds the deltas to the user's document frequencies with one multi-row upsert and
+    drops terms that no note contains any more. Not committed.
+    """
+    deltas = {term: delta for term, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    stmt = pg_insert(KeywordDocumentFrequency).values([
+        {"user_id": user_id, "term": term, "doc_count": delta}
+        for term, delta in deltas.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id", "term"],
+        set_={"doc_count": KeywordDocumentFrequency.doc_count + stmt.excluded.doc_count},
+    ))
+    decremented = [term for term, delta in deltas.items() if delta < 0]
+    if decremented:
+        db.query(KeywordDocumentFrequency).filter(
+            KeywordDocumentFrequency.user_id == user_id,
+            KeywordDocumentFrequency.term.in_(decremented),
+            KeywordDocumentFrequency.doc_count <= 0,
+        ).delete(synchronize_session=False)
+
+def clear_document_frequencies(db: Session, user_id: int) -> None:
+    """Deletes all of the user's document frequencies. Not committed."""
+    db.query(KeywordDocumentFrequency).filter(KeywordDocumentFrequency.user_id == user_id).delete(synchronize_session=False)
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified # Import flag_modified
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Dict
 import logging # Add logging
 import math
 from datetime import datetime, timedelta
@@ -12,24 +12,32 @@ from app.models.graph_node import GraphNode
 from app.models.user import User
 from app.schemas.note import NoteCreate, NoteUpdate
 # Import graph CRUD and schema
-from app.crud import crud_graph
+from app.crud import crud_graph, crud_job, crud_keyword_stats, crud_tag
 from app.schemas.graph import GraphNodeCreate, GraphEdgeCreate
 
 # Import AI modules
 from app.ai.embeddings import generate_embedding
-from app.ai.vectorstore import upsert_document, delete_document
+from app.ai.vectorstore import adelete_document
+from app.ai.tag_cache import content_fingerprint
 from app.core.config import settings # Import settings for threshold
-from app.ai.vectorstore import query_similar_notes # Need this for similarity search
-from app.ai.agents.organizer import suggest_tags_for_content # Task 3.1 Import
+from app.ai.vectorstore import aquery_similar_notes, aquery_similar_notes_by_vector # Need this for similarity search
 
 # Define constants for relationship types
 RELATED_SUMMARY_EDGE_TYPE = "related_summary"
 RELATED_CONTENT_EDGE_TYPE = "related_content"
 
+# Note.enrichment_status values (see app.ai.enrichment)
+ENRICHMENT_PENDING = "pending"
+ENRICHMENT_PROCESSING = "processing"
+ENRICHMENT_DONE = "done"
+ENRICHMENT_FAILED = "failed"
+
 # Fetch thresholds from settings
 SIMILARITY_THRESHOLD_SUMMARY = settings.SIMILARITY_THRESHOLD_SUMMARY
 SIMILARITY_THRESHOLD_CONTENT = settings.SIMILARITY_THRESHOLD_CONTENT
 
+AUTO_LINK_TOP_K = 5 # Candidate matches per auto-linking query
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG) # Explicitly set level for this logger
 
@@ -52,110 +60,135 @@ def get_relationship_label_from_score(score: float) -> str:
         return "Related" # Or perhaps None or an empty string?
 
 # Add async here
-async def _find_and_create_similar_note_edges(db: Session, new_note: Note, user_id: int, threshold: float):
-    """Finds notes with similar summaries and creates edges if they meet the threshold."""
-    logger.info(f"--- Entering _find_and_create_similar_note_edges for Note ID: {new_note.id} ---") # INFO level entry log
-    
-    # 1. Check if the new note has a summary
-    logger.info(f"Checking summary for Note {new_note.id}: '{new_note.user_summary}'") # INFO level log for summary value
-    if not new_note.user_summary or not new_note.user_summary.strip():
-        logger.info(f"Exiting: No user_summary provided for Note {new_note.id}.") # INFO level log for exit
-        return
+async def _find_and_create_similar_note_edges(
+    db: Session,
+    new_note: Note,
+    user_id: int,
+    threshold: float,
+    embedding_type: str = "summary",
+    query_vector: Optional[List[float]] = None,
+) -> Dict[str, int]:
+    """Finds notes with similar summaries (or content, with embedding_type="content") and creates
+       edges if they meet the threshold.
+       If query_vector (the note's stored vector) is given it is searched directly, otherwise the
+       note text is embedded. The note itself is excluded inside the vector query.
+       Matched notes are resolved to graph nodes with one IN query and all edges are
+       upserted with one multi-row INSERT ... ON CONFLICT and a single commit, so
+       re-running it after an edit refreshes scores instead of duplicating edges.
+       Returns {"created": n, "updated": m, "skipped": k}.
+    """
+    logger.info(f"--- Entering _find_and_create_similar_note_edges for Note ID: {new_note.id} ({embedding_type}) ---") # INFO level entry log
+    counts = {"created": 0, "updated": 0, "skipped": 0}
+    edge_type = RELATED_CONTENT_EDGE_TYPE if embedding_type == "content" else RELATED_SUMMARY_EDGE_TYPE
+    query_text = new_note.content if embedding_type == "content" else new_note.user_summary
+
+    # 1. Check if the new note has text of this type
+    logger.info(f"Checking {embedding_type} for Note {new_note.id}: '{(query_text or '')[:100]}'") # INFO level log for the text
+    if not query_text or not query_text.strip():
+        logger.info(f"Exiting: No {embedding_type} provided for Note {new_note.id}.") # INFO level log for exit
+        return counts
         
     # Ensure graph_node_id exists (should always be true if called after create_note commit)
     if new_note.graph_node_id is None:
         logger.error(f"Critical: Cannot perform edge creation for Note {new_note.id} because graph_node_id is missing.")
-        return
+        return counts
 
-    logger.info(f"Proceeding with summary similarity search for Note {new_note.id}...") # INFO level log for proceeding
+    logger.info(f"Proceeding with {embedding_type} similarity search for Note {new_note.id}...") # INFO level log for proceeding
     try:
-        # 2. Query for similar summaries
-        similar_results = query_similar_notes(
-            query_text=new_note.user_summary, # Use the summary for the query
-            user_id=user_id, 
-            embedding_type_filter="summary", # Filter for summary embeddings
-            top_k=6 # Fetch a few potential matches
-        )
-        logger.info(f"Summary similarity query returned {len(similar_results)} results for Note {new_note.id}.") # INFO level log for result count
-        logger.debug(f"Raw similar summary results: {similar_results}") # Keep DEBUG for full results
-        
-        created_edge_count = 0
-        if not similar_results:
-             logger.debug("No similar summaries found.")
-             
-        # 3. Process results (largely the same as before, but based on summary scores)
-        for i, result in enumerate(similar_results):
-            logger.debug(f"--- Processing similarity result {i+1}/{len(similar_results)} ---: {result}")
-            score = result.get('score')
-            metadata = result.get('metadata', {})
-            similar_note_id = metadata.get('note_id')
+        # 2. Query for similar notes of the same embedding type (self excluded by the filter)
+        exclude_self = {"note_id": {"$ne": new_note.id}}
+        if query_vector is not None:
+            similar_results = await aquery_similar_notes_by_vector(
+                query_vector=query_vector, # Stored vector, no embedding call
+                user_id=user_id,
+                embedding_type_filter=embedding_type,
+                top_k=AUTO_LINK_TOP_K,
+                filter=exclude_self
+            )
+        else:
+            similar_results = await aquery_similar_notes(
+                query_text=query_text,
+                user_id=user_id,
+                embedding_type_filter=embedding_type,
+                top_k=AUTO_LINK_TOP_K,
+                filter=exclude_self
+            )
+        logger.info(f"{embedding_type.capitalize()} similarity query returned {len(similar_results)} results for Note {new_note.id}.") # INFO level log for result count
+        logger.debug(f"Raw similar {embedding_type} results: {similar_results}") # Keep DEBUG for full results
 
-            # Validate result
+        # 3. Keep valid, above-threshold matches (best score per note)
+        scores_by_note_id: Dict[int, float] = {}
+        for result in similar_results:
+            score = result.get('score')
+            similar_note_id = result.get('metadata', {}).get('note_id')
             if score is None or similar_note_id is None:
                 logger.warning(f"Skipping invalid search result (missing score or note_id): {result}")
+                counts["skipped"] += 1
                 continue
-            
-            # Don't link to self
-            if similar_note_id == new_note.id:
-                logger.debug(f"Skipping result {i+1}: Same note ID ({similar_note_id}).")
+            if similar_note_id == new_note.id: # Don't link to self
                 continue
-                
-            # Log the score for every potential match before threshold check
-            logger.debug(f"Summary Similarity Check: Note {new_note.id} -> Note {similar_note_id} | Score: {score:.4f}")
-
-            # Check threshold
-            if score < threshold: # Use the passed threshold
-                logger.debug(f"Skipping result {i+1}: Summary score {score:.4f} is below threshold {threshold} for Note {similar_note_id}.")
+            logger.debug(f"{embedding_type.capitalize()} Similarity Check: Note {new_note.id} -> Note {similar_note_id} | Score: {score:.4f}")
+            if score < threshold:
+                logger.debug(f"Skipping Note {similar_note_id}: {embedding_type} score {score:.4f} is below threshold {threshold}.")
+                counts["skipped"] += 1
                 continue
-
-            # Get the graph_node_id for the similar note (needed to create the edge)
-            logger.debug(f"Attempting to fetch details for similar Note ID: {similar_note_id} (found via summary)...")
-            similar_note = get_note(db, note_id=similar_note_id, user_id=user_id)
-            if not similar_note or similar_note.graph_node_id is None:
-                logger.warning(f"Skipping result {i+1}: Could not find valid similar note or its graph node in DB (Note ID: {similar_note_id})")
-                continue
-            logger.debug(f"Found similar Note {similar_note_id} with GraphNode ID: {similar_note.graph_node_id}")
-            
-            target_graph_node_id = similar_note.graph_node_id
-            source_graph_node_id = new_note.graph_node_id # From the new note
-
-            # TODO: Optional - Check if edge already exists between source_graph_node_id and target_graph_node_id
-
-            # Create the edge (using the label derived from the summary score)
-            try:
-                relationship_label = get_relationship_label_from_score(score)
-                edge_data = {'similarity_score': score, 'based_on': 'summary'} # Add context
-                logger.debug(f"Preparing to create edge based on summary: Source={source_graph_node_id}, Target={target_graph_node_id}, Label='{relationship_label}', Data={edge_data}")
-                edge_schema = GraphEdgeCreate(
-                    source_node_id=source_graph_node_id,
-                    target_node_id=target_graph_node_id,
-                    label=relationship_label, 
-                    data=edge_data 
-                )
-                try:
-                    # Use the correct argument name 'edge' as defined in crud_graph.py
-                    created_edge = crud_graph.create_graph_edge(db=db, edge=edge_schema, user_id=user_id)
-                    if created_edge:
-                        # INFO level log for successful creation remains
-                        logger.info(f"Created edge between graph nodes {source_graph_node_id} and {target_graph_node_id} with label \"{relationship_label}\" (Similarity: {score:.2f})")
-                        created_edge_count += 1
-                    else:
-                        # This case might indicate an edge already exists or other silent failure in create_graph_edge
-                        logger.warning(f"crud_graph.create_graph_edge returned None for Source={source_graph_node_id}, Target={target_graph_node_id}. Edge might already exist or creation failed.")
-                except Exception as create_exc:
-                    logger.error(f"Exception during crud_graph.create_graph_edge call for Source={source_graph_node_id}, Target={target_graph_node_id}: {create_exc}", exc_info=True)
-            except Exception as prepare_exc:
-                logger.error(f"Exception preparing edge data for Source={source_graph_node_id}, Target={target_graph_node_id}: {prepare_exc}", exc_info=True)
+            scores_by_note_id[similar_note_id] = max(score, scores_by_note_id.get(similar_note_id, score))
+
+        if not scores_by_note_id:
+            logger.info(f"No {embedding_type} matches above threshold for note {new_note.id}.")
+            return counts
+
+        # 4. Resolve all matched notes to graph nodes in one query (ownership enforced by user_id)
+        graph_node_ids = dict(
+            db.query(Note.id, Note.graph_node_id)
+            .filter(
+                Note.id.in_(list(scores_by_note_id)),
+                Note.user_id == user_id,
+                Note.graph_node_id.isnot(None)
+            )
+            .all()
+        )
+        missing = set(scores_by_note_id) - set(graph_node_ids)
+        if missing:
+            # Typically orphaned vectors of deleted notes
+            logger.warning(f"Skipping {len(missing)} matches without a note/graph node in DB: {sorted(missing)}")
+            counts["skipped"] += len(missing)
+
+        # 5. Upsert all edges at once (label derived from the similarity score)
+        edges = []
+        for similar_note_id, similar_graph_node_id in graph_node_ids.items():
+            score = scores_by_note_id[similar_note_id]
+            # Fixed direction per pair (newer note is the source, as in similarity_graph.rebuild_summary_edges),
+            # so editing the older note refreshes the existing edge instead of adding a reverse one
+            if new_note.id > similar_note_id:
+                source_node_id, target_node_id = new_note.graph_node_id, similar_graph_node_id
+            else:
+                source_node_id, target_node_id = similar_graph_node_id, new_note.graph_node_id
+            edges.append({
+                "source_node_id": source_node_id,
+                "target_node_id": target_node_id,
+                "relationship_type": edge_type,
+                "label": get_relationship_label_from_score(score),
+                "data": {'similarity_score': score, 'based_on': embedding_type},
+            })
+        # Existing edges (same source, target and type) only get their label/score refreshed
+        counts.update(crud_graph.upsert_graph_edges_bulk(db, edges=edges, user_id=user_id))
 
         # INFO level log for summary remains
-        logger.info(f"Finished automatic edge creation process for note {new_note.id}. Created {created_edge_count} new edge(s).")
+        logger.info(f"Finished automatic {embedding_type} edge creation process for note {new_note.id}. Created {counts['created']} new edge(s), refreshed {counts['updated']}, skipped {counts['skipped']}.")
 
     except Exception as e:
+        db.rollback()
         logger.error(f"Error during overall automatic edge creation process for note {new_note.id}: {e}", exc_info=True)
 
+    return counts
+
 # Change function signature to async
 async def create_note(db: Session, note_in: NoteCreate, user_id: int) -> Note:
-    """Creates a new note and its corresponding graph node within a single transaction, including tag generation and vector upserts."""
+    """Creates a new note and its corresponding graph node within a single transaction.
+       Tag generation, vector upserts and auto-linking are queued as an enrich_note job
+       in the same transaction and run by the worker (app.worker), off the request path.
+    """
     logger.debug(f"create_note received data: {note_in.model_dump()}") # Log received data
 
     note_data = note_in.model_dump(exclude_unset=True)
@@ -166,7 +199,6 @@ async def create_note(db: Session, note_in: NoteCreate, user_id: int) -> Note:
 
     db_note = None
     graph_node = None
-    tags = [] # Initialize tags list
 
     try:
         # 1. Prepare Note and GraphNode objects
@@ -177,6 +209,7 @@ async def create_note(db: Session, note_in: NoteCreate, user_id: int) -> Note:
             position_x=position_x,
             position_y=position_y,
             user_id=user_id,
+            enrichment_status=ENRICHMENT_PENDING,
         )
         graph_node = GraphNode(
              user_id=user_id,
@@ -202,100 +235,19 @@ async def create_note(db: Session, note_in: NoteCreate, user_id: int) -> Note:
         db.add(db_note) # Already added, but ensures it's in the session state
         db.add(graph_node) # Already added, but ensures it's in the session state
 
-        # Log before commit
-        logger.info(f"BEFORE COMMIT - db_note.user_summary: '{db_note.user_summary}' for potential note {db_note.title}")
+        # 5. Queue AI enrichment (tags, vectors, auto-links) in the same transaction
+        crud_job.enqueue_note_enrichment(db, note_id=db_note.id, user_id=user_id, commit=False)
 
-        # Commit the note first to get an ID
+        # Commit note, graph node and job together
         db.commit()
-        
-        # Log after commit, before refresh
-        logger.info(f"AFTER COMMIT / BEFORE REFRESH - db_note.id: {db_note.id}, db_note.user_summary: '{db_note.user_summary}'")
-
-        # Refresh to get the full state including defaults and generated values
         db.refresh(db_note)
-        # Assuming graph_node was also added and potentially needs refreshing if linked
-        if graph_node:
-            db.refresh(graph_node)
-
-        # Log after refresh
-        logger.info(f"AFTER REFRESH - db_note.id: {db_note.id}, db_note.user_summary: '{db_note.user_summary}'")
-
-        # --- Run Edge Linking *within* the main transaction block --- 
-        if db_note.user_summary: # Check the refreshed db_note object
-            try:
-                logger.info(f"Attempting to find similar note edges for Note ID: {db_note.id} based on summary: '{db_note.user_summary}'")
-                # Ensure this call has await
-                await _find_and_create_similar_note_edges(
-                    db=db, 
-                    new_note=db_note, 
-                    user_id=user_id, 
-                    threshold=SIMILARITY_THRESHOLD_SUMMARY
-                )
-            except Exception as e:
-                 logger.error(f"Error during automatic edge creation process for note {db_note.id}: {e}", exc_info=True)
-                 # Decide if this error should rollback the main transaction or just be logged
-                 # Currently, it's just logged.
-        else:
-             logger.info(f"Skipping similarity check for note {db_note.id} as db_note.user_summary is: '{db_note.user_summary}'")
+        logger.info(f"Successfully created Note {db_note.id} and linked GraphNode {graph_node.id}; enrichment queued.")
 
-        logger.info(f"Successfully created Note {db_note.id} and linked GraphNode {graph_node.id}")
-        
-        # --- Task 3.2: Auto-generate tags (AFTER successful note creation) ---
-        if db_note.content: # Only generate if there is content
-            try:
-                logger.info(f"Attempting to generate tags for note {db_note.id}...")
-                tags = await suggest_tags_for_content(db_note.content)
-                logger.info(f"Suggested tags for note {db_note.id}: {tags}")
-            except Exception as tag_error:
-                logger.error(f"Failed to generate tags for note {db_note.id}: {tag_error}", exc_info=True)
-                # Continue without tags if generation fails
-        
     except Exception as e:
         logger.error(f"Error during note/graph node creation or linking: {e}", exc_info=True)
         db.rollback() # Rollback the entire transaction
         raise e # Re-raise the exception
 
-    # --- Post-Commit Background Tasks --- 
-    if db_note and graph_node:
-        # AI Tag Generation
-        tags = [] # Ensure tags is initialized
-        try:
-            logger.info(f"Attempting to generate tags for note {db_note.id}...")
-            tags = await suggest_tags_for_content(db_note.content)
-            logger.info(f"Suggested tags for note {db_note.id}: {tags}")
-            try:
-                # Update tags (uses its own commit/rollback) 
-                crud_graph.update_graph_node_tags(db=db, graph_node_id=graph_node.id, tags=tags, user_id=user_id)
-                logger.info(f"Stored tags {tags} in data field for GraphNode {graph_node.id}")
-            except Exception as tag_store_e:
-                logger.error(f"Failed to store tags for GraphNode {graph_node.id}: {tag_store_e}", exc_info=True)
-                # db.rollback() # Handled within update_graph_node_tags
-        except Exception as e:
-            logger.error(f"Failed to generate AI tags for note {db_note.id}: {e}", exc_info=True)
-
-        # Vector Upsert
-        try:
-            logger.info(f"Attempting to upsert vectors for Note ID: {db_note.id}")
-            metadata = {
-                "note_id": db_note.id,
-                "user_id": user_id,
-                "title": db_note.title,
-                "type": "note",
-                "tags": tags # Use tags generated above (or empty list if failed)
-            }
-            upsert_document(
-                note_id=db_note.id,
-                text_content=db_note.content or "",
-                metadata=metadata,
-                summary_text=db_note.user_summary
-            )
-            logger.info(f"Successfully submitted note {db_note.id} content/summary for embedding and upsert.")
-        except Exception as e:
-            logger.error(f"Failed to submit note {db_note.id} for embedding/upsert: {e}", exc_info=True)
-
-    # Return the created note object
-    if db_note:
-        db.refresh(db_note) # Refresh note one last time before returning
     return db_note
 
 def get_notes_for_user(
@@ -311,11 +263,42 @@ def get_note(db: Session, note_id: int, user_id: int) -> Optional[Note]:
     """Gets a specific note by ID, ensuring it belongs to the user."""
     return db.query(Note).filter(Note.id == note_id, Note.user_id == user_id).first()
 
+def get_note_titles(db: Session, note_ids: List[int], user_id: int) -> Dict[int, Tuple[str, Optional[int]]]:
+    """Gets {note_id: (title, graph_node_id)} for the user's notes among note_ids in one query."""
+    if not note_ids:
+        return {}
+    rows = (
+        db.query(Note.id, Note.title, Note.graph_node_id)
+        .filter(Note.id.in_(note_ids), Note.user_id == user_id)
+        .all()
+    )
+    return {note_id: (title, graph_node_id) for note_id, title, graph_node_id in rows}
+
+def search_notes_fulltext(
+    db: Session, user_id: int, query: str, limit: int = 10, note_ids=None
+) -> List[Tuple[int, str, float]]:
+    """Full-text search over title/summary/content using the generated search_vector column (GIN index).
+       The query uses web search syntax ("exact phrase", OR, -exclude).
+       note_ids, if given, restricts the search to those notes: a list, or a SELECT of note IDs
+       (e.g. crud_tag.tagged_note_ids) evaluated inside the query.
+       Returns (note_id, title, rank) tuples, best match first.
+    """
+    ts_query = func.websearch_to_tsquery('english', query)
+    rank = func.ts_rank_cd(Note.search_vector, ts_query)
+    query = db.query(Note.id, Note.title, rank.label("rank")).filter(
+        Note.user_id == user_id, Note.search_vector.op('@@')(ts_query)
+    )
+    if note_ids is not None:
+        query = query.filter(Note.id.in_(note_ids))
+    return query.order_by(rank.desc(), Note.id.desc()).limit(limit).all()
+
 # Make function async
 async def update_note(
     db: Session, note_id: int, note_in: NoteUpdate, user_id: int
 ) -> Optional[Note]:
-    """Updates a specific note, handling manual tag updates, conditional AI regeneration, and dual vector upserts."""
+    """Updates a specific note and its graph node, handling manual tag updates.
+       AI tag regeneration, vector upserts and auto-linking are queued for the worker.
+    """
     db_note = get_note(db, note_id=note_id, user_id=user_id)
     if not db_note:
         logger.warning(f"Update failed: Note {note_id} not found for user {user_id}.")
@@ -339,6 +322,11 @@ async def update_note(
         'user_summary' in update_data and 
         update_data['user_summary'] != db_note.user_summary
     )
+    # Whitespace, punctuation or case edits keep the AI tags (see app.ai.tag_cache)
+    tag_relevant_content_change = (
+        content_updated and
+        content_fingerprint(update_data['content']) != content_fingerprint(db_note.content)
+    )
     # Check if manual tags were provided in the input
     manual_tags_provided = 'tags' in update_data
     manual_tags = update_data.get('tags') if manual_tags_provided else None
@@ -393,14 +381,36 @@ async def update_note(
                 current_data['tags'] = manual_tags # Overwrite existing tags
                 graph_node.data = current_data
                 flag_modified(graph_node, "data")
+                crud_tag.sync_node_tags(db, node_id=graph_node.id, user_id=user_id, tags=manual_tags)
                 # No need to store in `new_tags` variable, applied directly
         
+        # --- Queue AI work (runs in the worker, after this commit) ---
+        # AI tags only when content changed beyond formatting and no manual tags were given; vectors when content
+        # or summary changed (or manual tags, which live in the vector metadata - the embedding
+        # cache makes that re-upsert free); auto-linking whenever content or summary changed.
+        regenerate_tags = tag_relevant_content_change and not manual_tags_provided
+        refresh_vectors = content_updated or summary_updated or manual_tags_provided
+        if regenerate_tags or refresh_vectors:
+            db_note.enrichment_status = ENRICHMENT_PENDING
+            crud_job.enqueue_note_enrichment(
+                db,
+                note_id=db_note.id,
+                user_id=user_id,
+                tags=regenerate_tags,
+                vectors=refresh_vectors,
+                links=content_updated or summary_updated,
+                debounce_seconds=settings.VECTOR_SYNC_DEBOUNCE_SECONDS, # Autosave bursts are coalesced
+                manual_tags=manual_tags_provided,
+                commit=False,
+            )
+            logger.info(f"Queued enrichment for note {note_id} (tags={regenerate_tags}, vectors={refresh_vectors}, links={content_updated or summary_updated}).")
+
         # Add potentially modified note and graph_node to session
         db.add(db_note)
         if graph_node:
             db.add(graph_node)
 
-        # Commit the primary updates (content, title, position, manual tags etc.)
+        # Commit the primary updates (content, title, position, manual tags etc.) together with the job
         db.commit()
         
         # Refresh instances
@@ -414,77 +424,9 @@ async def update_note(
         db.rollback()
         return None # Return None if the main update fails
 
-    # --- Conditional AI Tag Generation (Post-Commit) ---
-    # Only run if content changed AND manual tags were NOT provided in this request
-    ai_generated_tags = [] # Initialize for vector metadata
-    if content_updated and not manual_tags_provided:
-        logger.info(f"Content updated for note {note_id} and no manual tags provided. Attempting AI tag regeneration...")
-        try:
-            ai_generated_tags = await suggest_tags_for_content(db_note.content)
-            logger.info(f"AI suggested tags for note {note_id}: {ai_generated_tags}")
-            
-            # Store AI Tags (Separate transaction)
-            if graph_node: # Ensure we have a graph node to update
-                try:
-                    current_data = graph_node.data if graph_node.data else {}
-                    current_data['tags'] = ai_generated_tags
-                    graph_node.data = current_data
-                    flag_modified(graph_node, "data")
-                    
-                    db.add(graph_node)
-                    db.commit()
-                    db.refresh(graph_node)
-                    logger.info(f"Successfully stored AI generated tags {ai_generated_tags} for GraphNode {graph_node.id}")
-                except Exception as store_tag_error:
-                    logger.error(f"Failed to store AI generated tags for GraphNode {graph_node.id}: {store_tag_error}", exc_info=True)
-                    db.rollback() # Rollback only tag storage failure
-            else:
-                logger.warning(f"AI tags generated for note {note_id}, but no linked graph node found to store them.")
-
-        except Exception as tag_error:
-            logger.error(f"Failed to generate AI tags for updated note {note_id}: {tag_error}", exc_info=True)
-            # Continue without updating tags if AI generation fails
-
-    # --- Post-Update Vector Store Update (if content or summary changed) ---
-    if (content_updated or summary_updated) and db_note:
-        logger.info(f"Content or Summary updated for note {db_note.id}. Submitting for vector update.")
-        try:
-            metadata = {
-                "note_id": db_note.id,
-                "user_id": user_id,
-                "title": db_note.title,
-                "type": "note",
-                "tags": manual_tags if manual_tags_provided else ai_generated_tags # Include tags if available
-            }
-            upsert_document(
-                note_id=db_note.id,
-                text_content=db_note.content or "", # Ensure content is not None
-                metadata=metadata,
-                summary_text=db_note.user_summary # Pass current summary
-            )
-            logger.info(f"Successfully submitted updated note {db_note.id} content/summary for embedding and upsert.")
-        except Exception as e:
-            logger.error(f"Failed to submit updated note {db_note.id} for embedding/upsert: {e}", exc_info=True)
-
-    # 8. Find similar notes and create edges (Best Effort)
-    logger.info(f"Checking for post-update edge linking for Note ID: {db_note.id}")
-    # Only run if summary was part of the update?
-    if summary_updated:
-        try:
-            logger.info(f"Summary updated, attempting post-update edge check for Note ID: {db_note.id}")
-            # ADD await here
-            await _find_and_create_similar_note_edges(db=db, new_note=db_note, user_id=user_id, threshold=SIMILARITY_THRESHOLD_SUMMARY)
-        except Exception as auto_edge_e:
-            logger.error(f"Failed during post-update edge linking for note {db_note.id}: {auto_edge_e}", exc_info=True)
-    else:
-         logger.info(f"Summary not updated, skipping post-update edge check for Note ID: {db_note.id}")
-
-    # Refresh the note one last time before returning
-    if db_note:
-        db.refresh(db_note)
     return db_note
 
-def delete_note(db: Session, note_id: int, user_id: int) -> Optional[Note]:
+async def delete_note(db: Session, note_id: int, user_id: int) -> Optional[Note]:
     """Deletes a note and its associated graph node and vector embedding."""
     db_note = get_note(db, note_id=note_id, user_id=user_id)
     if not db_note:
@@ -508,6 +450,12 @@ def delete_note(db: Session, note_id: int, user_id: int) -> Optional[Note]:
                  logger.warning(f"GraphNode {graph_node_id_to_delete} associated with note {note_id_to_delete} not found or delete failed.")
                  # Continue to delete the note itself
         
+        # Take the note's terms out of the local tag engine's document frequencies
+        if db_note.keyword_terms:
+            crud_keyword_stats.apply_document_frequency_deltas(
+                db, user_id=user_id, deltas={term: -1 for term in db_note.keyword_terms}
+            )
+
         # Now delete the note
         logger.info(f"Deleting Note {note_id_to_delete}")
         db.delete(db_note)
@@ -516,8 +464,8 @@ def delete_note(db: Session, note_id: int, user_id: int) -> Optional[Note]:
 
         # Delete from vector store (Best Effort)
         try:
-            # Call the modified delete_document with the note_id
-            delete_document(note_id=note_id_to_delete)
+            # Delete vectors off the event loop with the note_id (user_id scopes the local index)
+            await adelete_document(note_id=note_id_to_delete, user_id=user_id)
             logger.info(f"Successfully submitted deletion request for vectors associated with Note ID {note_id_to_delete}.")
         except Exception as e:
             logger.error(f"Failed during vector deletion process for Note ID {note_id_to_delete}: {e}", exc_info=True)
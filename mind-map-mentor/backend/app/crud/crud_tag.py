@@ -0,0 +1,114 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import func, select
+from typing import List, Optional, Tuple
+import logging
+
+from app.models.tag import Tag, NodeTag
+from app.models.note import Note
+
+logger = logging.getLogger(__name__)
+
+MAX_TAG_LENGTH = 100 # tags.name
+
+def normalize_tag(tag: str) -> str:
+    """Lowercases and collapses whitespace, so "Machine  Learning" and "machine learning" are one tag.
+       The migration backfill applies the same rule in SQL.
+    """
+    return " ".join(str(tag).split()).lower()[:MAX_TAG_LENGTH]
+
+def normalize_tags(tags: Optional[List[str]]) -> List[str]:
+    """Normalised, non-empty, distinct tag names in their original order."""
+    names: List[str] = []
+    for tag in tags or []:
+        name = normalize_tag(tag) if tag is not None else ""
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def sync_node_tags(db: Session, node_id: int, user_id: int, tags: Optional[List[str]]) -> None:
+    """Makes the node's node_tags rows match its tag list (GraphNode.data['tags']).
+       Only added and removed tags are written. Not committed.
+       Tags no node uses any more are left in place; get_tag_counts skips them.
+    """
+    names = normalize_tags(tags)
+    current = dict(
+        db.query(Tag.name, Tag.id)
+        .join(NodeTag, NodeTag.tag_id == Tag.id)
+        .filter(NodeTag.node_id == node_id)
+        .all()
+    )
+    removed = [tag_id for name, tag_id in current.items() if name not in names]
+    added = [name for name in names if name not in current]
+    if removed:
+        db.query(NodeTag).filter(NodeTag.node_id == node_id, NodeTag.tag_id.in_(removed)).delete(synchronize_session=False)
+    if added:
+        db.execute(
+            pg_insert(Tag)
+            .values([{"user_id": user_id, "name": name} for name in added])
+            .on_conflict_do_nothing(index_elements=["user_id", "name"])
+        )
+        tag_ids = [
+            tag_id for (tag_id,) in
+            db.query(Tag.id).filter(Tag.user_id == user_id, Tag.name.in_(added)).all()
+        ]
+        db.execute(
+            pg_insert(NodeTag)
+            .values([{"node_id": node_id, "tag_id": tag_id} for tag_id in tag_ids])
+            .on_conflict_do_nothing(index_elements=["node_id", "tag_id"])
+        )
+    if removed or added:
+        logger.debug(f"Synced node_tags of GraphNode {node_id}: +{added} -{len(removed)} tags")
+
+def tagged_node_ids(user_id: int, tags: List[str], match_all: bool = False):
+    """SELECT of the user's graph node IDs carrying any (or, with match_all, every) of the tags.
+       Answered from the (user_id, name) unique index and node_tags, without reading GraphNode.data.
+    """
+    names = normalize_tags(tags)
+    stmt = (
+        select(NodeTag.node_id)
+        .join(Tag, Tag.id == NodeTag.tag_id)
+        .where(Tag.user_id == user_id, Tag.name.in_(names))
+    )
+    if match_all and len(names) > 1:
+        # (node_id, tag_id) is the primary key, so each matching tag counts once per node
+        return stmt.group_by(NodeTag.node_id).having(func.count() == len(names))
+    return stmt.distinct()
+
+def tagged_note_ids(user_id: int, tags: List[str], match_all: bool = False):
+    """SELECT of the IDs of the user's notes whose graph node carries any (or every) of the tags."""
+    return select(Note.id).where(
+        Note.user_id == user_id, Note.graph_node_id.in_(tagged_node_ids(user_id, tags, match_all))
+    )
+
+def get_tagged_note_ids(
+    db: Session,
+    user_id: int,
+    tags: List[str],
+    match_all: bool = False,
+    among: Optional[List[int]] = None,
+    limit: Optional[int] = None,
+) -> List[int]:
+    """IDs of the user's notes whose graph node carries any (or every) of the tags,
+       optionally only among the given note IDs and at most limit of them.
+    """
+    stmt = tagged_note_ids(user_id, tags, match_all)
+    if among is not None:
+        stmt = stmt.where(Note.id.in_(among))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return list(db.scalars(stmt))
+
+def get_tag_counts(
+    db: Session, user_id: int, prefix: Optional[str] = None, limit: int = 100
+) -> List[Tuple[str, int]]:
+    """The user's tags with the number of graph nodes carrying each, most used first."""
+    count = func.count(NodeTag.node_id)
+    query = (
+        db.query(Tag.name, count.label("count"))
+        .join(NodeTag, NodeTag.tag_id == Tag.id)
+        .filter(Tag.user_id == user_id)
+    )
+    if prefix and normalize_tag(prefix):
+        query = query.filter(Tag.name.startswith(normalize_tag(prefix), autoescape=True))
+    return query.group_by(Tag.id, Tag.name).order_by(count.desc(), Tag.name).limit(limit).all()
@@ -0,0 +1,36 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, List, Tuple
+import logging
+
+from app.models.tag_suggestion_cache import TagSuggestionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+def get_cached_tags(db: Session, model: str, fingerprints: List[str]) -> Dict[str, Tuple[List[str], bytes]]:
+    """Looks up cached tag suggestions in one query.
+    Returns {fingerprint: (tags, packed_minhash)} for the fingerprints that were found.
+    """
+    if not fingerprints:
+        return {}
+    rows = (
+        db.query(TagSuggestionCacheEntry.fingerprint, TagSuggestionCacheEntry.tags, TagSuggestionCacheEntry.minhash)
+        .filter(TagSuggestionCacheEntry.model == model, TagSuggestionCacheEntry.fingerprint.in_(set(fingerprints)))
+        .all()
+    )
+    return {fingerprint: (list(tags or []), bytes(minhash)) for fingerprint, tags, minhash in rows}
+
+def store_tags(db: Session, model: str, entries: Dict[str, Tuple[List[str], bytes]], commit: bool = True) -> None:
+    """Inserts tag suggestions with a single multi-row INSERT; existing fingerprints get the new tags."""
+    if not entries:
+        return
+    stmt = pg_insert(TagSuggestionCacheEntry).values([
+        {"model": model, "fingerprint": fingerprint, "tags": tags, "minhash": minhash}
+        for fingerprint, (tags, minhash) in entries.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["model", "fingerprint"],
+        set_={"tags": stmt.excluded.tags},
+    ))
+    if commit:
+        db.commit()
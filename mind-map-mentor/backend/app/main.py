@@ -8,6 +8,9 @@ from contextlib import asynccontextmanager
 from app.api.api_v1.api import api_router
 from app.core.config import settings
 from app.core.storage import ensure_storage_path_exists # Import the util
+from app.ai.vectorstore import close_vector_store
+from app.ai.embeddings import initialize_embedding_function, close_embedding_function, EMBEDDING_PROVIDER_LOCAL
+from app.ai.llm import initialize_llm_registry, close_llm_registry
 
 # --- Logging Configuration ---
 # Configure logging to output to stdout with a specific format and level
@@ -25,9 +28,16 @@ async def lifespan(app: FastAPI):
     # Code to run on startup
     print("Starting up...")
     ensure_storage_path_exists() # Ensure storage path exists
+    if settings.EMBEDDING_PROVIDER == EMBEDDING_PROVIDER_LOCAL:
+        initialize_embedding_function() # Load the local model once, before the first request
+    if settings.OPENAI_API_KEY:
+        initialize_llm_registry() # Pooled chat model connections shared by tagging and RAG
     yield
     # Code to run on shutdown
     print("Shutting down...")
+    close_vector_store() # Flush the local vector index (no-op for Pinecone)
+    close_embedding_function() # Stop the local model's inference thread (no-op for OpenAI)
+    await close_llm_registry() # Close the pooled chat model connections
 
 app = FastAPI(
     title="Mind Map Mentor API",
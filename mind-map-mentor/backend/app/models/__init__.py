@@ -3,4 +3,9 @@ from .user import User
 from .note import Note
 from .file import File
 from .graph_node import GraphNode
-from .graph_edge import GraphEdge 
\ No newline at end of file
+from .graph_edge import GraphEdge 
+from .embedding_cache import EmbeddingCacheEntry
+from .enrichment_job import EnrichmentJob
+from .tag_suggestion_cache import TagSuggestionCacheEntry
+from .keyword_stats import KeywordDocumentFrequency
+from .tag import Tag, NodeTag
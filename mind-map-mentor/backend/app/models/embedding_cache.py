@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, LargeBinary, Integer
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    # Embeddings are keyed by the model that produced them and the sha256 of the input text
+    model = Column(String, primary_key=True)
+    text_hash = Column(String(64), primary_key=True)
+    dimensions = Column(Integer, nullable=False)
+    # Packed float32 values (see app.ai.embeddings)
+    embedding = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Bumped on database hits, used for age/size based eviction
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
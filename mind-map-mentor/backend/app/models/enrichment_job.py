@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class EnrichmentJob(Base):
+    __tablename__ = "enrichment_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Pending jobs of a deleted note are dropped with it
+    note_id = Column(Integer, ForeignKey("notes.id", ondelete="CASCADE"), nullable=True, index=True)
+    job_type = Column(String(50), nullable=False, index=True) # e.g. 'enrich_note'
+    status = Column(String(20), nullable=False, default="pending") # pending, running, done, failed
+    # Job-specific options, e.g. which enrichment steps to run
+    payload = Column(JSON)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    # Earliest time a worker may pick the job up (used for retries with backoff)
+    run_after = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Workers poll for due jobs by (status, run_after)
+    __table_args__ = (Index('ix_enrichment_jobs_status_run_after', 'status', 'run_after'),)
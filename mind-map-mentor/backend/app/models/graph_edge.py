@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -32,4 +32,13 @@ class GraphEdge(Base):
         "GraphNode",
         foreign_keys=[target_node_id],
         back_populates="edges_to"
-    ) 
\ No newline at end of file
+    ) 
+
+    # One edge per (user, source, target, type); auto-linking upserts against this index
+    __table_args__ = (
+        Index(
+            'uq_graph_edges_user_source_target_type',
+            'user_id', 'source_node_id', 'target_node_id', 'relationship_type',
+            unique=True
+        ),
+    )
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, ForeignKey
+
+from app.db.base import Base
+
+
+class KeywordDocumentFrequency(Base):
+    __tablename__ = "keyword_document_frequencies"
+
+    # Number of the user's notes containing the term (unigram or bigram), kept incrementally
+    # by app.ai.agents.keywords for TF-IDF scoring against the user's own corpus
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    term = Column(String(100), primary_key=True)
+    doc_count = Column(Integer, nullable=False, default=0)
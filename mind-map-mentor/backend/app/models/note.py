@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Index, Computed, JSON
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 
 from app.db.base import Base
 
+# Weighted full-text document: title (A) > summary (B) > content (C)
+NOTE_SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(user_summary, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'C')"
+)
+
 
 class Note(Base):
     __tablename__ = "notes"
@@ -16,6 +24,14 @@ class Note(Base):
     position_x = Column(Float, default=0.0)
     position_y = Column(Float, default=0.0)
     graph_node_id = Column(Integer, ForeignKey("graph_nodes.id"), nullable=True, unique=True)
+    # Progress of the asynchronous AI enrichment (tags, vectors, auto-links): pending, processing, done, failed
+    enrichment_status = Column(String(20), nullable=False, default="pending", server_default="done")
+    # Fingerprint of the content the current AI tags were suggested for (key into tag_suggestion_cache)
+    tags_fingerprint = Column(String(64), nullable=True)
+    # Distinct terms counted for this note in keyword_document_frequencies (None = not counted yet)
+    keyword_terms = deferred(Column(JSON, nullable=True))
+    # Generated by Postgres for lexical search (see crud_note.search_notes_fulltext); deferred so it is never loaded by default
+    search_vector = deferred(Column(TSVECTOR, Computed(NOTE_SEARCH_VECTOR_EXPRESSION, persisted=True)))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
 
@@ -26,4 +42,7 @@ class Note(Base):
     graph_node = relationship("GraphNode", back_populates="original_note")
 
     # Add index on user_id and updated_at for potential filtering/sorting
-    __table_args__ = (Index('ix_notes_user_id_updated_at', 'user_id', 'updated_at'),) 
\ No newline at end of file
+    __table_args__ = (
+        Index('ix_notes_user_id_updated_at', 'user_id', 'updated_at'),
+        Index('ix_notes_search_vector', 'search_vector', postgresql_using='gin'),
+    ) 
\ No newline at end of file
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint
+
+from app.db.base import Base
+
+
+class Tag(Base):
+    __tablename__ = "tags"
+    __table_args__ = (UniqueConstraint("user_id", "name", name="uq_tags_user_id_name"),)
+
+    # Normalised (lowercased, single-spaced) tag names per user. GraphNode.data['tags'] stays
+    # the source of truth for display; tags/node_tags index it for filtering and counting
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String(100), nullable=False)
+
+
+class NodeTag(Base):
+    __tablename__ = "node_tags"
+
+    node_id = Column(Integer, ForeignKey("graph_nodes.id", ondelete="CASCADE"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True, index=True) # tag -> nodes lookups
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, DateTime, LargeBinary, JSON
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class TagSuggestionCacheEntry(Base):
+    __tablename__ = "tag_suggestion_cache"
+
+    # AI tags are keyed by the model that suggested them and the fingerprint of the normalised content
+    model = Column(String, primary_key=True)
+    fingerprint = Column(String(64), primary_key=True)
+    tags = Column(JSON, nullable=False)
+    # Packed uint32 MinHash signature of the content's shingles (see app.ai.tag_cache)
+    minhash = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
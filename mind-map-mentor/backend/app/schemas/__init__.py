@@ -1,8 +1,8 @@
 # mind-map-mentor/backend/app/schemas/__init__.py
 from .user import User, UserCreate, UserUpdate
 from .token import Token, TokenData
-from .note import Note, NoteCreate, NoteUpdate, NotesPage
+from .note import Note, NoteCreate, NoteUpdate, NotesPage, NoteEnrichmentStatus
 from .file import File, FilesPage
 from .graph_node import GraphNode, GraphNodeCreate, GraphNodeUpdate
 from .graph_edge import GraphEdge, GraphEdgeCreate, GraphEdgeUpdate
-from .ai import SearchMatch, SearchResponse 
\ No newline at end of file
+from .ai import SearchMatch, SearchResponse, SimilarNote, SimilarNotesResponse, SimilarityGraphRebuildRequest, VectorReconcileRequest, RetagNotesRequest, QueuedJobsResponse 
\ No newline at end of file
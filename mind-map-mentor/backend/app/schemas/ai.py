@@ -1,21 +1,37 @@
 """Pydantic schemas for AI-related features."""
 
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 
 # --- Schemas for Semantic Search (/ai/search-notes) --- #
 
 # Schema for the result of a vector search match
 class SearchMatch(BaseModel):
     id: str # Vector ID (e.g., note_123)
-    score: float = Field(..., description="Similarity score")
+    score: float = Field(..., description="Similarity score (RRF score in hybrid mode, ts_rank_cd in lexical mode)")
     metadata: Dict[str, Any] = Field(..., description="Metadata associated with the vector")
+    sources: List[str] = Field(default_factory=list, description="Searches that found this note: vector and/or lexical")
+    type_scores: Optional[Dict[str, float]] = Field(None, description="Best similarity per embedding type (embedding_type=any only)")
 
 # Schema for the response of the search endpoint
 class SearchResponse(BaseModel):
     query: str
+    mode: Optional[str] = Field(None, description="Search mode actually used (vector, lexical or hybrid)")
     results: List[SearchMatch]
 
+# --- Schemas for "more like this" (/ai/notes/{note_id}/similar) --- #
+
+class SimilarNote(BaseModel):
+    note_id: int
+    title: Optional[str] = None
+    graph_node_id: Optional[int] = None
+    score: float = Field(..., description="Similarity score")
+
+class SimilarNotesResponse(BaseModel):
+    note_id: int
+    embedding_type: Literal["content", "summary"]
+    results: List[SimilarNote]
+
 # --- Schemas for RAG Query (/ai/rag-query) --- #
 
 class RagQueryRequest(BaseModel):
@@ -29,4 +45,23 @@ class RagSourceDocument(BaseModel):
 
 class RagQueryResponse(BaseModel):
     answer: str = Field(..., description="The generated answer.")
-    sources: List[RagSourceDocument] = Field(..., description="List of source documents used for the answer.") 
\ No newline at end of file
+    sources: List[RagSourceDocument] = Field(..., description="List of source documents used for the answer.")
+
+# --- Schemas for admin jobs (/ai/admin/...) --- #
+
+class SimilarityGraphRebuildRequest(BaseModel):
+    user_id: Optional[int] = Field(None, description="User whose graph is rebuilt. Omit to rebuild for every user with notes.")
+    top_k: Optional[int] = Field(None, ge=1, le=50, description="Neighbours per note (defaults to SIMILARITY_REBUILD_TOP_K).")
+    threshold: Optional[float] = Field(None, ge=0.0, le=1.0, description="Minimum similarity (defaults to SIMILARITY_THRESHOLD_SUMMARY).")
+
+class VectorReconcileRequest(BaseModel):
+    user_ids: Optional[List[int]] = Field(None, description="Users to reconcile. Omit to reconcile the whole index.")
+    dry_run: bool = Field(False, description="Only report drift; delete and enqueue nothing.")
+
+class RetagNotesRequest(BaseModel):
+    user_id: Optional[int] = Field(None, description="User whose notes are retagged. Omit to retag every user with notes.")
+    only_untagged: bool = Field(False, description="Skip notes that already have tags.")
+
+class QueuedJobsResponse(BaseModel):
+    job_type: str
+    job_ids: List[int] = Field(..., description="IDs of the queued jobs, processed by the worker.")
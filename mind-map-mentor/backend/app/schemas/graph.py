@@ -106,4 +106,10 @@ class GraphEdgeInDBBase(GraphEdgeBase):
 
 # Properties to return to client
 class GraphEdge(GraphEdgeInDBBase):
-    pass 
\ No newline at end of file
+    pass
+
+# --- Tag Schemas ---
+
+class TagCount(BaseModel):
+    name: str = Field(..., description="Normalised tag name (lowercase, single spaces)")
+    count: int = Field(..., description="Number of graph nodes carrying the tag")
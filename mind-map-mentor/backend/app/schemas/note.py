@@ -37,6 +37,7 @@ class NoteInDBBase(NoteBase):
     position_x: Optional[float] = 0.0 # Default to 0.0 if not set
     position_y: Optional[float] = 0.0 # Default to 0.0 if not set
     graph_node_id: Optional[int] = None # Add the FK ID
+    enrichment_status: Optional[str] = None # pending, processing, done or failed
     created_at: datetime
     updated_at: Optional[datetime] = None
     # user_summary is inherited
@@ -61,4 +62,13 @@ class Notes(BaseModel):
 # Schema for paginated response
 class NotesPage(BaseModel):
     items: List[Note]
-    total: int 
\ No newline at end of file
+    total: int
+
+# Schema for the asynchronous enrichment state of a note
+class NoteEnrichmentStatus(BaseModel):
+    note_id: int
+    status: str = Field(..., description="pending, processing, done or failed")
+    job_status: Optional[str] = Field(None, description="Status of the latest enrichment job, if any")
+    attempts: int = 0
+    last_error: Optional[str] = None
+    updated_at: Optional[datetime] = None 
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""Background worker for the Postgres-backed enrichment job queue.
+
+Run with:  python -m app.worker
+Several workers can run side by side; jobs are claimed with FOR UPDATE SKIP LOCKED.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.core.config import settings
+from app.crud import crud_job, crud_note
+from app.models.enrichment_job import EnrichmentJob
+from app.ai.enrichment import enrich_notes, set_enrichment_status
+from app.ai.similarity_graph import rebuild_summary_edges
+from app.ai.reconcile import reconcile_vectors
+from app.ai.retag import retag_notes
+from app.ai.embeddings import initialize_embedding_function, close_embedding_function, EMBEDDING_PROVIDER_LOCAL
+from app.ai.llm import initialize_llm_registry, close_llm_registry
+
+logger = logging.getLogger(__name__)
+
+async def _run_rebuild_similarity_graph(db: Session, job: EnrichmentJob) -> None:
+    payload = job.payload or {}
+    rebuild_summary_edges(db, user_id=job.user_id, top_k=payload.get("top_k"), threshold=payload.get("threshold"))
+
+async def _run_reconcile_vectors(db: Session, job: EnrichmentJob) -> None:
+    payload = job.payload or {}
+    report = reconcile_vectors(db, user_ids=payload.get("user_ids"), dry_run=bool(payload.get("dry_run")))
+    job.payload = {**payload, "report": report} # Drift metrics are kept on the job, committed by complete_job
+
+async def _run_retag_notes(db: Session, job: EnrichmentJob) -> None:
+    payload = job.payload or {}
+    report = await retag_notes(db, user_id=job.user_id, only_untagged=bool(payload.get("only_untagged")))
+    job.payload = {**payload, "report": report}
+
+# Maps job_type -> coroutine that executes one job
+JOB_HANDLERS: Dict[str, Callable[[Session, EnrichmentJob], Awaitable[None]]] = {
+    crud_job.JOB_TYPE_REBUILD_SIMILARITY_GRAPH: _run_rebuild_similarity_graph,
+    crud_job.JOB_TYPE_RECONCILE_VECTORS: _run_reconcile_vectors,
+    crud_job.JOB_TYPE_RETAG_NOTES: _run_retag_notes,
+}
+
+# Maps job_type -> coroutine that executes all claimed jobs of that type together
+# and returns {job_id: error message or None}
+BATCH_JOB_HANDLERS: Dict[str, Callable[[Session, List[EnrichmentJob]], Awaitable[Dict[int, Optional[str]]]]] = {
+    crud_job.JOB_TYPE_ENRICH_NOTE: enrich_notes,
+}
+
+def record_job_outcome(db: Session, job: EnrichmentJob, error: Optional[str]) -> None:
+    """Completes the job, or records the failure (marking the note failed once retries are exhausted)."""
+    if error is None:
+        crud_job.complete_job(db, job)
+        return
+    permanently_failed = crud_job.fail_job(db, job, error)
+    if permanently_failed and job.note_id is not None:
+        note = crud_note.get_note(db, note_id=job.note_id, user_id=job.user_id)
+        if note:
+            set_enrichment_status(db, note, crud_note.ENRICHMENT_FAILED)
+
+def _record_job_outcome_safely(db: Session, job: EnrichmentJob, job_id: int, error: Optional[str]) -> None:
+    """record_job_outcome that never raises, so one bad row cannot strand the other claimed jobs."""
+    try:
+        record_job_outcome(db, job, error)
+    except Exception as e:
+        logger.error(f"Could not record the outcome of job {job_id}: {e}", exc_info=True)
+        db.rollback()
+
+async def process_job(db: Session, job: EnrichmentJob) -> None:
+    """Executes one claimed job and records its outcome."""
+    job_id = crud_job.job_identity(job)
+    handler = JOB_HANDLERS.get(job.job_type)
+    if handler is None:
+        logger.error(f"No handler for job type '{job.job_type}' (job {job_id}).")
+        _record_job_outcome_safely(db, job, job_id, f"Unknown job type '{job.job_type}'")
+        return
+    error = None
+    try:
+        logger.info(f"Running {job.job_type} job {job_id} (attempt {job.attempts}) for note {job.note_id}.")
+        await handler(db, job)
+    except Exception as e:
+        logger.error(f"Job {job_id} ({job.job_type}) failed: {e}", exc_info=True)
+        db.rollback()
+        error = str(e)
+    _record_job_outcome_safely(db, job, job_id, error)
+
+async def process_job_batch(db: Session, job_type: str, jobs: List[EnrichmentJob]) -> None:
+    """Executes claimed jobs of one batchable type together and records each outcome."""
+    job_ids = [crud_job.job_identity(job) for job in jobs] # Job rows may be deleted (with their note) meanwhile
+    logger.info(f"Running {len(jobs)} {job_type} jobs as one batch: {job_ids}.")
+    try:
+        errors = await BATCH_JOB_HANDLERS[job_type](db, jobs)
+    except Exception as e:
+        logger.error(f"Batch of {len(jobs)} {job_type} jobs failed: {e}", exc_info=True)
+        db.rollback()
+        errors = {job_id: str(e) for job_id in job_ids}
+    for job_id, job in zip(job_ids, jobs):
+        _record_job_outcome_safely(db, job, job_id, errors.get(job_id))
+
+async def run_once(batch_size: int) -> int:
+    """Claims and processes one batch of due jobs. Returns the number of jobs processed."""
+    db = SessionLocal()
+    try:
+        jobs = crud_job.claim_jobs(db, limit=batch_size)
+        batches: Dict[str, List[EnrichmentJob]] = {}
+        for job in jobs:
+            if job.job_type in BATCH_JOB_HANDLERS:
+                batches.setdefault(job.job_type, []).append(job)
+            else:
+                await process_job(db, job)
+        for job_type, batch in batches.items():
+            await process_job_batch(db, job_type, batch)
+        return len(jobs)
+    finally:
+        db.close()
+
+async def run_worker(batch_size: int, poll_interval: float, once: bool = False) -> None:
+    """Polls the queue forever (or until it is empty when once=True)."""
+    logger.info(f"Enrichment worker started (batch_size={batch_size}, poll_interval={poll_interval}s).")
+    while True:
+        try:
+            processed = await run_once(batch_size)
+        except Exception as e:
+            logger.error(f"Worker loop error: {e}", exc_info=True)
+            processed = 0
+        if processed == 0:
+            if once:
+                break
+            await asyncio.sleep(poll_interval)
+
+async def _serve(batch_size: int, poll_interval: float, once: bool) -> None:
+    """Runs the worker with the shared LLM registry open for its whole lifetime."""
+    if settings.OPENAI_API_KEY:
+        initialize_llm_registry() # Tagging reuses pooled connections across jobs
+    try:
+        await run_worker(batch_size=batch_size, poll_interval=poll_interval, once=once)
+    finally:
+        await close_llm_registry()
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued note enrichment jobs.")
+    parser.add_argument("--batch-size", type=int, default=settings.ENRICHMENT_WORKER_BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=settings.ENRICHMENT_WORKER_POLL_INTERVAL)
+    parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    if settings.EMBEDDING_PROVIDER == EMBEDDING_PROVIDER_LOCAL:
+        initialize_embedding_function() # Load the local model once at startup
+    try:
+        asyncio.run(_serve(batch_size=args.batch_size, poll_interval=args.poll_interval, once=args.once))
+    finally:
+        close_embedding_function()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.crud import crud_job
+from app.crud.crud_job import (
+    JOB_STATUS_DONE,
+    JOB_STATUS_FAILED,
+    JOB_STATUS_PENDING,
+    JOB_STATUS_RUNNING,
+    JOB_TYPE_ENRICH_NOTE,
+)
+from app.models import EnrichmentJob, Note
+
+
+def _utc(value):
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def _claim_one(db):
+    db.query(EnrichmentJob).update({EnrichmentJob.run_after: datetime.now(timezone.utc) - timedelta(seconds=1)})
+    db.commit()
+    jobs = crud_job.claim_jobs(db, limit=1)
+    assert len(jobs) == 1
+    return jobs[0]
+
+
+def test_retry_delay_doubles_per_attempt(monkeypatch):
+    monkeypatch.setattr(settings, "ENRICHMENT_JOB_RETRY_BACKOFF_SECONDS", 30)
+    assert [crud_job.retry_delay_seconds(attempts) for attempts in (1, 2, 3, 4)] == [30, 60, 120, 240]
+
+
+def test_fail_job_retries_with_backoff_then_fails_permanently(db, user, make_note, monkeypatch):
+    monkeypatch.setattr(settings, "ENRICHMENT_JOB_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "ENRICHMENT_JOB_RETRY_BACKOFF_SECONDS", 30)
+    note = make_note()
+    job = crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id)
+
+    for attempt in (1, 2):
+        job = _claim_one(db)
+        assert job.status == JOB_STATUS_RUNNING and job.attempts == attempt
+        before = datetime.now(timezone.utc)
+        assert crud_job.fail_job(db, job, "boom") is False
+        db.refresh(job)
+        assert job.status == JOB_STATUS_PENDING
+        assert job.locked_at is None and job.last_error == "boom"
+        delay = (_utc(job.run_after) - before).total_seconds()
+        assert crud_job.retry_delay_seconds(attempt) - 1 <= delay <= crud_job.retry_delay_seconds(attempt) + 1
+
+    job = _claim_one(db)
+    assert crud_job.fail_job(db, job, "x" * 5000) is True
+    db.refresh(job)
+    assert job.status == JOB_STATUS_FAILED
+    assert len(job.last_error) == 2000
+
+
+def test_complete_job(db, user, make_note):
+    note = make_note()
+    crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id)
+    job = _claim_one(db)
+    job.payload = dict(job.payload, report={"ok": True}) # Pending changes are committed with the status
+    crud_job.complete_job(db, job)
+    db.expire_all()
+    assert job.status == JOB_STATUS_DONE
+    assert job.payload["report"] == {"ok": True}
+
+
+@pytest.mark.parametrize("record", ["complete", "fail"])
+def test_recording_a_job_deleted_with_its_note_is_a_no_op(db, user, make_note, record):
+    note = make_note()
+    crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id)
+    job = _claim_one(db)
+    job_id = crud_job.job_identity(job)
+    db.query(Note).filter(Note.id == note.id).delete(synchronize_session=False) # Cascades to the job
+    db.commit()
+
+    if record == "complete":
+        crud_job.complete_job(db, job)
+    else:
+        assert crud_job.fail_job(db, job, "boom") is False
+    assert db.get(EnrichmentJob, job_id) is None
+
+
+def test_enqueue_coalesces_into_the_pending_job(db, user, make_note):
+    note = make_note()
+    first = crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id, tags=False, vectors=True, links=False)
+    second = crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id, tags=True, vectors=False, links=False)
+    assert second.id == first.id
+    assert second.payload == {"tags": True, "vectors": True, "links": False}
+    # Manually set tags must not be overwritten by a queued AI suggestion
+    third = crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id, manual_tags=True)
+    assert third.id == first.id
+    assert third.payload == {"tags": False, "vectors": True, "links": True}
+    assert db.query(EnrichmentJob).count() == 1
+
+
+def test_enqueue_debounce_is_capped(db, user, make_note, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_SYNC_MAX_DELAY_SECONDS", 60)
+    note = make_note()
+    job = crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id, debounce_seconds=10)
+    job = crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id, debounce_seconds=3600)
+    assert _utc(job.run_after) <= _utc(job.created_at) + timedelta(seconds=61)
+
+
+def test_running_job_is_not_coalesced(db, user, make_note):
+    note = make_note()
+    crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id)
+    running = _claim_one(db)
+    queued = crud_job.enqueue_note_enrichment(db, note_id=note.id, user_id=user.id)
+    assert queued.id != running.id
+    assert queued.job_type == JOB_TYPE_ENRICH_NOTE and queued.status == JOB_STATUS_PENDING
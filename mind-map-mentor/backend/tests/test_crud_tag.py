@@ -0,0 +1,44 @@
+from app.crud import crud_tag
+from app.crud.crud_tag import MAX_TAG_LENGTH, normalize_tag, normalize_tags
+from app.models import Tag
+
+
+def test_normalize_tag_lowercases_and_collapses_whitespace():
+    assert normalize_tag("  Machine \t Learning ") == "machine learning"
+    assert normalize_tag("x" * (MAX_TAG_LENGTH + 5)) == "x" * MAX_TAG_LENGTH
+
+
+def test_normalize_tags_drops_empty_and_duplicate_tags_in_order():
+    assert normalize_tags(["Python", "  ", None, "python ", "Web  Dev", "web dev", "AI"]) == ["python", "web dev", "ai"]
+    assert normalize_tags(None) == []
+    assert normalize_tags([]) == []
+
+
+def test_sync_node_tags_writes_only_changes(db, user, make_note):
+    note = make_note()
+    crud_tag.sync_node_tags(db, note.graph_node_id, user.id, ["Python", "AI"])
+    db.commit()
+    assert set(crud_tag.get_tagged_note_ids(db, user.id, ["python"])) == {note.id}
+
+    crud_tag.sync_node_tags(db, note.graph_node_id, user.id, ["python", "databases"])
+    db.commit()
+    assert crud_tag.get_tagged_note_ids(db, user.id, ["ai"]) == []
+    assert crud_tag.get_tagged_note_ids(db, user.id, ["Databases"]) == [note.id]
+    # Unused tags stay, but are not counted
+    assert db.query(Tag).filter(Tag.user_id == user.id).count() == 3
+    assert dict(crud_tag.get_tag_counts(db, user.id)) == {"python": 1, "databases": 1}
+
+
+def test_tag_filters_match_any_or_all(db, user, make_note):
+    both = make_note()
+    python_only = make_note()
+    make_note() # Untagged
+    crud_tag.sync_node_tags(db, both.graph_node_id, user.id, ["python", "web"])
+    crud_tag.sync_node_tags(db, python_only.graph_node_id, user.id, ["python"])
+    db.commit()
+
+    assert set(crud_tag.get_tagged_note_ids(db, user.id, ["python", "web"])) == {both.id, python_only.id}
+    assert crud_tag.get_tagged_note_ids(db, user.id, ["python", "web"], match_all=True) == [both.id]
+    assert crud_tag.get_tagged_note_ids(db, user.id, ["python"], among=[python_only.id]) == [python_only.id]
+    assert len(crud_tag.get_tagged_note_ids(db, user.id, ["python"], limit=1)) == 1
+    assert crud_tag.get_tag_counts(db, user.id, prefix="PY") == [("python", 2)]
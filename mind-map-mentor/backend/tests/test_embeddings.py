@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.ai.embeddings import QueryEmbeddingCache, normalize_query
+
+
+class _CountingEmbeddings(Embeddings):
+    def __init__(self, gate: threading.Event = None, error: Exception = None):
+        self.queries = []
+        self.gate = gate
+        self.error = error
+
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return [float(len(text))]
+
+
+def test_normalize_query():
+    assert normalize_query("  What   is\tRAG? ") == "what is rag?"
+
+
+def test_cache_hits_on_normalised_text_but_embeds_the_original():
+    underlying = _CountingEmbeddings()
+    cache = QueryEmbeddingCache(underlying)
+    assert cache.embed_query("Vector  Search") == [14.0]
+    assert cache.embed_query("vector search") == [14.0]
+    assert underlying.queries == ["Vector  Search"]
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_cache_expires_and_evicts():
+    underlying = _CountingEmbeddings()
+    cache = QueryEmbeddingCache(underlying, max_items=1, ttl_seconds=0)
+    cache.embed_query("a")
+    cache.embed_query("a")
+    assert cache.stats["expired"] == 1 and len(underlying.queries) == 2
+
+    cache = QueryEmbeddingCache(_CountingEmbeddings(), max_items=1)
+    cache.embed_query("a")
+    cache.embed_query("b")
+    assert cache.stats["evictions"] == 1
+
+
+def test_concurrent_identical_queries_share_one_call():
+    gate = threading.Event()
+    underlying = _CountingEmbeddings(gate=gate)
+    cache = QueryEmbeddingCache(underlying)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.embed_query("same query"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # Wait until every follower is parked on the leader's call
+    while cache.stats["coalesced"] < 3:
+        threading.Event().wait(0.01)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [[10.0]] * 4
+    assert underlying.queries == ["same query"]
+
+
+def test_failed_call_is_not_cached():
+    cache = QueryEmbeddingCache(_CountingEmbeddings(error=RuntimeError("provider down")))
+    with pytest.raises(RuntimeError):
+        cache.embed_query("q")
+    cache.underlying.error = None
+    assert cache.embed_query("q") == [1.0]
@@ -0,0 +1,77 @@
+from app.ai.agents.keywords import (
+    BIGRAM_WEIGHT,
+    _select_tags,
+    extract_terms,
+    score_keyphrases,
+    suggest_keyword_tags,
+    update_keyword_stats,
+)
+from app.crud import crud_keyword_stats
+
+
+def _scores(scored):
+    return {term: score for term, score, _ in scored}
+
+
+def test_extract_terms_skips_stopwords_short_words_and_boundaries():
+    terms = extract_terms("The vector index. Search it!")
+    assert terms == {"vector", "index", "vector index", "search"}
+    assert "index search" not in terms # Phrases never span punctuation
+
+
+def test_score_keyphrases_prefers_corpus_rare_terms():
+    content = "postgres tuning and postgres vacuum with python scripts"
+    scored = _scores(score_keyphrases(content, None, {"python": 50, "postgres": 1}, total_documents=100))
+    assert scored["postgres"] > scored["python"]
+
+
+def test_score_keyphrases_rewards_title_terms_and_bigrams():
+    content = "notes about caching and about hashing, later more hashing"
+    plain = _scores(score_keyphrases(content, None, {}, total_documents=10))
+    titled = _scores(score_keyphrases(content, "Caching", {}, total_documents=10))
+    assert titled["caching"] > plain["caching"]
+    assert titled["hashing"] == plain["hashing"]
+
+    scored = score_keyphrases("embedding cache", None, {}, total_documents=10)
+    by_term = _scores(scored)
+    assert by_term["embedding cache"] == by_term["embedding"] * BIGRAM_WEIGHT
+    assert scored[0][0] == "embedding cache" # Sorted best first
+
+
+def test_score_keyphrases_without_candidates():
+    assert score_keyphrases("a an the of", "the", {}, total_documents=10) == []
+
+
+def test_select_tags_skips_overlapping_terms():
+    scored = [("vector index", 3.0, 1.0), ("vector", 2.5, 1.0), ("index", 2.0, 1.0), ("search", 1.0, 1.0)]
+    assert [term for term, _, _ in _select_tags(scored, 2)] == ["vector index", "search"]
+    assert [term for term, _, _ in _select_tags(scored, 5)] == ["vector index", "search"]
+    assert _select_tags([], 2) == []
+
+
+def _frequencies(db, user_id):
+    return crud_keyword_stats.get_document_frequencies(db, user_id=user_id, terms=["alpha", "beta", "gamma"])
+
+
+def test_update_keyword_stats_applies_only_deltas(db, user, make_note):
+    first = make_note("alpha beta")
+    second = make_note("alpha gamma")
+    update_keyword_stats(db, [first, second])
+    db.commit()
+    assert _frequencies(db, user.id) == {"alpha": 2, "beta": 1, "gamma": 1}
+
+    # Unchanged content writes nothing; edited content moves its terms
+    update_keyword_stats(db, [first])
+    first.content = "alpha"
+    update_keyword_stats(db, [first])
+    db.commit()
+    assert _frequencies(db, user.id) == {"alpha": 2, "gamma": 1}
+    assert first.keyword_terms == ["alpha"]
+
+
+def test_suggest_keyword_tags_leaves_the_note_out_of_its_statistics(db, make_note):
+    notes = [make_note(f"shared words {i}") for i in range(3)]
+    rare = make_note("shared words and one zebra")
+    results = suggest_keyword_tags(db, notes + [rare])
+    assert results[rare.id].tags[0] == "zebra"
+    assert 0.0 <= results[rare.id].confidence <= 1.0
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.ai import local_index
+from app.ai.local_index import _normalize_rows, _UserPartition
+
+
+def _vectors(count, dim=16, seed=0):
+    return _normalize_rows(np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32))
+
+
+def _partition(path, hnsw_threshold=10_000):
+    return _UserPartition(path, hnsw_threshold=hnsw_threshold, hnsw_save_interval=1000)
+
+
+def _upsert(partition, ids, vectors):
+    partition.upsert(ids, vectors, ["" for _ in ids], [{"doc": doc_id} for doc_id in ids])
+
+
+def test_upsert_keeps_last_occurrence_of_a_repeated_id(tmp_path):
+    partition = _partition(tmp_path / "u")
+    vectors = _vectors(3)
+    _upsert(partition, ["a", "b", "a"], vectors)
+    assert sorted(partition.ids) == ["a", "b"]
+    slot, score = partition.search(vectors[2], 1)[0]
+    assert partition.ids[slot] == "a" and score == pytest.approx(1.0, abs=1e-5)
+    partition.close()
+
+
+def test_upsert_updates_in_place_and_survives_reload(tmp_path):
+    partition = _partition(tmp_path / "u")
+    vectors = _vectors(3)
+    _upsert(partition, ["a", "b"], vectors[:2])
+    _upsert(partition, ["b"], vectors[2:])
+    assert partition.ids == ["a", "b"]
+    partition.close()
+
+    reloaded = _partition(tmp_path / "u")
+    assert reloaded.ids == ["a", "b"]
+    slot, score = reloaded.search(vectors[2], 1)[0]
+    assert reloaded.ids[slot] == "b" and score == pytest.approx(1.0, abs=1e-5)
+    reloaded.close()
+
+
+def test_delete_keeps_rows_dense(tmp_path):
+    partition = _partition(tmp_path / "u")
+    vectors = _vectors(4)
+    _upsert(partition, ["a", "b", "c", "d"], vectors)
+    assert partition.delete(["b", "missing"]) == 1
+    assert partition.ids == ["a", "d", "c"]
+    assert partition.id_to_slot == {"a": 0, "d": 1, "c": 2}
+    slot, _ = partition.search(vectors[3], 1)[0]
+    assert partition.ids[slot] == "d"
+    partition.close()
+
+
+@pytest.mark.skipif(local_index.hnswlib is None, reason="hnswlib is not installed")
+def test_delete_updates_the_loaded_hnsw_graph(tmp_path):
+    partition = _partition(tmp_path / "u", hnsw_threshold=50)
+    vectors = _vectors(300)
+    ids = [f"d{i}" for i in range(300)]
+    _upsert(partition, ids, vectors)
+    partition.search(vectors[0], 1) # Builds the graph
+    graph = partition._hnsw
+
+    partition.delete(["d5", "d7"])
+    assert partition._hnsw is graph # Few deletes: marked deleted, not rebuilt
+    found = [partition.ids[slot] for slot, _ in partition.search(vectors[299], 3)]
+    assert found[0] == "d299" # Moved into a freed slot, still found under its new label
+    assert "d5" not in [partition.ids[slot] for slot, _ in partition.search(vectors[5], 5)]
+
+    partition.delete(ids[100:200])
+    assert partition._hnsw is None # Past HNSW_MAX_DELETED_RATIO: rebuilt on the next query
+    assert partition.ids[partition.search(vectors[250], 1)[0][0]] == "d250"
+    partition.close()
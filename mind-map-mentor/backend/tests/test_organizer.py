@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from app.ai.agents.organizer import CHARS_PER_TOKEN, MAX_TAGS_PER_NOTE, _pack_tag_batches, _parse_batch_tags
+
+
+def test_pack_tag_batches_respects_max_notes():
+    notes = [(i, "short note") for i in range(5)]
+    batches = _pack_tag_batches(notes, token_budget=10_000, max_notes=2, max_note_tokens=100)
+    assert [[note_id for note_id, _ in batch] for batch in batches] == [[0, 1], [2, 3], [4]]
+
+
+def test_pack_tag_batches_respects_token_budget():
+    text = "x" * (40 * CHARS_PER_TOKEN) # 40 tokens + 10 for the header line
+    notes = [(i, text) for i in range(4)]
+    batches = _pack_tag_batches(notes, token_budget=100, max_notes=10, max_note_tokens=1000)
+    assert [len(batch) for batch in batches] == [2, 2]
+
+
+def test_pack_tag_batches_truncates_long_notes():
+    notes = [(1, "  " + "y" * 1000 + "  "), (2, "short")]
+    batches = _pack_tag_batches(notes, token_budget=1000, max_notes=10, max_note_tokens=10)
+    assert batches == [[(1, "y" * 10 * CHARS_PER_TOKEN), (2, "short")]]
+
+
+def test_pack_tag_batches_oversized_note_gets_its_own_batch():
+    notes = [(1, "a" * 400), (2, "b")]
+    batches = _pack_tag_batches(notes, token_budget=20, max_notes=10, max_note_tokens=1000)
+    assert [[note_id for note_id, _ in batch] for batch in batches] == [[1], [2]]
+
+
+def test_pack_tag_batches_empty():
+    assert _pack_tag_batches([], token_budget=100, max_notes=10, max_note_tokens=10) == []
+
+
+def test_parse_batch_tags_reads_and_cleans_lists_and_comma_strings():
+    reply = json.dumps({"1": ["Python", " Web "], "2": "databases, indexing"})
+    assert _parse_batch_tags(reply, [1, 2]) == {1: ["python", "web"], 2: ["databases", "indexing"]}
+
+
+def test_parse_batch_tags_tolerates_fenced_reply():
+    reply = '```json\n{"7": ["search"]}\n```'
+    assert _parse_batch_tags(reply, [7]) == {7: ["search"]}
+
+
+def test_parse_batch_tags_skips_missing_unknown_and_malformed_entries():
+    reply = json.dumps({"1": ["ok"], "2": [1, 2], "3": None, "99": ["not asked for"]})
+    assert _parse_batch_tags(reply, [1, 2, 3, 4]) == {1: ["ok"]}
+
+
+def test_parse_batch_tags_caps_tags_per_note():
+    reply = json.dumps({"1": ["a", "b", "c", "d"]})
+    assert len(_parse_batch_tags(reply, [1])[1]) == MAX_TAGS_PER_NOTE
+
+
+def test_parse_batch_tags_rejects_non_object_reply():
+    with pytest.raises(ValueError):
+        _parse_batch_tags('["a", "b"]', [1])
+    with pytest.raises(ValueError):
+        _parse_batch_tags("not json", [1])
@@ -0,0 +1,50 @@
+import pytest
+
+from app.ai import search
+from app.ai.search import SEARCH_MODE_VECTOR, search_notes
+from app.core.config import settings
+from app.crud import crud_tag
+
+
+@pytest.fixture
+def vector_queries(monkeypatch):
+    """Records the vector queries and answers them with every note ID up to top_k."""
+    queries = []
+
+    def query_similar_notes(query_text, user_id, embedding_type_filter, top_k, filter):
+        queries.append({"top_k": top_k, "filter": filter})
+        return [
+            {"id": f"note_{note_id}", "score": 1.0 - note_id / 100, "metadata": {"note_id": note_id}}
+            for note_id in range(1, top_k + 1)
+        ]
+
+    monkeypatch.setattr(search, "query_similar_notes", query_similar_notes)
+    return queries
+
+
+@pytest.fixture
+def tagged_notes(db, user, make_note):
+    notes = [make_note(f"note {i}") for i in range(6)]
+    for note in notes[::2]: # Every other note carries the tag
+        crud_tag.sync_node_tags(db, note.graph_node_id, user.id, ["python"])
+    db.commit()
+    return [note.id for note in notes[::2]]
+
+
+def test_small_tag_set_becomes_a_vector_filter(db, user, tagged_notes, vector_queries, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_TAG_FILTER_MAX_IDS", 10)
+    search_notes(db, "query", user.id, top_k=2, mode=SEARCH_MODE_VECTOR, tags=["Python"])
+    assert vector_queries == [{"top_k": 2, "filter": {"note_id": {"$in": tagged_notes}}}]
+
+
+def test_large_tag_set_is_filtered_after_retrieval(db, user, tagged_notes, vector_queries, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_TAG_FILTER_MAX_IDS", 2)
+    monkeypatch.setattr(settings, "SEARCH_TAG_FILTER_OVERFETCH", 5)
+    _, matches = search_notes(db, "query", user.id, top_k=2, mode=SEARCH_MODE_VECTOR, tags=["python"])
+    assert vector_queries == [{"top_k": 10, "filter": None}]
+    assert [match["metadata"]["note_id"] for match in matches] == tagged_notes[:2]
+
+
+def test_unknown_tag_skips_the_search(db, user, tagged_notes, vector_queries):
+    assert search_notes(db, "query", user.id, mode=SEARCH_MODE_VECTOR, tags=["rust"]) == (SEARCH_MODE_VECTOR, [])
+    assert vector_queries == []
@@ -0,0 +1,37 @@
+import numpy as np
+
+from app.ai.similarity_graph import top_k_neighbours
+
+
+def _brute_force(vectors, k):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ normed.T
+    np.fill_diagonal(scores, -np.inf)
+    indices = np.argsort(-scores, axis=1)[:, :k]
+    return indices, np.take_along_axis(scores, indices, axis=1)
+
+
+def test_top_k_neighbours_matches_brute_force_across_blocks():
+    vectors = np.random.default_rng(0).normal(size=(37, 8))
+    expected_indices, expected_scores = _brute_force(vectors, 5)
+    for block_size in (1, 4, 37, 100):
+        indices, scores = top_k_neighbours(vectors, k=5, block_size=block_size)
+        assert indices.shape == scores.shape == (37, 5)
+        assert np.array_equal(indices, expected_indices)
+        assert np.allclose(scores, expected_scores, atol=1e-5)
+
+
+def test_top_k_neighbours_excludes_self_and_caps_k():
+    vectors = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+    indices, scores = top_k_neighbours(vectors, k=10, block_size=2)
+    assert indices.shape == (3, 2)
+    assert indices[0, 0] == 1 and indices[1, 0] == 0 # Identical vectors, but never the row itself
+    assert np.allclose(scores[0], [1.0, 0.0])
+
+
+def test_top_k_neighbours_degenerate_inputs():
+    indices, scores = top_k_neighbours(np.ones((1, 3)), k=5, block_size=10)
+    assert indices.shape == scores.shape == (1, 0)
+    # A zero vector has no direction; it must not produce NaNs
+    _, scores = top_k_neighbours(np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0]]), k=1, block_size=2)
+    assert not np.isnan(scores).any()
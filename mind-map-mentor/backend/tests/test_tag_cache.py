@@ -0,0 +1,113 @@
+import numpy as np
+
+from app.ai.tag_cache import (
+    MINHASH_PERMUTATIONS,
+    content_fingerprint,
+    content_signature,
+    estimate_similarity,
+    minhash_signature,
+    normalize_content,
+    remember_tags,
+    resolve_cached_tags,
+)
+from app.models import TagSuggestionCacheEntry
+
+TEXT = "The quick brown fox jumps over the lazy dog near the river bank in the morning light. " * 3
+
+
+def test_fingerprint_ignores_case_punctuation_and_whitespace():
+    assert content_fingerprint(TEXT) == content_fingerprint("  " + TEXT.upper().replace(" ", "   ") + "!!")
+    assert content_fingerprint(TEXT) != content_fingerprint(TEXT.replace("fox", "cat"))
+
+
+def test_minhash_signature_shape_and_determinism():
+    signature = minhash_signature(normalize_content(TEXT))
+    assert signature.dtype == np.uint32
+    assert signature.shape == (MINHASH_PERMUTATIONS,)
+    assert np.array_equal(signature, minhash_signature(normalize_content(TEXT)))
+
+
+def test_minhash_signature_of_short_and_long_texts():
+    assert minhash_signature("").shape == (MINHASH_PERMUTATIONS,)
+    assert minhash_signature("abc").shape == (MINHASH_PERMUTATIONS,)
+    # Longer than one hashing block
+    long_text = " ".join(f"word{i}" for i in range(5000))
+    assert minhash_signature(long_text).shape == (MINHASH_PERMUTATIONS,)
+
+
+def test_estimate_similarity_tracks_edit_size():
+    original = content_signature(TEXT).minhash
+    small_edit = content_signature(TEXT.replace("lazy", "sleepy", 1)).minhash
+    unrelated = content_signature("Completely different text about databases, indexes and query plans.").minhash
+    assert estimate_similarity(original, original) == 1.0
+    assert estimate_similarity(original, small_edit) > 0.8
+    assert estimate_similarity(original, unrelated) < 0.2
+
+
+def _resolve(db, notes, current_tags):
+    return resolve_cached_tags(db, {note.id: note for note in notes}, current_tags)
+
+
+def test_resolve_unknown_content_needs_a_suggestion(db, make_note):
+    note = make_note(TEXT)
+    resolved, pending = _resolve(db, [note], {note.id: []})
+    assert resolved == {}
+    assert pending[note.id].fingerprint == content_fingerprint(TEXT)
+
+
+def test_resolve_keeps_tags_of_cosmetically_edited_note(db, make_note):
+    note = make_note(TEXT)
+    note.tags_fingerprint = content_fingerprint(TEXT)
+    note.content = TEXT.upper()
+    resolved, pending = _resolve(db, [note], {note.id: ["animals"]})
+    assert resolved == {note.id: ["animals"]}
+    assert pending == {}
+
+
+def test_resolve_reuses_cached_suggestion_for_identical_content(db, make_note):
+    first = make_note(TEXT)
+    _, pending = _resolve(db, [first], {first.id: []})
+    remember_tags(db, pending, {first.id: ["animals", "nature"]})
+    assert first.tags_fingerprint == content_fingerprint(TEXT)
+
+    second = make_note(TEXT + " ")
+    resolved, pending = _resolve(db, [second], {second.id: []})
+    assert resolved == {second.id: ["animals", "nature"]}
+    assert pending == {}
+    db.commit()
+    db.refresh(second)
+    assert second.tags_fingerprint == content_fingerprint(TEXT)
+
+
+def test_resolve_keeps_tags_after_small_edit_only(db, make_note):
+    note = make_note(TEXT)
+    _, pending = _resolve(db, [note], {note.id: []})
+    remember_tags(db, pending, {note.id: ["animals"]})
+
+    note.content = TEXT.replace("lazy", "sleepy", 1)
+    resolved, pending = _resolve(db, [note], {note.id: ["animals"]})
+    assert resolved == {note.id: ["animals"]}
+
+    note.content = "Completely different text about databases, indexes and query plans."
+    resolved, pending = _resolve(db, [note], {note.id: ["animals"]})
+    assert resolved == {}
+    assert list(pending) == [note.id]
+
+
+def test_resolve_small_edit_without_current_tags_needs_a_suggestion(db, make_note):
+    note = make_note(TEXT)
+    _, pending = _resolve(db, [note], {note.id: []})
+    remember_tags(db, pending, {note.id: ["animals"]})
+
+    note.content = TEXT.replace("lazy", "sleepy", 1)
+    resolved, pending = _resolve(db, [note], {note.id: []})
+    assert resolved == {}
+    assert list(pending) == [note.id]
+
+
+def test_remember_tags_skips_empty_suggestions(db, make_note):
+    note = make_note(TEXT)
+    _, pending = _resolve(db, [note], {note.id: []})
+    remember_tags(db, pending, {note.id: []})
+    assert note.tags_fingerprint is None
+    assert db.query(TagSuggestionCacheEntry).count() == 0